@@ -6,4 +6,5 @@ if __name__ == "__main__":
         version="0.1.0",
         packages=find_packages(where="src"),
         package_dir={"": "src"},
+        package_data={"bettingAI.writer": ["nltk_data/tokenizers/punkt_tab/english/*"]},
     )
\ No newline at end of file
@@ -5,6 +5,7 @@ from sqlalchemy import (
     Column,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     UniqueConstraint,
@@ -88,11 +89,13 @@ class PlayerStats(Base):
     was_fouled = Column(Integer)
     fouls_committed = Column(Integer)
 
-    # Ensure player_id and match_id only can appear once together in the table
+    # Ensure player_id and match_id only can appear once together in the table, its index also
+    # serves the lookups by player_id
     __table_args__ = (
         UniqueConstraint(
             "player_id", "match_id", name="unique_player_match_in_playerstats"
         ),
+        Index("playerstats_by_match", "match_id"),
     )
 
 class Matches(Base):
@@ -109,7 +112,13 @@ class Matches(Base):
     playerstats = relationship("PlayerStats", back_populates="match")
     matchstats = relationship("MatchStats", back_populates="match")
 
-    __table_args__ = (UniqueConstraint("id", name="unique_match_in_matches"),)
+    # Indexes of the match history queries in processing/, added by migration 1 in migrations.py
+    __table_args__ = (
+        UniqueConstraint("id", name="unique_match_in_matches"),
+        Index("matches_by_league_season_date", "league_id", "season", "date"),
+        Index("matches_by_home_team_date", "home_team_id", "date"),
+        Index("matches_by_away_team_date", "away_team_id", "date"),
+    )
 
 
 class MatchStats(Base):
@@ -163,6 +172,85 @@ class MatchStats(Base):
     aerial_duels_won = Column(Integer)
     successfull_dribbles = Column(Integer)
 
+    # One row per side of a match, the key of the upserts in writer/upsert.py
+    __table_args__ = (Index("unique_side_in_matchstats", "match_id", "side", unique=True),)
+
+
+# One row per team and match, kept in sync with matches by a trigger (migration 2 in migrations.py)
+class TeamMatches(Base):
+    __tablename__ = "team_matches"
+    team_id = Column(Integer, primary_key=True)
+    match_id = Column(Integer, ForeignKey("matches.id", ondelete="CASCADE"), primary_key=True)
+    opponent_id = Column(Integer)
+    league_id = Column(Integer)
+    season = Column(String, nullable=False)
+    date = Column(TIMESTAMP, nullable=False)
+    side = Column(String, nullable=False)  # home or away
+    goals_for = Column(Integer)
+    goals_against = Column(Integer)
+    points = Column(Integer)  # 3 for a win, 1 for a draw, 0 for a loss
+
+    __table_args__ = (
+        Index("team_matches_by_team_date", "team_id", "date"),
+        Index("team_matches_by_team_season_date", "team_id", "season", "date"),
+    )
+
+
+# Versions of migrations.py applied to the database
+class SchemaMigrations(Base):
+    __tablename__ = "schema_migrations"
+    version = Column(Integer, primary_key=True)
+    description = Column(String, nullable=False)
+    applied = Column(TIMESTAMP, nullable=False)
+
+
+# Crawl frontier of writer.py
+class CrawlSeasons(Base):
+    __tablename__ = "crawl_seasons"
+    league_id = Column(Integer, ForeignKey("leagues.id"), primary_key=True)
+    season = Column(String, primary_key=True)
+    listed = Column(TIMESTAMP, nullable=False)  # when the fixtures of the season were listed
+
+
+class CrawlFixtures(Base):
+    __tablename__ = "crawl_fixtures"
+    match_id = Column(Integer, primary_key=True)
+    league_id = Column(Integer, ForeignKey("leagues.id"), nullable=False)
+    season = Column(String, nullable=False)
+    link = Column(String, nullable=False)
+    state = Column(String, nullable=False)  # discovered, fetched, parsed, stored or failed
+    attempts = Column(Integer, nullable=False, default=0)  # failed attempts
+    error = Column(String)  # last error
+    updated = Column(TIMESTAMP, nullable=False)
+
+    __table_args__ = (Index("crawl_fixtures_by_season", "league_id", "season", "state"),)
+
+
+# Fixtures of writer.py that failed, until retry.py stores them
+class DeadLetters(Base):
+    __tablename__ = "dead_letters"
+    match_id = Column(Integer, primary_key=True)
+    link = Column(String, nullable=False)
+    league_id = Column(Integer, ForeignKey("leagues.id"))
+    season = Column(String, nullable=False)
+    stage = Column(String, nullable=False)  # fetch, parse or store
+    error_class = Column(String, nullable=False)
+    error = Column(String)  # last error
+    attempts = Column(Integer, nullable=False)  # failed attempts
+    first_failed = Column(TIMESTAMP, nullable=False)
+    last_failed = Column(TIMESTAMP, nullable=False)
+    next_retry = Column(TIMESTAMP, nullable=False)
+
+    __table_args__ = (Index("dead_letters_by_next_retry", "next_retry"),)
+
+
+# High-water marks of the incremental update.py
+class UpdateMarks(Base):
+    __tablename__ = "update_marks"
+    league_id = Column(Integer, ForeignKey("leagues.id"), primary_key=True)
+    played_until = Column(TIMESTAMP, nullable=False)  # every match of the league before it is stored
+    updated = Column(TIMESTAMP, nullable=False)
+
 
 # Processed data for model training
 class Processed0(Base):
@@ -206,6 +294,8 @@ class Schedule(Base):
     league_id = Column(Integer, ForeignKey("leagues.id"))
     home_team_id = Column(Integer, ForeignKey("teams.id"))
     away_team_id = Column(Integer, ForeignKey("teams.id"))
+
+    __table_args__ = (Index("schedule_by_league_date", "league_id", "date"),)
     
 class Upcoming(Base):
     __tablename__ = "upcoming"
@@ -0,0 +1,288 @@
+"""
+migrations.py
+
+Versioned migrations of the PostgreSQL schema.
+
+The tables in databaseClasses.py are created from the models, but a database that already
+exists does not pick up what is added to the models later. Every such change is also written
+down here as a migration with a version number. The versions applied to a database are kept in
+the schema_migrations table, and `migrate` applies the missing ones in order, each in its own
+transaction together with its row in schema_migrations, so a migration is applied completely or
+not at all.
+
+The statements are written so they also run on a database created from the current models,
+where the tables and indexes exist already. Run the migrations on a new database too, as the
+models cannot create what is not a table or an index, like the trigger of migration 2. Code that
+depends on a migration checks it with `require_migration`, e.g. the feature queries that read
+team_matches, which the models create empty.
+
+Usage:
+    python -m bettingAI.googleCloud.migrations [--list] [--target VERSION]
+"""
+
+import argparse
+import datetime as dt
+from typing import List, NamedTuple, Optional, Set
+
+import sqlalchemy
+from sqlalchemy import select, text
+
+from bettingAI.googleCloud.databaseClasses import SchemaMigrations
+from bettingAI.googleCloud.initPostgreSQL import get_engine
+
+
+INDEXES = 1  # the migration that creates the indexes, among them the key of the matchstats upserts
+TEAM_MATCHES = 2  # the migration that fills team_matches and keeps it in sync with matches
+UPDATE_MARKS = 3  # the migration that creates update_marks
+DEAD_LETTERS = 4  # the migration that creates dead_letters
+
+
+class MigrationMissing(RuntimeError):
+    """A migration the program depends on is not applied to the database."""
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    statements: List[str]
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "indexes for the match history queries",
+        [
+            # processing/queries.py and getInputs.py filter matches by league and season, and by
+            # a team on either side before a date
+            "CREATE INDEX IF NOT EXISTS matches_by_league_season_date ON matches (league_id, season, date)",
+            "CREATE INDEX IF NOT EXISTS matches_by_home_team_date ON matches (home_team_id, date)",
+            "CREATE INDEX IF NOT EXISTS matches_by_away_team_date ON matches (away_team_id, date)",
+            # The player performances of a match, lookups by player use unique_player_match_in_playerstats
+            "CREATE INDEX IF NOT EXISTS playerstats_by_match ON playerstats (match_id)",
+            # The two sides of a match, also the key of the upserts in writer/upsert.py
+            "CREATE UNIQUE INDEX IF NOT EXISTS unique_side_in_matchstats ON matchstats (match_id, side)",
+        ],
+    ),
+    Migration(
+        2,
+        "team_matches kept in sync with matches by a trigger",
+        [
+            # One row per team and match, so the features can read the matches of a team with a
+            # range scan instead of an OR over home_team_id and away_team_id
+            """
+            CREATE TABLE IF NOT EXISTS team_matches (
+                team_id INTEGER NOT NULL,
+                match_id INTEGER NOT NULL REFERENCES matches (id) ON DELETE CASCADE,
+                opponent_id INTEGER,
+                league_id INTEGER,
+                season VARCHAR NOT NULL,
+                date TIMESTAMP NOT NULL,
+                side VARCHAR NOT NULL,
+                goals_for INTEGER,
+                goals_against INTEGER,
+                points INTEGER,
+                PRIMARY KEY (team_id, match_id)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS team_matches_by_team_date ON team_matches (team_id, date)",
+            "CREATE INDEX IF NOT EXISTS team_matches_by_team_season_date ON team_matches (team_id, season, date)",
+            """
+            CREATE OR REPLACE FUNCTION sync_team_matches() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'UPDATE' AND (
+                    OLD.home_team_id IS DISTINCT FROM NEW.home_team_id
+                    OR OLD.away_team_id IS DISTINCT FROM NEW.away_team_id
+                ) THEN
+                    DELETE FROM team_matches WHERE match_id = OLD.id;
+                END IF;
+
+                INSERT INTO team_matches (
+                    team_id, match_id, opponent_id, league_id, season, date,
+                    side, goals_for, goals_against, points
+                )
+                SELECT
+                    s.team_id, NEW.id, s.opponent_id, NEW.league_id, NEW.season, NEW.date,
+                    s.side, s.goals_for, s.goals_against,
+                    CASE
+                        WHEN s.goals_for > s.goals_against THEN 3
+                        WHEN s.goals_for = s.goals_against THEN 1
+                        WHEN s.goals_for < s.goals_against THEN 0
+                    END
+                FROM (VALUES
+                    (NEW.home_team_id, NEW.away_team_id, 'home', NEW.home_goals, NEW.away_goals),
+                    (NEW.away_team_id, NEW.home_team_id, 'away', NEW.away_goals, NEW.home_goals)
+                ) AS s (team_id, opponent_id, side, goals_for, goals_against)
+                WHERE s.team_id IS NOT NULL
+                ON CONFLICT (team_id, match_id) DO UPDATE SET
+                    opponent_id = EXCLUDED.opponent_id,
+                    league_id = EXCLUDED.league_id,
+                    season = EXCLUDED.season,
+                    date = EXCLUDED.date,
+                    side = EXCLUDED.side,
+                    goals_for = EXCLUDED.goals_for,
+                    goals_against = EXCLUDED.goals_against,
+                    points = EXCLUDED.points;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS matches_sync_team_matches ON matches",
+            """
+            CREATE TRIGGER matches_sync_team_matches
+            AFTER INSERT OR UPDATE ON matches
+            FOR EACH ROW EXECUTE FUNCTION sync_team_matches()
+            """,
+            # The matches stored before the trigger
+            """
+            INSERT INTO team_matches (
+                team_id, match_id, opponent_id, league_id, season, date,
+                side, goals_for, goals_against, points
+            )
+            SELECT
+                s.team_id, m.id, s.opponent_id, m.league_id, m.season, m.date,
+                s.side, s.goals_for, s.goals_against,
+                CASE
+                    WHEN s.goals_for > s.goals_against THEN 3
+                    WHEN s.goals_for = s.goals_against THEN 1
+                    WHEN s.goals_for < s.goals_against THEN 0
+                END
+            FROM matches m
+            CROSS JOIN LATERAL (VALUES
+                (m.home_team_id, m.away_team_id, 'home', m.home_goals, m.away_goals),
+                (m.away_team_id, m.home_team_id, 'away', m.away_goals, m.home_goals)
+            ) AS s (team_id, opponent_id, side, goals_for, goals_against)
+            WHERE s.team_id IS NOT NULL
+            ON CONFLICT (team_id, match_id) DO NOTHING
+            """,
+        ],
+    ),
+    Migration(
+        3,
+        "high-water marks of the incremental update",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS update_marks (
+                league_id INTEGER NOT NULL REFERENCES leagues (id),
+                played_until TIMESTAMP NOT NULL,
+                updated TIMESTAMP NOT NULL,
+                PRIMARY KEY (league_id)
+            )
+            """,
+            # update.py reads the scheduled matches of a league after its mark
+            "CREATE INDEX IF NOT EXISTS schedule_by_league_date ON schedule (league_id, date)",
+        ],
+    ),
+    Migration(
+        4,
+        "dead letters of the failed fixtures",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS dead_letters (
+                match_id INTEGER NOT NULL,
+                link VARCHAR NOT NULL,
+                league_id INTEGER REFERENCES leagues (id),
+                season VARCHAR NOT NULL,
+                stage VARCHAR NOT NULL,
+                error_class VARCHAR NOT NULL,
+                error VARCHAR,
+                attempts INTEGER NOT NULL,
+                first_failed TIMESTAMP NOT NULL,
+                last_failed TIMESTAMP NOT NULL,
+                next_retry TIMESTAMP NOT NULL,
+                PRIMARY KEY (match_id)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS dead_letters_by_next_retry ON dead_letters (next_retry)",
+        ],
+    ),
+]
+
+
+def applied_versions(connection: sqlalchemy.engine.Connection) -> Set[int]:
+    """Returns the versions applied to the database, creating schema_migrations if needed."""
+    SchemaMigrations.__table__.create(connection, checkfirst=True)
+    return set(connection.scalars(select(SchemaMigrations.version)))
+
+
+def require_migration(session: sqlalchemy.orm.Session, version: int) -> None:
+    """Checks that a migration is applied to the database of the session.
+
+    Unlike `applied_versions` nothing is created, a database without schema_migrations has no
+    migration applied.
+
+    Args:
+        session (sqlalchemy.orm.Session): The database session object used for database operations.
+        version (int): The version of the migration.
+
+    Raises:
+        MigrationMissing: If the migration is not applied.
+    """
+    connection = session.connection()
+    if sqlalchemy.inspect(connection).has_table(SchemaMigrations.__tablename__):
+        applied = connection.scalar(select(SchemaMigrations.version).where(SchemaMigrations.version == version))
+        if applied is not None:
+            return
+    description = next((migration.description for migration in MIGRATIONS if migration.version == version), "")
+    raise MigrationMissing(
+        f"Migration {version} ({description}) is not applied to the database, "
+        "run python -m bettingAI.googleCloud.migrations"
+    )
+
+
+def migrate(
+    engine: Optional[sqlalchemy.engine.Engine] = None, target: Optional[int] = None
+) -> List[Migration]:
+    """Applies the migrations the database is missing, in order of their version.
+
+    Args:
+        engine (sqlalchemy.engine.Engine, optional): The database. Defaults to the engine of initPostgreSQL.
+        target (int, optional): The last version to apply. Defaults to the latest.
+
+    Returns:
+        List[Migration]: The migrations applied.
+    """
+    engine = engine if engine is not None else get_engine()
+    with engine.begin() as connection:
+        applied = applied_versions(connection)
+
+    done = []
+    for migration in sorted(MIGRATIONS, key=lambda migration: migration.version):
+        if migration.version in applied or (target is not None and migration.version > target):
+            continue
+        with engine.begin() as connection:
+            for statement in migration.statements:
+                connection.execute(text(statement))
+            connection.execute(
+                SchemaMigrations.__table__.insert().values(
+                    version=migration.version,
+                    description=migration.description,
+                    applied=dt.datetime.now(),
+                )
+            )
+        done.append(migration)
+    return done
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply the missing schema migrations to the database.")
+    parser.add_argument("--list", action="store_true", help="only list the migrations and whether they are applied")
+    parser.add_argument("--target", type=int, help="last version to apply")
+    args = parser.parse_args()
+
+    if args.list:
+        with get_engine().begin() as connection:
+            applied = applied_versions(connection)
+        for migration in MIGRATIONS:
+            state = "applied" if migration.version in applied else "pending"
+            print(f"{migration.version:>4} {state:>8}  {migration.description}")
+        return
+
+    done = migrate(target=args.target)
+    for migration in done:
+        print(f"Applied {migration.version}: {migration.description}")
+    if not done:
+        print("The database is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Union
 import sqlalchemy
 from sqlalchemy import text
 import textdistance
@@ -9,7 +9,9 @@ import numpy as np
 
 from bettingAI.googleCloud.databaseClasses import Upcoming, Bets, Performance
 from bettingAI.processing.features import features_for_model0, features_for_model1
+from bettingAI.processing.history import MatchHistory
 from bettingAI.writer.scraper import get_match_info
+from bettingAI.writer.metrics import timed
 
 
 def add_match_to_bets(
@@ -108,7 +110,7 @@ def calculate_advice_and_strength(
     team_names: list, 
     model: tf.keras.Model,
     model_id: int, 
-    session: sqlalchemy.orm.Session
+    session: Union[sqlalchemy.orm.Session, MatchHistory]
     ) -> Tuple[
         Optional[str], 
         Optional[float], 
@@ -123,7 +125,8 @@ def calculate_advice_and_strength(
         team_names (list): A list of team names for the match.
         model (tf.keras.Model): A TensorFlow model to predict the match outcome.
         model_id (int): The id for the model used.
-        session (sqlalchemy.orm.Session): SQLAlchemy Session object connected to the database.
+        session (Union[sqlalchemy.orm.Session, MatchHistory]): SQLAlchemy Session object connected to the database,
+            or the MatchHistory to compute the features from (see processing/history.py).
 
     Returns:
         Tuple[Optional[str], Optional[float], Optional[List[float]], Optional[List[float]], Optional[List[float]], Optional[float]]:
@@ -137,31 +140,33 @@ def calculate_advice_and_strength(
             Returns (None, None, None, None, None, None) if no matched odds are found.
     """
     # Get the inputs for the correct model
-    if model_id == 0:
-        input_data = np.array(
-            features_for_model0(
-                int(match.home_team_id),
-                int(match.away_team_id),
-                match.season,
-                "home",
-                match.date,
-                session
-            )
-        ).reshape(1, -1)  # Reshape the input data into the expected format
-    elif model_id == 1:
-        input_data = np.array(
-            features_for_model1(
-                int(match.home_team_id),
-                int(match.away_team_id),
-                match.league_id, 
-                match.season,
-                "home",
-                match.date,
-                session
-            )
-        ).reshape(1, -1)  # Reshape the input data into the expected format
-
-    probabilities = model.predict(input_data)
+    with timed("features"):
+        if model_id == 0:
+            input_data = np.array(
+                features_for_model0(
+                    int(match.home_team_id),
+                    int(match.away_team_id),
+                    match.season,
+                    "home",
+                    match.date,
+                    session
+                )
+            ).reshape(1, -1)  # Reshape the input data into the expected format
+        elif model_id == 1:
+            input_data = np.array(
+                features_for_model1(
+                    int(match.home_team_id),
+                    int(match.away_team_id),
+                    match.league_id, 
+                    match.season,
+                    "home",
+                    match.date,
+                    session
+                )
+            ).reshape(1, -1)  # Reshape the input data into the expected format
+
+    with timed("predict"):
+        probabilities = model.predict(input_data)
     real_odds = calculate_real_odds(probabilities[0])
 
     # Get the team names from the team IDs
@@ -12,6 +12,7 @@ from bettingAI.googleCloud.initPostgreSQL import initSession
 from bettingAI.processing.features import features_for_model0
 from bettingAI.oddsapi.odds import get_odds
 from bettingAI.prediction.helpers import *
+from bettingAI.writer.metrics import write_report
 
 
 def upcoming(
@@ -129,5 +130,8 @@ if __name__ == "__main__":
     # run program
     upcoming(session, model)
 
+    # write the timings of the features and predictions
+    write_report("upcoming")
+
 
     
\ No newline at end of file
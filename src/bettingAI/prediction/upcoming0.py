@@ -10,8 +10,10 @@ from tensorflow.keras.models import load_model
 
 from bettingAI.googleCloud.initPostgreSQL import initSession
 from bettingAI.processing.features import features_for_model0, features_for_model1
+from bettingAI.processing.history import MatchHistory
 from bettingAI.oddsapi.odds import get_odds
 from bettingAI.prediction.helpers import *
+from bettingAI.writer.metrics import write_report
 
 
 def upcoming(
@@ -47,6 +49,7 @@ def upcoming(
     upcoming_matches = get_upcoming_match_ids(session)
 
     team_names = get_team_names(session)
+    history = MatchHistory(session)  # the features are computed from memory, with the league tables replayed once
 
     # Extract all distinct league_id values from matches
     # distinct_league_ids = list(set([match.league_id for match in matches]))
@@ -72,7 +75,7 @@ def upcoming(
                         team_names,
                         model,
                         0,
-                        session
+                        history
                     )
 
                     if advice is not None and strength is not None:
@@ -109,7 +112,7 @@ def upcoming(
                     team_names,
                     model,
                     0,
-                    session,
+                    history,
                     )
                 if advice is None:
                     continue
@@ -146,7 +149,7 @@ def upcoming(
                             match.season, 
                             "home", 
                             match.date, 
-                            session
+                            history
                             )
                 inputs1 = features_for_model1(
                             int(match.home_team_id), 
@@ -155,7 +158,7 @@ def upcoming(
                             match.season, 
                             "home", 
                             match.date, 
-                            session
+                            history
                             )
                 add_match_to_upcoming(session, match, inputs0, inputs1)
             except Exception as e:
@@ -170,7 +173,7 @@ def upcoming(
                     team_names,
                     model,
                     0,
-                    session
+                    history
                     )
 
                 if advice is not None and strength is not None:
@@ -215,5 +218,8 @@ if __name__ == "__main__":
     # run program
     upcoming(session, model0)
 
+    # write the timings of the features and predictions
+    write_report("upcoming0")
+
 
     
\ No newline at end of file
@@ -10,8 +10,10 @@ from tensorflow.keras.models import load_model
 
 from bettingAI.googleCloud.initPostgreSQL import initSession
 from bettingAI.processing.features import features_for_model0, features_for_model1
+from bettingAI.processing.history import MatchHistory
 from bettingAI.oddsapi.odds import get_odds
 from bettingAI.prediction.helpers import *
+from bettingAI.writer.metrics import write_report
 
 def upcoming(
     session: sqlalchemy.orm.Session,
@@ -46,6 +48,7 @@ def upcoming(
     upcoming_matches = get_upcoming_match_ids(session)
 
     team_names = get_team_names(session)
+    history = MatchHistory(session)  # the features are computed from memory, with the league tables replayed once
 
     # Extract all distinct league_id values from matches
     distinct_league_ids = [47, 53, 54, 55, 59]
@@ -70,7 +73,7 @@ def upcoming(
                         team_names,
                         model,
                         1,
-                        session
+                        history
                     )
 
                     if advice is not None and strength is not None:
@@ -107,7 +110,7 @@ def upcoming(
                     team_names,
                     model,
                     1,
-                    session,
+                    history,
                     )
                 if advice is None:
                     continue
@@ -143,7 +146,7 @@ def upcoming(
                         match.season, 
                         "home", 
                         match.date, 
-                        session
+                        history
                         )
             inputs1 = features_for_model1(
                         int(match.home_team_id), 
@@ -152,7 +155,7 @@ def upcoming(
                         match.season,
                         "home", 
                         match.date, 
-                        session
+                        history
                         )
             add_match_to_upcoming(session, match, inputs0, inputs1)
         
@@ -164,7 +167,7 @@ def upcoming(
                     team_names,
                     model,
                     1,
-                    session
+                    history
                     )
 
                 if advice is not None and strength is not None:
@@ -207,4 +210,7 @@ if __name__ == "__main__":
     session = initSession()
 
     # run program
-    upcoming(session, model1)
\ No newline at end of file
+    upcoming(session, model1)
+
+    # write the timings of the features and predictions
+    write_report("upcoming1")
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""
+explain.py
+
+EXPLAIN benchmark of the match history queries behind the model features.
+
+Every feature query is run for a sample of matches from the database while the SQL it sends is
+recorded. Each recorded statement is then planned again with EXPLAIN (FORMAT JSON), and the
+indexes the plan reads are listed per query, together with the sequential scans of matches,
+team_matches, matchstats and playerstats. With --analyze the statements are executed too and the time they
+take is reported.
+
+The planner only uses an index where it is cheaper than reading the table, so a small test
+database may be planned with sequential scans anyway. Use --no-seqscan there to prove the
+indexes of migrations.py can serve the queries, and run it without on the real database to see
+the plans it actually gets.
+
+The program exits with status 1 if any query reads one of these tables with a sequential scan,
+so it can check a database after `python -m bettingAI.googleCloud.migrations`.
+
+Usage:
+    python -m bettingAI.processing.explain [--samples N] [--analyze] [--no-seqscan]
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from bettingAI.googleCloud.initPostgreSQL import initSession
+from bettingAI.processing.getInputs import (
+    get_combined_team_stats,
+    get_league_features,
+    get_match_info,
+    get_recent_stats,
+)
+from bettingAI.processing.queries import query_H2H, query_recent_form
+
+HOT_TABLES = {"matches", "team_matches", "matchstats", "playerstats"}
+
+# The feature queries, called with a session and a row of the matches table
+QUERIES: Dict[str, Callable[[Session, Any], Any]] = {
+    "query_recent_form": lambda session, m: query_recent_form(
+        m.home_team_id, m.away_team_id, m.date, m.season, session
+    ),
+    "query_H2H": lambda session, m: query_H2H(m.home_team_id, m.away_team_id, m.date, session),
+    "get_match_info": lambda session, m: get_match_info(
+        m.home_team_id, m.away_team_id, m.league_id, m.date, m.season, session
+    ),
+    "get_combined_team_stats": lambda session, m: get_combined_team_stats(
+        [m.home_team_id, m.away_team_id], m.season, ["home", "away"], m.date, session
+    ),
+    "get_recent_stats": lambda session, m: get_recent_stats(
+        m.home_team_id, m.away_team_id, m.season, m.date, session
+    ),
+    "get_league_features": lambda session, m: get_league_features(m.league_id, m.season, session),
+    "match stats": lambda session, m: session.execute(
+        text("SELECT * FROM matchstats WHERE match_id = :id AND side = 'home'"), {"id": m.id}
+    ).all(),
+    "player stats of a match": lambda session, m: session.execute(
+        text("SELECT * FROM playerstats WHERE match_id = :id"), {"id": m.id}
+    ).all(),
+    "player stats of a player": lambda session, m: session.execute(
+        text(
+            "SELECT * FROM playerstats WHERE player_id = "
+            "(SELECT player_id FROM playerstats WHERE match_id = :id LIMIT 1)"
+        ),
+        {"id": m.id},
+    ).all(),
+}
+
+
+def sample_matches(session: Session, samples: int) -> List[Any]:
+    """Returns matches spread evenly over the dates in the database."""
+    return session.execute(
+        text(
+            """
+            SELECT DISTINCT ON (part) id, home_team_id, away_team_id, league_id, season, date
+            FROM (
+                SELECT *, NTILE(:samples) OVER (ORDER BY date) AS part
+                FROM matches
+            ) m
+            ORDER BY part, date
+            """
+        ),
+        {"samples": samples},
+    ).all()
+
+
+def record(session: Session, query: Callable[[Session, Any], Any], match: Any) -> List[Tuple[str, Any]]:
+    """Runs a feature query and returns the statements it sent, with their parameters."""
+    statements = []
+
+    def before(connection, cursor, statement, parameters, context, executemany) -> None:
+        statements.append((statement, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        query(session, match)
+    except ValueError:  # raised by the features when there is too little history
+        pass
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+    return statements
+
+
+def plan_nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Yields every node of a JSON query plan."""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(session: Session, statement: str, parameters: Any, analyze: bool) -> Dict[str, Any]:
+    """Returns the JSON plan of a statement as sent to the driver."""
+    options = "ANALYZE, FORMAT JSON" if analyze else "FORMAT JSON"
+    connection = session.connection()
+    result = connection.exec_driver_sql(f"EXPLAIN ({options}) {statement}", parameters).scalar()
+    return (json.loads(result) if isinstance(result, str) else result)[0]
+
+
+def run(samples: int = 5, analyze: bool = False, seqscan: bool = True) -> int:
+    """Explains every feature query for a sample of matches and prints the indexes they use.
+
+    Args:
+        samples (int, optional): Number of matches to run the queries for. Defaults to 5.
+        analyze (bool, optional): Execute the statements and report their time. Defaults to False.
+        seqscan (bool, optional): Let the planner use sequential scans. Defaults to True.
+
+    Returns:
+        int: The number of queries that read one of HOT_TABLES sequentially.
+    """
+    session = initSession()
+    if not seqscan:
+        session.execute(text("SET enable_seqscan = off"))  # for the session's transaction
+    matches = sample_matches(session, samples)
+    print(f"Explaining {len(QUERIES)} queries for {len(matches)} matches")
+
+    scanning = 0
+    for name, query in QUERIES.items():
+        indexes, scans, times = set(), set(), []
+        for match in matches:
+            for statement, parameters in record(session, query, match):
+                plan = explain(session, statement, parameters, analyze)
+                for node in plan_nodes(plan["Plan"]):
+                    if "Index Name" in node:
+                        indexes.add(node["Index Name"])
+                    if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in HOT_TABLES:
+                        scans.add(node["Relation Name"])
+                if analyze:
+                    times.append(plan["Execution Time"])
+
+        line = f"{name:>26}: {', '.join(sorted(indexes)) or 'no index'}"
+        if scans:
+            scanning += 1
+            line += f"  SEQ SCAN of {', '.join(sorted(scans))}"
+        if times:
+            line += f"  {sum(times) / len(times):.2f} ms per statement"
+        print(line)
+
+    session.rollback()
+    session.close()
+    return scanning
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Show the indexes the feature queries are planned with.")
+    parser.add_argument("--samples", type=int, default=5, help="matches to run the queries for")
+    parser.add_argument("--analyze", action="store_true", help="execute the statements and time them")
+    parser.add_argument("--no-seqscan", action="store_true", help="discourage sequential scans, for small databases")
+    args = parser.parse_args()
+
+    if run(args.samples, args.analyze, not args.no_seqscan):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
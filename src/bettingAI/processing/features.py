@@ -1,8 +1,9 @@
-from typing import Any, List, Union
+from typing import Any, List, Optional, Union
 import sqlalchemy
 
 from bettingAI.googleCloud.databaseClasses import *
 from bettingAI.processing.getInputs import *
+from bettingAI.processing.history import MatchHistory
 from bettingAI.processing.queries import *
 
 
@@ -22,7 +23,8 @@ def features_for_model0(
     - season (str): The season of the match.
     - thisSide (str): The side of the team (home or away).
     - date (str): The date of the match.
-    - session (Any): SQLAlchemy session object for interacting with the database.
+    - session (Any): SQLAlchemy session object for interacting with the database, or a MatchHistory
+      to compute the features from memory (see history.py).
 
     Returns:
     - features (List[float]): A list of float values representing the features.
@@ -91,7 +93,8 @@ def features_for_model1(
     season: str,
     thisSide: str,
     match_date: str,
-    session: Any
+    session: Any,
+    form: Optional[List[float]] = None
 ) -> List[float]:
         
     otherSide = "away" if thisSide == "home" else "home"
@@ -100,18 +103,21 @@ def features_for_model1(
     features = [1] if thisSide == "home" else [0] # init features list with home/away
     features += get_match_info(teamID, opponentID, leagueID, match_date, season, session)
 
-    # 4-27 SEASON STATS
-    team_ids = [teamID, opponentID]
-    sides = [thisSide, otherSide]
-    features += get_combined_team_stats(team_ids, season, sides, match_date, session)
-    
-    # 28-61 RECENT FORM
-    features += get_recent_stats(teamID, opponentID, season, match_date, session) # 28 - 51
-
-    matches = query_recent_form(teamID, opponentID, match_date, season, session)
-    features += get_points_won_ratio_1(team_ids, matches) # 52-61
-    features += get_teams_outcome_streak(team_ids, matches)
-    features += get_teams_home_away_form({teamID: thisSide, opponentID: otherSide}, matches)
+    if form is not None: # 4-61 already computed by the database, see windowed.py
+        features += form
+    else:
+        # 4-27 SEASON STATS
+        team_ids = [teamID, opponentID]
+        sides = [thisSide, otherSide]
+        features += get_combined_team_stats(team_ids, season, sides, match_date, session)
+
+        # 28-61 RECENT FORM
+        features += get_recent_stats(teamID, opponentID, season, match_date, session) # 28 - 51
+
+        matches = query_recent_form(teamID, opponentID, match_date, season, session)
+        features += get_points_won_ratio_1(team_ids, matches) # 52-61
+        features += get_teams_outcome_streak(team_ids, matches)
+        features += get_teams_home_away_form({teamID: thisSide, opponentID: otherSide}, matches)
     
     # 62-79 H2H
     matches = query_H2H(teamID, opponentID, match_date, session)
@@ -139,7 +145,7 @@ def labels(matchID: int,
     Parameters:
     - matchID (int): The ID of the match.
     - team_id (int): The ID of the team.
-    - session (Session): SQLAlchemy session object for interacting with the database.
+    - session (Session): SQLAlchemy session object for interacting with the database, or a MatchHistory.
 
     Returns:
     - labels (List[int]): A list of integer labels indicating the match outcomes.
@@ -155,7 +161,10 @@ def labels(matchID: int,
 
     """
     # Query the Matches table for the match with the given matchID
-    match = session.query(Matches).filter(Matches.id == matchID).one()
+    if isinstance(session, MatchHistory):
+        match = session.match(matchID)
+    else:
+        match = session.query(Matches).filter(Matches.id == matchID).one()
 
     home_goals = match.home_goals
     away_goals = match.away_goals
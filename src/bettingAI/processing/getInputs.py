@@ -1,5 +1,4 @@
 from typing import List, Tuple, Dict, Union, Any
-import itertools
 from datetime import datetime, timedelta
 
 from sqlalchemy import and_, or_, text
@@ -7,9 +6,18 @@ from sqlalchemy.orm.session import Session
 
 from bettingAI.googleCloud.databaseClasses import *
 from bettingAI.processing.helpers import euros_to_number, get_outcome
+from bettingAI.processing.history import MatchHistory
+from bettingAI.processing.queries import query_team_matches
 
 # Main info
 def get_match_info(team_id: int, opponent_id: int, league_id: int, match_date: str, season: str, session: Session):
+    if isinstance(session, MatchHistory):
+        # The table as it stood before the match, from the standings replayed once per league and season
+        table = session.standings(league_id, season).as_of(match_date)
+        if len(table) not in [16, 18, 20]:
+            raise ValueError("Could not create complete table (most commonly because it's the first match)")
+        return [table[team_id].games / 38, table[team_id].rank, table[opponent_id].rank]
+
     # Fetch the games played and points for all teams in the league up to the match date
     query = text("""
         SELECT
@@ -76,19 +84,8 @@ def get_combined_team_stats(
                 f"Invalid side argument '{side}'. Valid options are 'home' and 'away'"
             )
 
-    matches = (
-        session.query(Matches)
-        .filter(
-            and_(
-                or_(
-                    Matches.home_team_id.in_(team_ids), Matches.away_team_id.in_(team_ids)
-                ),
-                Matches.season == season,
-                Matches.date < date,
-            )
-        )
-        .all()
-    )
+    # One row per team and match, for both teams
+    matches = query_team_matches(team_ids, date, session, season=season)
 
     team_stats = {
         team_id: {
@@ -109,34 +106,29 @@ def get_combined_team_stats(
     }
 
     for match in matches:
-        for team_id, side in itertools.product(team_ids, sides):
-            is_home = match.home_team_id == team_id
-            is_away = match.away_team_id == team_id
-            side_filter = is_home if side == "home" else is_away
-
-            if side_filter:
-                stats = team_stats[team_id][side]
-                stats["match_count"] += 1
-
-                goals_scored = match.home_goals if is_home else match.away_goals
-                goals_conceded = match.away_goals if is_home else match.home_goals
-
-                stats["total_goals"] += goals_scored
-                stats["total_conceded_goals"] += goals_conceded
-                stats["total_goal_difference"] += goals_scored - goals_conceded
-
-                if goals_scored > goals_conceded:
-                    stats["win_count"] += 1
-                elif goals_scored == goals_conceded:
-                    stats["draw_count"] += 1
-                else:
-                    stats["loss_count"] += 1
+        if match.side in sides:
+            stats = team_stats[match.team_id][match.side]
+            stats["match_count"] += 1
+
+            goals_scored = match.goals_for
+            goals_conceded = match.goals_against
+
+            stats["total_goals"] += goals_scored
+            stats["total_conceded_goals"] += goals_conceded
+            stats["total_goal_difference"] += goals_scored - goals_conceded
+
+            if goals_scored > goals_conceded:
+                stats["win_count"] += 1
+            elif goals_scored == goals_conceded:
+                stats["draw_count"] += 1
+            else:
+                stats["loss_count"] += 1
 
-                if goals_conceded == 0:
-                    stats["clean_sheet_count"] += 1
+            if goals_conceded == 0:
+                stats["clean_sheet_count"] += 1
 
-                if goals_scored == 0:
-                    stats["no_goals_count"] += 1 
+            if goals_scored == 0:
+                stats["no_goals_count"] += 1 
 
     for team_id in team_ids:
         for side in sides:
@@ -287,49 +279,25 @@ def get_average_player_value(
 # Recent form
 def get_recent_stats(team_id: int, opponent_id: int, season: str, date: datetime, session: Session) -> List[float]:
     # Get last 10 games for both teams before the given date
-    team_matches = (
-        session.query(Matches)
-        .filter(
-            and_(
-                or_(Matches.home_team_id == team_id, Matches.away_team_id == team_id),
-                Matches.date < date,
-                Matches.season == season,
-            )
-        )
-        .order_by(Matches.date.desc())
-        .limit(10)
-        .all()
-    )
-
-    opponent_matches = (
-        session.query(Matches)
-        .filter(
-            and_(
-                or_(Matches.home_team_id == opponent_id, Matches.away_team_id == opponent_id),
-                Matches.date < date,
-            )
-        )
-        .order_by(Matches.date.desc())
-        .limit(10)
-        .all()
-    )
+    team_matches = query_team_matches([team_id], date, session, season=season, limit=10)
+    opponent_matches = query_team_matches([opponent_id], date, session, limit=10)
 
-    def calculate_stats(matches: List[Matches], team_id: int) -> List[float]:
+    def calculate_stats(matches: List[TeamMatches]) -> List[float]:
         stats = []
 
         for num_games in [3, 5, 10]:
             games = matches[:num_games]
-            goals_scored = sum(match.home_goals if match.home_team_id == team_id else match.away_goals for match in games) / num_games
-            no_goal_games = sum(1 for match in games if (match.home_goals if match.home_team_id == team_id else match.away_goals) == 0) / num_games
-            goals_diff = sum((match.home_goals - match.away_goals) if match.home_team_id == team_id else (match.away_goals - match.home_goals) for match in games) / num_games
-            goals_conceded = sum(match.away_goals if match.home_team_id == team_id else match.home_goals for match in games) / num_games
+            goals_scored = sum(match.goals_for for match in games) / num_games
+            no_goal_games = sum(1 for match in games if match.goals_for == 0) / num_games
+            goals_diff = sum(match.goals_for - match.goals_against for match in games) / num_games
+            goals_conceded = sum(match.goals_against for match in games) / num_games
 
             stats.extend([goals_scored, no_goal_games, goals_diff, goals_conceded])
 
         return stats
 
-    team_stats = calculate_stats(team_matches, team_id)
-    opponent_stats = calculate_stats(opponent_matches, opponent_id)
+    team_stats = calculate_stats(team_matches)
+    opponent_stats = calculate_stats(opponent_matches)
     
     return team_stats + opponent_stats
 
@@ -1036,16 +1004,22 @@ def get_condition_features(teamID: int, opponentID: int, match_date: datetime, m
 def get_league_features(league_id: int, season: str, session: Any) -> List[float]:
     """Computes league related features."""
     
-    league = session.query(Leagues).filter_by(id=league_id).first()
+    if isinstance(session, MatchHistory):
+        league = session.league(league_id)
+    else:
+        league = session.query(Leagues).filter_by(id=league_id).first()
 
     if not league:
         raise ValueError(f"No league found with id {league_id}")  # League not found
 
-    matches = (
-        session.query(Matches)
-        .filter_by(league_id=league_id, season=season)
-        .all()
-    )
+    if isinstance(session, MatchHistory):
+        matches = session.league_matches(league_id, season)
+    else:
+        matches = (
+            session.query(Matches)
+            .filter_by(league_id=league_id, season=season)
+            .all()
+        )
 
     if not matches:
         raise ValueError(f"No matches found for league with id {league_id} in season {season}") 
@@ -0,0 +1,238 @@
+"""
+history.py
+
+In-memory store of the matches table, sorted by date, to use in place of the session in features.py.
+
+The queries of queries.py and getInputs.py all ask for the matches of a team, or of two teams,
+before a date: this season, the last n, or against each other. `MatchHistory` reads the matches
+table once and keeps the matches of every team, every team and season, every pair of teams and
+every league and season in date order, so each of these questions is a bisect and a slice
+instead of a round trip to the database. The league tables come from the standings of
+standings.py.
+
+Pass a MatchHistory as the session of `features_for_model0`, `features_for_model1` and `labels`,
+and the query functions answer from it. Its rows have the attributes of Matches and TeamMatches
+that the features read, and come in the same order as the queries return them.
+
+Example:
+    history = MatchHistory(session)
+    inputs = features_for_model1(8456, 9825, 47, "2022-2023", "home", date, history)
+    history.last_n([8456], date, 5)
+"""
+
+import datetime as dt
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Generic, Iterable, List, NamedTuple, Optional, Tuple, TypeVar
+
+import sqlalchemy
+from sqlalchemy import select
+from sqlalchemy.exc import NoResultFound
+
+from bettingAI.googleCloud.databaseClasses import Leagues, Matches, Teams
+from bettingAI.processing.standings import Standings
+
+
+class MatchRow(NamedTuple):
+    """A row of matches."""
+
+    id: int
+    home_team_id: int
+    away_team_id: int
+    league_id: int
+    season: str
+    date: dt.datetime
+    home_goals: Optional[int]
+    away_goals: Optional[int]
+
+
+class TeamMatchRow(NamedTuple):
+    """A row of team_matches, a match seen from one of its teams."""
+
+    team_id: int
+    match_id: int
+    opponent_id: int
+    league_id: int
+    season: str
+    date: dt.datetime
+    side: str
+    goals_for: Optional[int]
+    goals_against: Optional[int]
+    points: Optional[int]
+
+
+class LeagueRow(NamedTuple):
+    """The columns of leagues the features read."""
+
+    id: int
+    name: str
+    level: int
+
+
+Row = TypeVar("Row", MatchRow, TeamMatchRow)
+
+
+class _Timeline(Generic[Row]):
+    """Rows in date order, with their dates alongside for bisect."""
+
+    def __init__(self) -> None:
+        self.dates: List[dt.datetime] = []
+        self.rows: List[Row] = []
+
+    def add(self, row: Row) -> None:
+        index = bisect_right(self.dates, row.date)  # after the rows of the same date, so loading in order appends
+        self.dates.insert(index, row.date)
+        self.rows.insert(index, row)
+
+    def before(self, date: Any) -> List[Row]:
+        """Returns the rows before the date, oldest first."""
+        return self.rows[: bisect_left(self.dates, date)]
+
+
+def _points(goalsFor: Optional[int], goalsAgainst: Optional[int]) -> Optional[int]:
+    if goalsFor is None or goalsAgainst is None:
+        return None
+    return 3 if goalsFor > goalsAgainst else 1 if goalsFor == goalsAgainst else 0
+
+
+def _latest_first(rows: Iterable[Row]) -> List[Row]:
+    # Matches of a team at the same time, e.g. a replayed fixture, the later match ID first, like the timelines
+    return sorted(rows, key=lambda row: (row.date, row.match_id if isinstance(row, TeamMatchRow) else row.id), reverse=True)
+
+
+class MatchHistory:
+    """The matches table in memory, read once from the session.
+
+    Args:
+        session (sqlalchemy.orm.Session): The database session object used for database operations.
+    """
+
+    def __init__(self, session: sqlalchemy.orm.Session) -> None:
+        self._matches: Dict[int, MatchRow] = {}
+        self._teams: Dict[int, _Timeline[TeamMatchRow]] = {}
+        self._teamSeasons: Dict[Tuple[int, str], _Timeline[TeamMatchRow]] = {}
+        self._seasonMatches: Dict[Tuple[int, str], _Timeline[MatchRow]] = {}  # by team and season
+        self._pairs: Dict[Tuple[int, int], _Timeline[MatchRow]] = {}
+        self._leagueSeasons: Dict[Tuple[int, str], _Timeline[MatchRow]] = {}
+        self._standings: Dict[Tuple[int, str], Standings] = {}  # replayed on first use
+
+        self.leagues = {
+            row.id: LeagueRow(*row) for row in session.execute(select(Leagues.id, Leagues.name, Leagues.level))
+        }
+        self.teamIDs = set(session.scalars(select(Teams.id)))
+        rows = session.execute(
+            select(
+                Matches.id,
+                Matches.home_team_id,
+                Matches.away_team_id,
+                Matches.league_id,
+                Matches.season,
+                Matches.date,
+                Matches.home_goals,
+                Matches.away_goals,
+            ).order_by(Matches.date, Matches.id)
+        )
+        for row in rows:
+            self.add(MatchRow(*row))
+
+    def add(self, match: MatchRow) -> None:
+        """Adds a match, e.g. one stored after the history was read."""
+        self._matches[match.id] = match
+        self._standings.pop((match.league_id, match.season), None)  # replayed again with the match
+        self._leagueSeasons.setdefault((match.league_id, match.season), _Timeline()).add(match)
+        if match.home_team_id is not None and match.away_team_id is not None:
+            self._pairs.setdefault(tuple(sorted([match.home_team_id, match.away_team_id])), _Timeline()).add(match)
+        for teamID, opponentID, side, goalsFor, goalsAgainst in [
+            (match.home_team_id, match.away_team_id, "home", match.home_goals, match.away_goals),
+            (match.away_team_id, match.home_team_id, "away", match.away_goals, match.home_goals),
+        ]:
+            if teamID is None:
+                continue
+            teamMatch = TeamMatchRow(
+                teamID,
+                match.id,
+                opponentID,
+                match.league_id,
+                match.season,
+                match.date,
+                side,
+                goalsFor,
+                goalsAgainst,
+                _points(goalsFor, goalsAgainst),
+            )
+            self._teams.setdefault(teamID, _Timeline()).add(teamMatch)
+            self._teamSeasons.setdefault((teamID, match.season), _Timeline()).add(teamMatch)
+            self._seasonMatches.setdefault((teamID, match.season), _Timeline()).add(match)
+
+    def team_matches(
+        self,
+        teamIDs: List[int],
+        date: Any,
+        season: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[TeamMatchRow]:
+        """Returns the matches of the teams before the date, latest first, like `query_team_matches`.
+
+        Args:
+            teamIDs (List[int]): The IDs of the teams.
+            date (Any): Only the matches before this date.
+            season (str, optional): Only the matches of this season. Defaults to all seasons.
+            limit (int, optional): The maximum number of rows, over all teams. Defaults to all rows.
+        """
+        rows = []
+        for teamID in teamIDs:
+            timeline = self._teams.get(teamID) if season is None else self._teamSeasons.get((teamID, season))
+            if timeline is not None:
+                rows += timeline.before(date)[-limit:] if limit else timeline.before(date)
+        return _latest_first(rows)[:limit]
+
+    def season_to_date(self, teamIDs: List[int], date: Any, season: str) -> List[TeamMatchRow]:
+        """Returns the matches of the teams this season before the date, latest first."""
+        return self.team_matches(teamIDs, date, season=season)
+
+    def last_n(self, teamIDs: List[int], date: Any, n: int, season: Optional[str] = None) -> List[TeamMatchRow]:
+        """Returns the last n matches of the teams before the date, latest first."""
+        return self.team_matches(teamIDs, date, season=season, limit=n)
+
+    def recent_form(self, teamID: int, opponentID: int, date: Any, season: str) -> List[MatchRow]:
+        """Returns the matches of either team this season before the date, latest first, like `query_recent_form`."""
+        matches = {}
+        for id in [teamID, opponentID]:
+            timeline = self._seasonMatches.get((id, season))
+            if timeline is not None:
+                matches.update((match.id, match) for match in timeline.before(date))
+        return _latest_first(matches.values())
+
+    def h2h(self, teamID: int, opponentID: int, date: Any) -> Optional[List[MatchRow]]:
+        """Returns the matches between the teams before the date, latest first, or None, like `query_H2H`."""
+        timeline = self._pairs.get(tuple(sorted([teamID, opponentID])))
+        matches = timeline.before(date)[::-1] if timeline is not None else []
+        return matches if matches else None
+
+    def standings(self, leagueID: int, season: str) -> Standings:
+        """Returns the standings of a league and season, replayed on first use (see standings.py).
+
+        Like the query of `get_match_info`, only the teams in the teams table are in the tables.
+        """
+        key = (leagueID, season)
+        if key not in self._standings:
+            self._standings[key] = Standings(self.league_matches(leagueID, season), self.teamIDs)
+        return self._standings[key]
+
+    def league(self, leagueID: int) -> Optional[LeagueRow]:
+        """Returns the league, or None if there is no league with the ID."""
+        return self.leagues.get(leagueID)
+
+    def league_matches(self, leagueID: int, season: str) -> List[MatchRow]:
+        """Returns all the matches of a league and season."""
+        timeline = self._leagueSeasons.get((leagueID, season))
+        return list(timeline.rows) if timeline is not None else []
+
+    def match(self, matchID: int) -> MatchRow:
+        """Returns a match.
+
+        Raises:
+            NoResultFound: If there is no match with the ID, like `Query.one`.
+        """
+        if matchID not in self._matches:
+            raise NoResultFound(f"No match with id {matchID}")
+        return self._matches[matchID]
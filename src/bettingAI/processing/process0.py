@@ -7,6 +7,7 @@ from tqdm.auto import tqdm
 
 from bettingAI.googleCloud.initPostgreSQL import initSession
 from bettingAI.googleCloud.databaseClasses import Processed
+from bettingAI.processing.history import MatchHistory
 from features import features_for_model0, labels
 
 def main(session: sqlalchemy.orm.Session) -> None:
@@ -15,7 +16,8 @@ def main(session: sqlalchemy.orm.Session) -> None:
     Steps performed by the function:
     1. Retrieve the raw match IDs and processed match IDs from the database to determine which matches to process.
     2. Filter out the matches that have already been processed.
-    3. Iterate over the remaining raw matches and generate processed data for each team involved in the match.
+    3. Iterate over the remaining raw matches and generate processed data for each team involved in the match,
+       from the match history read into memory once (see history.py).
     4. Create Processed objects with the necessary data (match ID, league ID, inputs, labels) for each team.
     5. Add the Processed objects to the session and commit the changes to the database.
 
@@ -36,19 +38,20 @@ def main(session: sqlalchemy.orm.Session) -> None:
     
     processedMatchIDs = set([match[0] for match in processedMatches]) # convert processedMatches to a set for faster lookup
     rawMatches = [match for match in rawMatches if match[0] not in processedMatchIDs] # filter out the matches that have already been processed
-            
+    history = MatchHistory(session) # answers the feature queries without going back to the database
+
     for matchID, teamID, opponentID, leagueID, season, date in tqdm(rawMatches, desc="Processing matches"):
         team1 = Processed(
             match_id = matchID,
             league_id = leagueID,
-            inputs = features_for_model0(teamID, opponentID, season, "home", date, session),
-            labels = labels(matchID, teamID, session)
+            inputs = features_for_model0(teamID, opponentID, season, "home", date, history),
+            labels = labels(matchID, teamID, history)
         )
         team2 = Processed(
             match_id = matchID,
             league_id = leagueID,
-            inputs = features_for_model0(opponentID, teamID, season, "away", date, session),
-            labels = labels(matchID, opponentID, session)
+            inputs = features_for_model0(opponentID, teamID, season, "away", date, history),
+            labels = labels(matchID, opponentID, history)
         )
         try:
             session.add(team1)
@@ -1,19 +1,46 @@
 """
 Program that processes the raw match data from the database to be used in model1
+
+In the bulk mode, the default, the matches table is read once and the features of all the
+matches to process are computed together by vectorized.py, then inserted in chunks. The rows
+mode computes them match by match with features.py, from the match history read into memory
+once (see history.py). The sql mode has the database compute the form features of all the
+matches to process in one statement with window functions (see windowed.py), streams its rows
+and adds the other features from the match history. Set BETTINGAI_PROCESS1_MODE to "bulk",
+"rows" or "sql" to choose.
+
+tests/test_process1.py checks that the bulk mode processes the same matches as the rows mode, with
+the same features. Both order teams level on points in the league table by team ID (see
+standings.py), so the rank features of such teams can differ from rows written before the match
+history was used, when the order was left to the database.
 """
+import itertools
+import os
 import traceback
+from typing import Any, List, Optional
 
+import numpy as np
 import sqlalchemy
-from sqlalchemy import text
+from sqlalchemy import insert, text
 from tqdm.auto import tqdm
 
 from bettingAI.processing.queries import query_rawMatches
 from bettingAI.processing.features import features_for_model1, labels
+from bettingAI.processing.history import MatchHistory
+from bettingAI.processing.vectorized import feature_matrix, load_history
+from bettingAI.processing.windowed import FORM_FEATURES, form_statement
 from bettingAI.googleCloud.databaseClasses import Processed1
+from bettingAI.googleCloud.migrations import TEAM_MATCHES, require_migration
 from bettingAI.googleCloud.initPostgreSQL import initSession
 
-def main(session: sqlalchemy.orm.Session) -> None:
-    
+MODES = ["bulk", "rows", "sql"]
+CHUNK = 500  # matches inserted per commit in the bulk and sql modes
+
+def main(session: sqlalchemy.orm.Session, mode: Optional[str] = None) -> None:
+    mode = mode if mode is not None else os.environ.get("BETTINGAI_PROCESS1_MODE", "bulk")
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+
     # STEP 1 - GET MATCH IDS OF ALL MATCHES IN COMPLETE SEASONS
     rawMatches = session.execute(query_rawMatches()).fetchall()
     # Fetch all processed matches
@@ -30,19 +57,27 @@ def main(session: sqlalchemy.orm.Session) -> None:
     processedMatches = set([match[0] for match in processedMatches]) # convert processedMatches to a set for faster lookup
     rawMatches = [match for match in rawMatches if match[0] not in processedMatches] # filter out the matches that have already been processed
 
+    if mode == "bulk":
+        process_bulk(session, rawMatches)
+        return
+    if mode == "sql":
+        process_sql(session)
+        return
+
+    history = MatchHistory(session) # answers the feature queries without going back to the database
     for matchID, teamID, opponentID, leagueID, season, date in tqdm(rawMatches, desc="Processing matches"):
         try:
             team1 = Processed1(
                 match_id = matchID,
                 league_id = leagueID,
-                inputs = features_for_model1(teamID, opponentID, leagueID, season, "home", date, session),
-                labels = labels(matchID, teamID, session)
+                inputs = features_for_model1(teamID, opponentID, leagueID, season, "home", date, history),
+                labels = labels(matchID, teamID, history)
             )
             team2 = Processed1(
                 match_id = matchID,
                 league_id = leagueID,
-                inputs = features_for_model1(opponentID, teamID, leagueID, season, "away", date, session),
-                labels = labels(matchID, opponentID, session)
+                inputs = features_for_model1(opponentID, teamID, leagueID, season, "away", date, history),
+                labels = labels(matchID, opponentID, history)
             )
             session.add(team1)
             session.add(team2)
@@ -53,6 +88,99 @@ def main(session: sqlalchemy.orm.Session) -> None:
             session.rollback()
             print(f"Could not commit {matchID} -> {e}")
     
+def process_bulk(session: sqlalchemy.orm.Session, rawMatches: List[Any]) -> None:
+    """Computes the features of all the matches at once and inserts them in chunks of CHUNK matches.
+
+    Args:
+        session (sqlalchemy.orm.Session): The database session object used for database operations.
+        rawMatches (List[Any]): The matches to process, as rows of `query_rawMatches`.
+    """
+    result = feature_matrix(load_history(session), rawMatches)
+    print(f"Computed the features of {len(result.matchIDs)} matches, skipped {sum(result.skipped.values())}")
+    for reason, count in result.skipped.most_common():
+        print(f"    {reason}   ->  {count}")
+
+    rows = []
+    for matchID, leagueID, inputs, outcomes in zip(result.matchIDs, result.leagueIDs, result.inputs, result.labels):
+        for side in range(2):  # the home team first, like the rows mode
+            rows.append({
+                "match_id": int(matchID),
+                "league_id": int(leagueID),
+                "inputs": [None if np.isnan(value) else float(value) for value in inputs[side]],
+                "labels": [int(value) for value in outcomes[side]],
+            })
+
+    for start in tqdm(range(0, len(rows), 2 * CHUNK), desc="Inserting matches"):
+        chunk = rows[start : start + 2 * CHUNK]
+        try:
+            session.execute(insert(Processed1), chunk)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Could not commit matches {chunk[0]['match_id']} to {chunk[-1]['match_id']} -> {e}")
+
+def process_sql(session: sqlalchemy.orm.Session) -> None:
+    """Streams the form features of the matches to process from the database and inserts them in chunks of CHUNK matches.
+
+    The matches to process are selected in the statement itself, like in `main`. The columns the
+    statement does not compute are added with `features_for_model1`, from the match history.
+
+    Args:
+        session (sqlalchemy.orm.Session): The database session object used for database operations.
+
+    Raises:
+        MigrationMissing: If migration 2, which fills team_matches, is not applied.
+    """
+    require_migration(session, TEAM_MATCHES) # the statement reads team_matches, empty without it
+    history = MatchHistory(session) # answers the remaining feature queries without going back to the database
+    pending = (
+        f"SELECT id FROM ({query_rawMatches().text}) raw "
+        "WHERE id NOT IN (SELECT match_id FROM processed_for_model1)"
+    )
+
+    def insert_chunk(chunk: List[dict]) -> None:
+        try:
+            session.execute(insert(Processed1), chunk)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Could not commit matches {chunk[0]['match_id']} to {chunk[-1]['match_id']} -> {e}")
+
+    rows, processed, skipped = [], 0, 0
+    # A connection of its own, so the commits of the inserts do not end the stream
+    with session.get_bind().connect() as connection:
+        result = connection.execution_options(yield_per=2 * CHUNK).execute(form_statement(pending))
+        for matchID, sides in tqdm(itertools.groupby(result, key=lambda row: row.match_id), desc="Processing matches"):
+            try:
+                matchRows = []
+                for side in sides: # the home team first, like the rows mode
+                    form = [side._mapping[f"feature_{column}"] for column in FORM_FEATURES]
+                    if None in form:
+                        raise ValueError("No matches on a side this season")
+                    matchRows.append({
+                        "match_id": matchID,
+                        "league_id": side.league_id,
+                        "inputs": features_for_model1(
+                            side.team_id, side.opponent_id, side.league_id, side.season, side.side, side.date, history, form=form
+                        ),
+                        "labels": labels(matchID, side.team_id, history),
+                    })
+            except ValueError:
+                skipped += 1
+                continue
+            except Exception as e:
+                skipped += 1
+                print(f"Could not process {matchID} -> {e}")
+                continue
+            rows += matchRows
+            processed += 1
+            if len(rows) >= 2 * CHUNK:
+                insert_chunk(rows)
+                rows = []
+    if rows:
+        insert_chunk(rows)
+    print(f"Computed the features of {processed} matches, skipped {skipped}")
+
 if __name__ == "__main__":
     session = initSession()
     main(session)
\ No newline at end of file
@@ -1,8 +1,13 @@
-from typing import List, Optional, Any
+import weakref
+from typing import List, Optional, Any, Union
 from sqlalchemy.orm.session import Session
 from sqlalchemy import and_, or_, text
 
 from bettingAI.googleCloud.databaseClasses import *
+from bettingAI.googleCloud.migrations import TEAM_MATCHES, require_migration
+from bettingAI.processing.history import MatchHistory
+
+_teamMatchesChecked = weakref.WeakSet()  # the engines that have team_matches filled, see query_team_matches
 
 
 def query_recent_form(
@@ -10,7 +15,7 @@ def query_recent_form(
     opponentID: int, 
     date: Any,
     season: str,
-    session: Session
+    session: Union[Session, MatchHistory]
 ) -> List[Any]:
     """Queries and returns recent matches involving teamID and opponentID before the specified date.
 
@@ -18,11 +23,15 @@ def query_recent_form(
         teamID (int): The ID of the team.
         opponentID (int): The ID of the opponent team.
         date (Any): The specified date to filter the matches.
-        session (Session): The SQLAlchemy session object for database access.
+        session (Union[Session, MatchHistory]): The SQLAlchemy session object for database access,
+            or a MatchHistory to answer from.
 
     Returns:
         List[Any]: The list of recent matches involving the team and opponent before the specified date.
     """
+    if isinstance(session, MatchHistory):
+        return session.recent_form(teamID, opponentID, date, season)
+
     matches = (
         session.query(Matches)
         .filter(
@@ -45,7 +54,7 @@ def query_H2H(
     teamID: int,
     opponentID: int, 
     date: Any, 
-    session: Session
+    session: Union[Session, MatchHistory]
 ) -> Optional[List[Any]]:
     """Queries and returns head-to-head matches between teamID and opponentID before the specified date.
 
@@ -53,12 +62,16 @@ def query_H2H(
         teamID (int): The ID of the team.
         opponentID (int): The ID of the opponent team.
         date (Any): The specified date to filter the matches.
-        session (Session): The SQLAlchemy session object for database access.
+        session (Union[Session, MatchHistory]): The SQLAlchemy session object for database access,
+            or a MatchHistory to answer from.
 
     Returns:
         Optional[List[Any]]: The list of head-to-head matches between the team and opponent before the specified date,
         or None if no matches are found.
     """
+    if isinstance(session, MatchHistory):
+        return session.h2h(teamID, opponentID, date)
+
     matches = (
         session.query(Matches)
         .filter(
@@ -82,6 +95,53 @@ def query_H2H(
     else:
         return None
 
+def query_team_matches(
+    teamIDs: List[int],
+    date: Any,
+    session: Union[Session, MatchHistory],
+    season: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[TeamMatches]:
+    """Queries and returns the matches of the teams before the specified date, latest first.
+
+    The matches come from team_matches, one row per team and match with the goals for and
+    against the team, so they are read with range scans of its (team_id, date) and
+    (team_id, season, date) indexes instead of an OR over the home and away team. team_matches is
+    filled by migration 2 (see migrations.py), which is checked the first time a database is read.
+
+    Args:
+        teamIDs (List[int]): The IDs of the teams.
+        date (Any): The specified date to filter the matches.
+        session (Union[Session, MatchHistory]): The SQLAlchemy session object for database access,
+            or a MatchHistory to answer from.
+        season (str, optional): Only the matches of this season. Defaults to all seasons.
+        limit (int, optional): The maximum number of rows, over all teams. Defaults to all rows.
+
+    Returns:
+        List[TeamMatches]: A row for every team in every match before the specified date.
+
+    Raises:
+        MigrationMissing: If migration 2 is not applied, and team_matches would be empty.
+    """
+    if isinstance(session, MatchHistory):
+        return session.team_matches(teamIDs, date, season=season, limit=limit)
+
+    bind = session.get_bind()
+    if bind not in _teamMatchesChecked:
+        require_migration(session, TEAM_MATCHES)
+        _teamMatchesChecked.add(bind)
+
+    query = session.query(TeamMatches).filter(
+        TeamMatches.team_id.in_(teamIDs),
+        TeamMatches.date < date,
+    )
+    if season is not None:
+        query = query.filter(TeamMatches.season == season)
+    query = query.order_by(TeamMatches.date.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
 def query_rawMatches():
     return text(
         """
@@ -0,0 +1,96 @@
+"""
+standings.py
+
+League tables of a league and season as they stood before any date.
+
+`get_match_info` needs the games played and the league rank of two teams before their match, and
+its query groups the whole league and season again for every match. `Standings` replays the
+matches of a league and season once, in date order, and updates the table after every kick-off
+time: the games, points, goals and rank of every team. It keeps the table as it stood before
+each kick-off, so the table before a match is a dictionary lookup, and before any other date a
+bisect.
+
+The teams are ranked by points, and teams level on points by team ID, like the tables of
+history.py. The goal difference is kept but not used for the rank, so the rank features stay the
+ones the models were trained on.
+
+Example:
+    standings = Standings(history.league_matches(47, "2022-2023"))
+    table = standings.as_of(date)
+    table[8456].rank, table[8456].games
+"""
+
+import datetime as dt
+import itertools
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+
+class Standing(NamedTuple):
+    """A team's line in the league table."""
+
+    team_id: int
+    games: int
+    points: int
+    goals_for: int
+    goals_against: int
+    rank: int
+
+    @property
+    def goal_difference(self) -> int:
+        return self.goals_for - self.goals_against
+
+
+Table = Dict[int, Standing]  # by team ID
+
+
+class Standings:
+    """The league table of a league and season before every kick-off.
+
+    Args:
+        matches (Iterable[Any]): The matches of the league and season, with the attributes of Matches.
+        teamIDs (Set[int], optional): Only these teams are in the table, like the join with the
+            teams table in `get_match_info`. Defaults to every team.
+    """
+
+    def __init__(self, matches: Iterable[Any], teamIDs: Optional[Set[int]] = None) -> None:
+        self.dates: List[dt.datetime] = []  # the kick-off times
+        self.tables: List[Table] = [{}]  # the table before every kick-off, and after the last one
+        self._index: Dict[dt.datetime, int] = {}
+
+        totals: Dict[int, List[int]] = {}  # games, points, goals for and against of every team
+        ranking: List[int] = []  # team IDs, first to last
+        for date, kickOff in itertools.groupby(sorted(matches, key=lambda match: match.date), key=lambda match: match.date):
+            self._index[date] = len(self.dates)
+            self.dates.append(date)
+            for match in kickOff:
+                for teamID, goalsFor, goalsAgainst in [
+                    (match.home_team_id, match.home_goals, match.away_goals),
+                    (match.away_team_id, match.away_goals, match.home_goals),
+                ]:
+                    if teamIDs is not None and teamID not in teamIDs:
+                        continue
+                    if teamID not in totals:
+                        totals[teamID] = [0, 0, 0, 0]
+                        ranking.append(teamID)
+                    line = totals[teamID]
+                    line[0] += 1
+                    if goalsFor is not None and goalsAgainst is not None:  # no points without a score
+                        line[1] += 3 if goalsFor > goalsAgainst else 1 if goalsFor == goalsAgainst else 0
+                        line[2] += goalsFor
+                        line[3] += goalsAgainst
+
+            # Only the teams that just played moved, so the sort of the table is close to linear
+            ranking.sort(key=lambda teamID: (-totals[teamID][1], teamID))
+            self.tables.append(
+                {teamID: Standing(teamID, *totals[teamID], rank) for rank, teamID in enumerate(ranking, start=1)}
+            )
+
+    def as_of(self, date: Any) -> Table:
+        """Returns the table before the date, with the teams that played a match by then."""
+        index = self._index.get(date)
+        return self.tables[index if index is not None else bisect_left(self.dates, date)]
+
+    def final(self) -> Table:
+        """Returns the table after the last match."""
+        return self.tables[-1]
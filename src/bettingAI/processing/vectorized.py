@@ -0,0 +1,450 @@
+"""
+vectorized.py
+
+The model1 features of many matches at once, for the backfill of process1.py.
+
+`features_for_model1` runs about ten queries for each side of every match, so processing ten
+seasons takes hundreds of thousands of round trips. Here the matches table is read once by
+`load_history` into NumPy arrays, and `feature_matrix` computes the features and labels of all
+the matches in a few passes over them.
+
+Every match is kept as two rows, one for each team, and the rows of a group, e.g. a team in a
+season, are sorted by date. The rows a query of features.py would return for a match are then
+the rows of its group before its date, found by binary search, and their sums are differences
+of cumulative sums.
+
+The columns are the ones of `features_for_model1` (see process1.md) and agree with it to
+floating point precision. A match that makes it raise, e.g. because the league table is not
+complete yet, is skipped here too. tests/test_process1.py checks both against the rows mode of
+process1.py on a made-up league. Matches of a team at the same kick-off time are taken in the
+order of their IDs, like in history.py. Two things are settled differently from the queries of
+features.py on a session: teams level on points in the league table are ordered by team ID, as
+in standings.py, where the query leaves their order to the database, and matches without a score
+are not part of the history.
+
+Example:
+    history = load_history(session)
+    result = feature_matrix(history, session.execute(query_rawMatches()).fetchall())
+"""
+
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import sqlalchemy
+from sqlalchemy import select
+
+from bettingAI.googleCloud.databaseClasses import Leagues, Matches, Teams
+from bettingAI.processing.getInputs import calculate_volatility_score
+
+FEATURES = 110  # columns of the inputs
+LABELS = 8  # columns of the labels
+DAY = 86_400_000_000  # microseconds
+TABLE_SIZES = [16, 18, 20]  # teams of a complete league table
+RECENT = [3, 5, 10]  # matches of the recent form
+FORM = 5  # matches of the home/away form
+ENCOUNTERS = 365 * 2 * DAY  # how far back the recent encounters go
+GOAL_LINES = [0.5, 1.5, 2.5, 3.5, 4.5, 5.5, 6.5]
+LATEST = np.iinfo(np.int64).max  # a date after every match
+
+
+class History(NamedTuple):
+    """The matches table as arrays, one entry per match in the order of their IDs."""
+
+    ids: np.ndarray
+    home: np.ndarray
+    away: np.ndarray
+    league: np.ndarray
+    season: np.ndarray  # codes of the seasons
+    date: np.ndarray  # microseconds since the epoch
+    homeGoals: np.ndarray
+    awayGoals: np.ndarray
+    seasons: Dict[str, int]  # code of every season
+    levels: Dict[int, int]  # level of every league
+    teams: np.ndarray  # IDs in the teams table
+
+
+class FeatureMatrix(NamedTuple):
+    """The features and labels of the matches that could be processed."""
+
+    matchIDs: np.ndarray
+    leagueIDs: np.ndarray
+    inputs: np.ndarray  # matches x 2 x FEATURES, the home team first, NaN where features.py gives None
+    labels: np.ndarray  # matches x 2 x LABELS
+    skipped: Counter  # matches that were skipped, by reason
+
+
+def microseconds(dates: Sequence[Any]) -> np.ndarray:
+    """Returns datetimes as microseconds since the epoch."""
+    return np.array(dates, dtype="datetime64[us]").astype(np.int64)
+
+
+def load_history(session: sqlalchemy.orm.Session) -> History:
+    """Reads the scored matches, the league levels and the team IDs in one query each.
+
+    Args:
+        session (sqlalchemy.orm.Session): The database session object used for database operations.
+
+    Returns:
+        History: The matches as arrays.
+    """
+    rows = session.execute(
+        select(
+            Matches.id,
+            Matches.home_team_id,
+            Matches.away_team_id,
+            Matches.league_id,
+            Matches.season,
+            Matches.date,
+            Matches.home_goals,
+            Matches.away_goals,
+        )
+        .where(Matches.home_goals.is_not(None), Matches.away_goals.is_not(None))
+        .order_by(Matches.id)
+    ).all()
+    seasons = {season: code for code, season in enumerate(sorted({row.season for row in rows}))}
+
+    def column(index: int) -> np.ndarray:
+        return np.array([-1 if row[index] is None else row[index] for row in rows], dtype=np.int64)
+
+    return History(
+        ids=column(0),
+        home=column(1),
+        away=column(2),
+        league=column(3),
+        season=np.array([seasons[row.season] for row in rows], dtype=np.int64),
+        date=microseconds([row.date for row in rows]),
+        homeGoals=column(6),
+        awayGoals=column(7),
+        seasons=seasons,
+        levels=dict(session.execute(select(Leagues.id, Leagues.level)).all()),
+        teams=np.array(session.scalars(select(Teams.id)).all(), dtype=np.int64),
+    )
+
+
+class _Windows:
+    """Rows grouped by some keys and sorted by date, with the rows of every query's group before its date.
+
+    Args:
+        rowKeys (Sequence[np.ndarray]): The keys of the group of every row.
+        rowDates (np.ndarray): The date of every row.
+        queryKeys (Sequence[np.ndarray]): The same keys for every query.
+        queryDates (np.ndarray): The date of every query, only the rows before it are in its window.
+        rowTies (np.ndarray, optional): Orders the rows of a group with the same date, e.g. their
+            match IDs. Defaults to the order of the rows.
+    """
+
+    def __init__(
+        self,
+        rowKeys: Sequence[np.ndarray],
+        rowDates: np.ndarray,
+        queryKeys: Sequence[np.ndarray],
+        queryDates: np.ndarray,
+        rowTies: Optional[np.ndarray] = None,
+    ) -> None:
+        rows = len(rowDates)
+        keys = np.stack([np.concatenate([row, query]) for row, query in zip(rowKeys, queryKeys)], axis=1)
+        groups = np.unique(keys, axis=0, return_inverse=True)[1].reshape(-1).astype(np.int64)
+
+        # Dates are compared by their rank among the row dates, so a group and a date fit in one int64
+        self._dates = np.unique(rowDates)
+        ranks = np.searchsorted(self._dates, rowDates)
+        ties = rowTies if rowTies is not None else np.zeros(rows, dtype=np.int64)
+        self.order = np.lexsort((ties, ranks, groups[:rows]))  # stable, other ties keep the order of the rows
+        self.groups = groups[:rows][self.order]
+        self.dates = rowDates[self.order]
+        self._keys = (self.groups << 32) + ranks[self.order]
+        self._queryGroups = groups[rows:]
+
+        self.start = np.searchsorted(self._keys, self._queryGroups << 32)
+        self.end = self._position(queryDates)
+        self.count = self.end - self.start
+
+    def _position(self, dates: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self._keys, (self._queryGroups << 32) + np.searchsorted(self._dates, dates))
+
+    def _cumulative(self, values: np.ndarray) -> np.ndarray:
+        return np.concatenate([[0], np.cumsum(values[self.order])])
+
+    def total(self, values: np.ndarray) -> np.ndarray:
+        """Returns the sum of the values of the rows in every window."""
+        cumulative = self._cumulative(values)
+        return cumulative[self.end] - cumulative[self.start]
+
+    def last(self, values: np.ndarray, n: int) -> np.ndarray:
+        """Returns the sum of the values of the last n rows in every window."""
+        cumulative = self._cumulative(values)
+        return cumulative[self.end] - cumulative[np.maximum(self.start, self.end - n)]
+
+    def since(self, values: np.ndarray, dates: np.ndarray) -> np.ndarray:
+        """Returns the sum of the values of the rows in every window that are not before the date."""
+        cumulative = self._cumulative(values)
+        return cumulative[self.end] - cumulative[np.maximum(self.start, self._position(dates))]
+
+    def latest(self, sortedValues: np.ndarray, default: Any) -> np.ndarray:
+        """Returns the value, in sorted order, of the last row in every window, or the default if it is empty."""
+        if not len(sortedValues):
+            return np.full(len(self.end), default)
+        return np.where(self.count > 0, sortedValues[np.maximum(self.end - 1, 0)], default)
+
+    def latest_where(self, mask: np.ndarray) -> np.ndarray:
+        """Returns the sorted index of the last row in every window where mask is set, or -1."""
+        index = np.arange(len(mask))
+        previous = np.maximum.accumulate(np.where(mask[self.order], index, -1))
+        last = self.latest(previous, -1)
+        return np.where(last >= self.start, last, -1)
+
+    def streaks(self, outcomes: np.ndarray, skipDraws: bool = False) -> np.ndarray:
+        """Returns, in sorted order, the signed run of equal outcomes of the group that ends at every row.
+
+        Args:
+            outcomes (np.ndarray): 1 for a win, 0 for a draw and -1 for a loss of every row.
+            skipDraws (bool, optional): Leave draws out of the runs, as `get_teams_outcome_streak`
+                does, instead of counting a run that follows a draw, or is one, as 0, as
+                `get_outcome_streak_h2h` does. Defaults to False.
+        """
+        outcomes = outcomes[self.order]
+        index = np.arange(len(outcomes))
+        counted = outcomes != 0 if skipDraws else np.ones(len(outcomes), dtype=bool)
+        values, groups = outcomes[counted], self.groups[counted]
+        firsts = np.ones(len(values), dtype=bool)
+        firsts[1:] = (values[1:] != values[:-1]) | (groups[1:] != groups[:-1])
+        positions = np.arange(len(values))
+        runStarts = np.maximum.accumulate(np.where(firsts, positions, 0))
+        streaks = np.zeros(len(outcomes))
+        streaks[counted] = values * (positions - runStarts + 1)
+        if skipDraws:  # a draw keeps the streak of the row before it
+            previous = np.maximum.accumulate(np.where(counted, index, -1))
+            same = (previous >= 0) & (self.groups[np.maximum(previous, 0)] == self.groups)
+            streaks = np.where(same, streaks[np.maximum(previous, 0)], 0.0)
+        else:  # a draw before the run ends it with 0
+            before = np.maximum(runStarts - 1, 0)
+            afterDraw = (runStarts > 0) & (groups[before] == groups) & (values[before] == 0)
+            streaks[afterDraw] = 0.0
+        return streaks
+
+
+def _league_tables(
+    history: History,
+    league: np.ndarray,
+    season: np.ndarray,
+    date: np.ndarray,
+    team: np.ndarray,
+    opponent: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the games played and the league ranks of the teams before their matches, see `get_match_info`.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: If the table was complete and had
+        both teams, the games of the team, and the ranks of the team and of the opponent.
+    """
+    # The teams of every league and season, as in the join with the teams table
+    rowTeams = np.concatenate([history.home, history.away])
+    rowLeagues, rowSeasons = np.tile(history.league, 2), np.tile(history.season, 2)
+    known = np.isin(rowTeams, history.teams)
+    candidates = np.unique(np.stack([rowLeagues[known], rowSeasons[known], rowTeams[known]], axis=1), axis=0)
+
+    # The candidates of every query, padded with -1 to the largest league
+    tables = np.concatenate([candidates[:, :2], np.stack([league, season], axis=1)])
+    ids = np.unique(tables, axis=0, return_inverse=True)[1].reshape(-1)
+    tableIDs, queryTables = ids[: len(candidates)], ids[len(candidates) :]
+    starts = np.searchsorted(tableIDs, queryTables)
+    sizes = np.searchsorted(tableIDs, queryTables, side="right") - starts
+    width = max(int(sizes.max(initial=0)), 1)
+    offsets = np.arange(width)
+    inTable = offsets < sizes[:, None]
+    if len(candidates):
+        teams = np.where(inTable, candidates[np.minimum(starts[:, None] + offsets, len(candidates) - 1), 2], -1)
+    else:
+        teams = np.full((len(league), 1), -1)
+
+    # Games and points of every candidate in the league and season before the match
+    goalsFor = np.concatenate([history.homeGoals, history.awayGoals])
+    goalsAgainst = np.concatenate([history.awayGoals, history.homeGoals])
+    points = np.select([goalsFor > goalsAgainst, goalsFor == goalsAgainst], [3, 1], 0)
+    windows = _Windows(
+        [rowTeams, rowLeagues, rowSeasons],
+        np.tile(history.date, 2),
+        [teams.reshape(-1), np.repeat(league, width), np.repeat(season, width)],
+        np.repeat(date, width),
+    )
+    games = windows.count.reshape(teams.shape)
+    teamPoints = windows.total(points).reshape(teams.shape)
+    played = games > 0
+
+    def rank(ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        mine = played & (teams == ids[:, None])
+        own = np.where(mine, teamPoints, 0).sum(axis=1)[:, None]
+        ahead = played & ((teamPoints > own) | ((teamPoints == own) & (teams < ids[:, None])))
+        return mine.any(axis=1), np.where(mine, games, 0).sum(axis=1), ahead.sum(axis=1) + 1
+
+    teamFound, teamGames, teamRank = rank(team)
+    opponentFound, _, opponentRank = rank(opponent)
+    complete = np.isin(played.sum(axis=1), TABLE_SIZES) & teamFound & opponentFound
+    return complete, teamGames, teamRank, opponentRank
+
+
+def feature_matrix(history: History, rawMatches: Sequence[Sequence[Any]]) -> FeatureMatrix:
+    """Computes the inputs and labels of process1.py for matches, from both sides.
+
+    Args:
+        history (History): The matches table, as returned by `load_history`.
+        rawMatches (Sequence[Sequence[Any]]): The matches to process, as rows of `query_rawMatches`:
+            ID, home team, away team, league, season and date.
+
+    Returns:
+        FeatureMatrix: The inputs and labels of the matches that could be processed, and why the
+        others were skipped.
+    """
+    n = len(rawMatches)
+    matchIDs = np.array([match[0] for match in rawMatches], dtype=np.int64)
+    homeIDs = np.array([match[1] for match in rawMatches], dtype=np.int64)
+    awayIDs = np.array([match[2] for match in rawMatches], dtype=np.int64)
+    leagueIDs = np.array([match[3] for match in rawMatches], dtype=np.int64)
+    seasonCodes = np.array([history.seasons.get(match[4], -1) for match in rawMatches], dtype=np.int64)
+    dates = microseconds([match[5] for match in rawMatches])
+    if not n or not len(history.ids):
+        return FeatureMatrix(
+            matchIDs=matchIDs[:0],
+            leagueIDs=leagueIDs[:0],
+            inputs=np.zeros((0, 2, FEATURES)),
+            labels=np.zeros((0, 2, LABELS), dtype=np.int64),
+            skipped=Counter({"No score": n}) if n else Counter(),
+        )
+
+    # One query per side of every match, the home team first, and where to find the other side
+    team, opponent = np.concatenate([homeIDs, awayIDs]), np.concatenate([awayIDs, homeIDs])
+    isHome = np.repeat([True, False], n)
+    league, season, date = np.tile(leagueIDs, 2), np.tile(seasonCodes, 2), np.tile(dates, 2)
+    other = np.concatenate([np.arange(n, 2 * n), np.arange(n)])
+    reasons = np.full(2 * n, "", dtype=object)
+
+    def skip(mask: np.ndarray, reason: str) -> None:
+        reasons[(reasons == "") & mask] = reason
+
+    # One row per team and match, like team_matches
+    rowTeam = np.concatenate([history.home, history.away])
+    rowOpponent = np.concatenate([history.away, history.home])
+    rowHome = np.repeat([True, False], len(history.ids))
+    rowSeason, rowDate, rowMatch = np.tile(history.season, 2), np.tile(history.date, 2), np.tile(history.ids, 2)
+    goalsFor = np.concatenate([history.homeGoals, history.awayGoals])
+    goalsAgainst = np.concatenate([history.awayGoals, history.homeGoals])
+    outcome = np.sign(goalsFor - goalsAgainst)
+    win, draw, loss = (outcome > 0).astype(np.int64), (outcome == 0).astype(np.int64), (outcome < 0).astype(np.int64)
+    points = 3 * win + draw
+    columns: List[np.ndarray] = []
+
+    # 0-3 MATCH INFO
+    columns.append(isHome.astype(float))
+    complete, teamGames, teamRank, opponentRank = _league_tables(history, league, season, date, team, opponent)
+    skip(~complete, "Could not create complete table")
+    columns += [teamGames / 38, teamRank, opponentRank]
+
+    # 4-27 SEASON STATS, of the team on this and the other side and of the opponent on its side and the other
+    sides = _Windows(
+        [rowTeam, rowSeason, rowHome],
+        rowDate,
+        [np.tile(team, 2), np.tile(season, 2), np.concatenate([isHome, ~isHome])],
+        np.tile(date, 2),
+    )
+    thisCount, otherCount = sides.count[: 2 * n], sides.count[2 * n :]
+    skip((thisCount == 0) | (otherCount == 0) | (thisCount[other] == 0) | (otherCount[other] == 0), "No matches on a side this season")
+    for values in [goalsFor, goalsAgainst, goalsFor - goalsAgainst, win, (goalsAgainst == 0), (goalsFor == 0)]:
+        rates = sides.total(values.astype(np.int64)) / np.maximum(sides.count, 1)
+        thisSide, otherSide = rates[: 2 * n], rates[2 * n :]
+        columns += [thisSide, otherSide, thisSide[other], otherSide[other]]
+
+    # 28-51 RECENT FORM, of the team this season and of the opponent in any season
+    seasons = _Windows([rowTeam, rowSeason], rowDate, [team, season], date, rowTies=rowMatch)
+    careers = _Windows([rowTeam], rowDate, [team], date, rowTies=rowMatch)
+    for windows, rows in [(seasons, slice(None)), (careers, other)]:
+        for games in RECENT:
+            for values in [goalsFor, (goalsFor == 0).astype(np.int64), goalsFor - goalsAgainst, goalsAgainst]:
+                columns.append((windows.last(values, games) / games)[rows])
+
+    # 52-61 points won, outcome streak and form of both teams this season
+    for rows in [slice(None), other]:
+        for games in RECENT:
+            columns.append((seasons.last(points, games) / (3 * np.maximum(np.minimum(seasons.count, games), 1)))[rows])
+    streaks = seasons.latest(seasons.streaks(outcome, skipDraws=True), 0.0) / 10
+    form = seasons.last(win, FORM) / np.maximum(np.minimum(seasons.count, FORM), 1)
+    columns += [streaks, streaks[other], form, form[other]]
+
+    # 62-79 H2H
+    meetings = _Windows([rowTeam, rowOpponent], rowDate, [team, opponent], date, rowTies=rowMatch)
+    played = np.maximum(meetings.count, 1)
+    columns += [meetings.total(values) / played for values in [win, draw, loss]]
+    homeGames, homeWins = meetings.total(rowHome.astype(np.int64)), meetings.total(win * rowHome)
+    awayGames, awayWins = meetings.count - homeGames, meetings.total(win * ~rowHome)
+    columns.append(np.where(isHome, homeWins / np.maximum(homeGames, 1), awayWins / np.maximum(awayGames, 1)))
+    cutoff = date - ENCOUNTERS
+    columns.append(meetings.since(win, cutoff) / np.maximum(meetings.since(np.ones_like(win), cutoff), 1))
+    for values in [goalsFor, goalsAgainst, goalsFor - goalsAgainst, (goalsFor > 0) & (goalsAgainst > 0), goalsAgainst == 0]:
+        columns.append(meetings.total(values.astype(np.int64)) / played)
+    columns.append(meetings.latest(meetings.streaks(outcome), 0.0))
+    for line in GOAL_LINES:
+        columns.append(meetings.total((goalsFor + goalsAgainst > line).astype(np.int64)) / played)
+
+    # 80-83 TIME AND DATE
+    days = date // DAY
+    months = date.astype("datetime64[us]").astype("datetime64[M]").astype(np.int64) % 12 + 1
+    weekdays = (days + 3) % 7  # 1970-01-01 was a thursday
+    columns += [(date % DAY) // (DAY // 24) / 24, weekdays / 7, ((months - 1) // 3 + 1) / 4, (weekdays >= 5).astype(float)]
+
+    # 84-95 LEAGUE STATISTICS, of the whole season
+    levels = np.array([history.levels.get(int(id), np.nan) for id in league], dtype=float)
+    skip(np.isnan(levels), "No league found")
+    leagueSeasons = _Windows([history.league, history.season], history.date, [league, season], np.full(2 * n, LATEST))
+    matches = np.maximum(leagueSeasons.count, 1)
+    goals = history.homeGoals + history.awayGoals
+    homeWon = history.homeGoals > history.awayGoals
+    awayWon = history.homeGoals < history.awayGoals
+    columns += [levels, leagueSeasons.total(goals) / (2 * matches)]
+    columns += [leagueSeasons.total(values.astype(np.int64)) / matches for values in [homeWon, ~homeWon & ~awayWon, awayWon]]
+    columns += [leagueSeasons.total((goals > line).astype(np.int64)) / matches for line in GOAL_LINES]
+
+    # 96-109 CONDITION, of both teams this season
+    lastWin, lastLoss = seasons.latest_where(win.astype(bool)), seasons.latest_where(loss.astype(bool))
+    missing = (seasons.count == 0) | (lastWin < 0) | (lastLoss < 0)
+    skip(missing | missing[other], "No previous matches")
+    seasonMeetings = _Windows([rowTeam, rowOpponent, rowSeason], rowDate, [team, opponent, season], date)
+
+    def days_since(since: np.ndarray) -> np.ndarray:
+        return (date - since) // DAY
+
+    condition = [
+        days_since(seasons.latest(seasons.dates, 0)) / 7,
+        days_since(seasons.dates[lastWin]) / 28,
+        (seasons.end - 1 - lastWin) / 4,
+        days_since(seasons.dates[lastLoss]) / 28,
+        (seasons.end - 1 - lastLoss) / 4,
+        np.where(seasonMeetings.count > 0, days_since(seasonMeetings.latest(seasonMeetings.dates, 0)) / 140, np.nan),
+        np.full(2 * n, float(calculate_volatility_score())),
+    ]
+    columns += condition + [values[other] for values in condition]
+
+    # LABELS, from the score of the match itself
+    found = np.minimum(np.searchsorted(history.ids, matchIDs), len(history.ids) - 1)
+    skip(~np.tile(history.ids[found] == matchIDs, 2), "No score")
+    index = np.tile(found, 2)
+    ownGoals = np.where(isHome, history.homeGoals[index], history.awayGoals[index])
+    otherGoals = np.where(isHome, history.awayGoals[index], history.homeGoals[index])
+    total = ownGoals + otherGoals
+    labels = np.stack(
+        [ownGoals > otherGoals, ownGoals == otherGoals, ownGoals < otherGoals]
+        + [total > line for line in GOAL_LINES[1:5]]
+        + [(ownGoals > 0) & (otherGoals > 0)],
+        axis=1,
+    ).astype(np.int64)
+
+    # A match is kept if both of its sides could be processed
+    inputs = np.stack(columns, axis=1).astype(float)
+    keep = (reasons[:n] == "") & (reasons[n:] == "")
+    skipped = Counter(np.where(reasons[:n] != "", reasons[:n], reasons[n:])[~keep])
+    return FeatureMatrix(
+        matchIDs=matchIDs[keep],
+        leagueIDs=leagueIDs[keep],
+        inputs=np.stack([inputs[:n], inputs[n:]], axis=1)[keep],
+        labels=np.stack([labels[:n], labels[n:]], axis=1)[keep],
+        skipped=skipped,
+    )
@@ -0,0 +1,212 @@
+"""
+windowed.py
+
+The form features of model1 for every match in one SQL statement, with window functions.
+
+`get_combined_team_stats`, `get_recent_stats`, `get_points_won_ratio_1`,
+`get_teams_outcome_streak` and `get_teams_home_away_form` fetch the matches of a team before a
+match and loop over them in Python, for every side of every match. Here the database computes
+them for all matches at once. Every row of team_matches is given the aggregates of the rows of
+its team before it, with windows partitioned by team and season, or by team only, and ordered by
+date: the whole season so far for the season stats, and the last 3, 5 or 10 rows for the recent
+form. The windows order the rows by date and match ID, and every row then takes the aggregates
+of the first row of its team at the same kick-off time, so a match played at the same time, e.g.
+a replayed fixture, is left out like the filter on the date in features.py leaves it out. The
+outcome streak is found by numbering the runs of won and lost matches, as gaps and islands. The
+rows of the two teams of a match are then joined into the columns 4 to 61 of
+`features_for_model1` (see process1.md), for both sides. tests/test_process1.py compares them
+with features.py on SQLite.
+
+A column is NULL where features.py would raise or leave a value out, i.e. when a team has not
+played on a side yet this season. Like vectorized.py, matches without a score are not part of
+the history. The statement only uses window functions and FILTER clauses, so it runs on
+PostgreSQL and on SQLite.
+
+Example:
+    for row in session.execute(form_statement()):
+        form = [row[f"feature_{column}"] for column in FORM_FEATURES]
+        inputs = features_for_model1(row.team_id, row.opponent_id, ..., history, form=form)
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import TIMESTAMP, text
+from sqlalchemy.sql.elements import TextClause
+
+FORM_FEATURES = range(4, 62)  # the columns of features_for_model1 computed here
+RECENT = [3, 5, 10]  # matches of the recent form
+FORM = 5  # matches of the home/away form
+SIDES = ["home", "away"]
+
+# Aggregates of the rows of a team on one side this season, before every row
+SIDE_STATS = {
+    "games": "COUNT(*) FILTER (WHERE {side})",
+    "goals": "SUM(goals_for) FILTER (WHERE {side})",
+    "conceded": "SUM(goals_against) FILTER (WHERE {side})",
+    "wins": "COUNT(*) FILTER (WHERE {side} AND goals_for > goals_against)",
+    "clean_sheets": "COUNT(*) FILTER (WHERE {side} AND goals_against = 0)",
+    "blanks": "COUNT(*) FILTER (WHERE {side} AND goals_for = 0)",
+}
+
+# Aggregates of the last n rows of a team, this season and in any season
+RECENT_STATS = {
+    "games": "COUNT(*)",
+    "goals": "SUM(goals_for)",
+    "conceded": "SUM(goals_against)",
+    "blanks": "COUNT(*) FILTER (WHERE goals_for = 0)",
+    "points": "SUM(points)",
+    "wins": "COUNT(*) FILTER (WHERE goals_for > goals_against)",
+}
+
+
+def _aggregates() -> Dict[str, Tuple[str, str]]:
+    """Returns the window aggregates of every row of team_matches and their windows, by column, see SIDE_STATS and RECENT_STATS."""
+    columns = {"decided": ("COUNT(*) FILTER (WHERE goals_for <> goals_against)", "season_before")}
+    for side in SIDES:
+        for name, aggregate in SIDE_STATS.items():
+            columns[f"{side}_{name}"] = (aggregate.format(side=f"side = {side!r}"), "season_before")
+    for n in RECENT:
+        for name, aggregate in RECENT_STATS.items():
+            columns[f"{name}_{n}"] = (aggregate, f"season_last_{n}")
+            columns[f"career_{name}_{n}"] = (aggregate, f"career_last_{n}")
+    return columns
+
+
+def _before_kickoff() -> List[str]:
+    """Returns the aggregates of every row as they are before its kick-off time.
+
+    The windows count the rows before a row in the order of date and match ID, so a match of the
+    team at the same time with a lower ID would be counted. The first row of the team at that time
+    has none of them before it, so every row takes the aggregates of that one, like the filter on
+    the date in features.py.
+    """
+    columns = []
+    for column, (_, window) in _aggregates().items():
+        partition = "team_id, date" if window.startswith("career") else "team_id, season, date"
+        columns.append(f"FIRST_VALUE({column}) OVER (PARTITION BY {partition} ORDER BY match_id) AS {column}")
+    return columns
+
+
+def _windows() -> List[str]:
+    windows = [
+        "season AS (PARTITION BY team_id, season ORDER BY date, match_id)",
+        "career AS (PARTITION BY team_id ORDER BY date, match_id)",
+        "season_before AS (season ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING)",
+    ]
+    for n in RECENT:
+        windows.append(f"season_last_{n} AS (season ROWS BETWEEN {n} PRECEDING AND 1 PRECEDING)")
+        windows.append(f"career_last_{n} AS (career ROWS BETWEEN {n} PRECEDING AND 1 PRECEDING)")
+    return windows
+
+
+def _ratio(numerator: str, denominator: str) -> str:
+    return f"CAST({numerator} AS FLOAT) / NULLIF({denominator}, 0)"
+
+
+def _features() -> List[str]:
+    """Returns the columns 4 to 61 of features_for_model1, from the rows t of the team and o of the opponent."""
+
+    def side_rate(row: str, stat: str, own: bool) -> str:
+        rates = []
+        for side in SIDES:
+            total = f"{row}.{side}_goals - {row}.{side}_conceded" if stat == "difference" else f"{row}.{side}_{stat}"
+            rates.append(_ratio(total, f"{row}.{side}_games"))
+        home, away = rates if own else rates[::-1]
+        return f"CASE WHEN {row}.side = 'home' THEN {home} ELSE {away} END"
+
+    # 4-27 SEASON STATS, of the team on its side and the other and of the opponent on its side and the other
+    features = []
+    for stat in ["goals", "conceded", "difference", "wins", "clean_sheets", "blanks"]:
+        features += [side_rate("t", stat, True), side_rate("t", stat, False)]
+        features += [side_rate("o", stat, True), side_rate("o", stat, False)]
+
+    # 28-51 RECENT FORM, of the team this season and of the opponent in any season
+    for prefix in ["t.", "o.career_"]:
+        for n in RECENT:
+            goals, blanks, conceded = (f"COALESCE({prefix}{name}_{n}, 0)" for name in ["goals", "blanks", "conceded"])
+            for total in [goals, blanks, f"{goals} - {conceded}", conceded]:
+                features.append(f"CAST({total} AS FLOAT) / {n}")
+
+    # 52-61 points won, outcome streak and form of both teams this season
+    for row in ["t", "o"]:
+        features += [_ratio(f"{row}.points_{n}", f"3 * {row}.games_{n}") for n in RECENT]
+    features += ["CAST(t.streak AS FLOAT) / 10", "CAST(o.streak AS FLOAT) / 10"]
+    features += [f"COALESCE({_ratio(f'{row}.wins_{FORM}', f'{row}.games_{FORM}')}, 0)" for row in ["t", "o"]]
+    return [f"{feature} AS feature_{column}" for column, feature in zip(FORM_FEATURES, features)]
+
+
+def form_statement(matches: Optional[str] = None) -> TextClause:
+    """Returns the statement of the form features of every side of every match.
+
+    Args:
+        matches (str, optional): A subquery of the match IDs to return. The windows still read
+            every match before them. Defaults to all matches with a score.
+
+    Returns:
+        TextClause: One row per side of a match, the home side first, with the match ID, the team
+        and opponent IDs, league ID, season, date and side, and the columns feature_4 to feature_61.
+    """
+    where = f"WHERE t.match_id IN ({matches})" if matches is not None else ""
+    aggregates = ",\n                ".join(
+        f"{aggregate} OVER {window} AS {column}" for column, (aggregate, window) in _aggregates().items()
+    )
+    beforeKickoff = ",\n                ".join(_before_kickoff())
+    windows = ",\n                ".join(_windows())
+    features = ",\n            ".join(_features())
+    return text(
+        f"""
+        WITH scored AS (
+            SELECT team_id, match_id, opponent_id, league_id, season, date, side, goals_for, goals_against, points
+            FROM team_matches
+            WHERE goals_for IS NOT NULL AND goals_against IS NOT NULL
+        ),
+        decided AS (
+            -- The won and lost matches of every team and season, numbered, and the run of equal
+            -- outcomes they are part of: the numbers differ by the same amount within a run
+            SELECT
+                team_id,
+                season,
+                outcome,
+                ROW_NUMBER() OVER (PARTITION BY team_id, season ORDER BY date, match_id) AS ordinal,
+                ROW_NUMBER() OVER (PARTITION BY team_id, season ORDER BY date, match_id)
+                    - ROW_NUMBER() OVER (PARTITION BY team_id, season, outcome ORDER BY date, match_id) AS run
+            FROM (
+                SELECT team_id, season, date, match_id, CASE WHEN goals_for > goals_against THEN 1 ELSE -1 END AS outcome
+                FROM scored
+                WHERE goals_for <> goals_against
+            ) d
+        ),
+        runs AS (
+            -- The signed streak after every won or lost match, draws leave it as it was
+            SELECT team_id, season, ordinal, outcome * ROW_NUMBER() OVER (PARTITION BY team_id, season, outcome, run ORDER BY ordinal) AS streak
+            FROM decided
+        ),
+        windows AS (
+            SELECT
+                team_id, match_id, opponent_id, league_id, season, date, side,
+                {aggregates}
+            FROM scored
+            WINDOW
+                {windows}
+        ),
+        kickoffs AS (
+            SELECT
+                team_id, match_id, opponent_id, league_id, season, date, side,
+                {beforeKickoff}
+            FROM windows
+        ),
+        form AS (
+            -- The streak going into a match is the one after the last won or lost match before it
+            SELECT w.*, COALESCE(r.streak, 0) AS streak
+            FROM kickoffs w
+            LEFT JOIN runs r ON r.team_id = w.team_id AND r.season = w.season AND r.ordinal = w.decided
+        )
+        SELECT
+            t.match_id, t.team_id, t.opponent_id, t.league_id, t.season, t.date, t.side,
+            {features}
+        FROM form t
+        JOIN form o ON o.match_id = t.match_id AND o.side <> t.side
+        {where}
+        ORDER BY t.match_id, t.side DESC
+        """
+    ).columns(date=TIMESTAMP)
@@ -0,0 +1,213 @@
+"""
+benchmark.py
+
+Offline benchmark of the parsers in the writer package.
+
+Every match page stored in the page cache (see cache.py) is parsed with each extraction mode:
+"tokens" tokenizes the whole HTML document and runs the gather.py parsers over the tokens,
+"json" decodes the __NEXT_DATA__ blob and runs the structured.py parsers. The time per page
+is reported for each mode, so the two can be compared on the same pages without touching
+the network.
+
+With --check the tokenizer in tokenizer.py is compared with the BeautifulSoup and NLTK pipeline it
+replaces: every page is tokenized with both, the pages where the tokens differ are listed, and the
+time per page of both tokenizers is reported. This needs beautifulsoup4 and nltk. NLTK reads the
+English punkt parameters from its own data if they are installed and from the copy next to
+tokenizer.py otherwise.
+
+With --gather every page is tokenized up front and only the gather.py parsers are timed, once
+with a TokenIndex built per page and shared by the parsers, the way parse_match_tokens runs
+them, and once with every parser building its own index.
+
+Usage:
+    python -m bettingAI.writer.benchmark [--cache DIR] [--limit N] [--check] [--gather]
+"""
+
+import argparse
+import statistics
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from bettingAI.writer.cache import configure_cache, entries, read_object
+from bettingAI.writer.gather import (
+    TokenIndex,
+    gather_league,
+    gather_main_info,
+    gather_match_statistics,
+    gather_player_performance,
+)
+from bettingAI.writer.scraper import parse_match_structured, parse_match_tokens
+from bettingAI.writer.tokenizer import NLTK_DATA, tokenize
+from bettingAI.writer.values import notIncluded
+
+MODES: Dict[str, Callable] = {
+    "tokens": parse_match_tokens,
+    "json": parse_match_structured,
+}
+
+
+def reference_tokenize(content: bytes, stopTokens: Iterable[str] = notIncluded) -> List[str]:
+    """Tokenizes a page with BeautifulSoup and NLTK, the way scraper.py did before tokenizer.py."""
+    import nltk
+    from bs4 import BeautifulSoup
+    from nltk.tokenize import word_tokenize
+
+    if NLTK_DATA not in nltk.data.path:
+        nltk.data.path.append(NLTK_DATA)
+
+    text = BeautifulSoup(content, "html.parser").prettify()
+    return [token for token in word_tokenize(text) if token not in stopTokens]
+
+
+TOKENIZERS: Dict[str, Callable] = {
+    "nltk": reference_tokenize,
+    "fast": tokenize,
+}
+
+
+def gather_separately(tokens: List[str]) -> None:
+    """Runs the gather.py parsers over the tokens of a match page, each building its own index."""
+    gather_league(tokens[10:100])
+    gather_main_info(tokens[:150])
+    if gather_match_statistics(tokens[:6000]) is not None:
+        gather_player_performance(tokens[2000:])
+
+
+def gather_shared(tokens: List[str]) -> None:
+    """Runs the gather.py parsers over the tokens of a match page with one shared index."""
+    index = TokenIndex(tokens)
+    gather_league(tokens[10:100], index.window(10, 100))
+    gather_main_info(tokens[:150], index.window(0, 150))
+    if gather_match_statistics(tokens[:6000], index.window(0, 6000)) is not None:
+        gather_player_performance(tokens[2000:], index.window(2000))
+
+
+GATHERERS: Dict[str, Callable] = {
+    "index": TokenIndex,
+    "separate": gather_separately,
+    "shared": gather_shared,
+}
+
+
+def match_pages(limit: int = None) -> Iterator[Tuple[str, bytes]]:
+    """Iterates over the match pages stored in the cache.
+
+    Args:
+        limit (int, optional): Maximum number of pages. Defaults to all pages.
+
+    Yields:
+        Tuple[str, bytes]: The URL and the body of each page.
+    """
+    count = 0
+    for entry in entries():
+        if "/match/" not in entry["url"]:
+            continue
+        if limit is not None and count >= limit:
+            return
+        try:
+            yield entry["url"], read_object(entry["object"])
+        except FileNotFoundError:
+            continue
+        count += 1
+
+
+def time_parser(
+    parser: Callable,
+    pages: List[Tuple[str, bytes]]
+) -> Tuple[List[float], int]:
+    """Parses every page with a parser and measures the time each page takes.
+
+    Args:
+        parser (Callable): Function taking the body of a match page.
+        pages (List[Tuple[str, bytes]]): The URLs and bodies of the pages.
+
+    Returns:
+        Tuple[List[float], int]: The seconds spent on each page that parsed, and the number of pages that failed.
+    """
+    timings = []
+    failed = 0
+    for _, content in pages:
+        start = time.perf_counter()
+        try:
+            parser(content)
+        except Exception:
+            failed += 1
+            continue
+        timings.append(time.perf_counter() - start)
+    return timings, failed
+
+
+def report(mode: str, timings: List[float], failed: int) -> None:
+    """Prints the timings of one extraction mode."""
+    if not timings:
+        print(f"{mode:>8}: no pages parsed ({failed} failed)")
+        return
+    timings = sorted(timings)
+    print(
+        f"{mode:>8}: {len(timings)} pages, {failed} failed, "
+        f"mean {1000 * statistics.mean(timings):.2f} ms, "
+        f"median {1000 * statistics.median(timings):.2f} ms, "
+        f"max {1000 * timings[-1]:.2f} ms, "
+        f"{len(timings) / sum(timings):.1f} pages/sec"
+    )
+
+
+def check_tokenizer(pages: List[Tuple[str, bytes]]) -> int:
+    """Tokenizes every page with both tokenizers and prints the pages where the tokens differ.
+
+    Args:
+        pages (List[Tuple[str, bytes]]): The URLs and bodies of the pages.
+
+    Returns:
+        int: The number of pages where the tokens differ.
+    """
+    different = 0
+    for url, content in pages:
+        expected, tokens = reference_tokenize(content), tokenize(content)
+        if tokens == expected:
+            continue
+        different += 1
+        index = next(
+            (i for i, (a, b) in enumerate(zip(expected, tokens)) if a != b),
+            min(len(expected), len(tokens))
+        )
+        print(f"{url}: first difference at token {index}, expected {expected[index:index + 5]}, got {tokens[index:index + 5]}")
+    print(f"{len(pages) - different} of {len(pages)} pages tokenized identically")
+    return different
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the parse time per page of the extraction modes.")
+    parser.add_argument("--cache", help="directory of the page cache")
+    parser.add_argument("--limit", type=int, help="maximum number of pages")
+    parser.add_argument("--check", action="store_true", help="compare tokenizer.py with BeautifulSoup and NLTK")
+    parser.add_argument("--gather", action="store_true", help="time the gather.py parsers on tokenized pages")
+    args = parser.parse_args()
+
+    configure_cache(directory=args.cache)
+    pages = list(match_pages(args.limit))
+    if not pages:
+        print("No match pages in the cache, run the writer first to fill it")
+        return
+
+    if args.check:
+        check_tokenizer(pages)
+        for name, tokenizer in TOKENIZERS.items():
+            timings, failed = time_parser(tokenizer, pages)
+            report(name, timings, failed)
+        return
+
+    if args.gather:
+        tokenized = [(url, tokenize(content)) for url, content in pages]
+        for name, gather in GATHERERS.items():
+            timings, failed = time_parser(gather, tokenized)
+            report(name, timings, failed)
+        return
+
+    for mode, parse in MODES.items():
+        timings, failed = time_parser(parse, pages)
+        report(mode, timings, failed)
+
+
+if __name__ == "__main__":
+    main()
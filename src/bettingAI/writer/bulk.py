@@ -0,0 +1,209 @@
+"""
+bulk.py
+
+Buffered writer that inserts the rows of writer.py in bulk.
+
+The runner used to commit after every match and every player performance, so a match with 30
+players cost more than 30 round-trips to the database. BulkWriter collects the rows instead and
+writes them with one executemany upsert (see upsert.py) per table once `rows` rows are waiting or
+`seconds` seconds passed since the last flush, and commits once per flush. Rows that are already
+in the database are updated or skipped instead of failing.
+
+Every table is upserted inside a savepoint. If the upsert fails, the savepoint is rolled back and
+the rows of that table are upserted one at a time, each in a savepoint of its own, so a bad row is
+left out without losing the rest of the batch. The tables are written in the order of their
+foreign keys, so a match is inserted before its stats.
+
+The limits can be set with the BETTINGAI_BULK_ROWS and BETTINGAI_BULK_SECONDS environment
+variables or with `configure_bulk`. With BETTINGAI_BULK_MODE set to "copy", `bulk_writer` returns
+the COPY based loader of copyload.py instead, which is faster for backfills.
+
+Rows can be added as ORM objects with `add`, or as plain column values with `add_values`, which
+skips building the objects.
+
+Example:
+    bulk = BulkWriter(session)
+    for row in rows:
+        bulk.add(row)
+    bulk.flush()
+    print(f"{bulk.rate():.0f} rows/sec")
+"""
+
+import os
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import sqlalchemy
+from sqlalchemy import Table
+
+from bettingAI.googleCloud.databaseClasses import Base
+from bettingAI.writer.metrics import timed
+from bettingAI.writer.upsert import row_values, upsert_values
+
+ROWS = 500  # rows buffered before a flush
+SECONDS = 5.0  # seconds between two flushes at most, checked when a row is added
+MODES = ("upsert", "copy")
+
+_config = {
+    "rows": int(os.environ.get("BETTINGAI_BULK_ROWS", ROWS)),
+    "seconds": float(os.environ.get("BETTINGAI_BULK_SECONDS", SECONDS)),
+    "mode": os.environ.get("BETTINGAI_BULK_MODE", "upsert"),
+}
+
+# Position of every table in the order they can be inserted in, parents before children
+_ORDER = {table: position for position, table in enumerate(Base.metadata.sorted_tables)}
+
+Buffered = List[Tuple[Dict[str, Any], Optional[Hashable]]]
+
+
+def configure_bulk(
+    rows: Optional[int] = None, seconds: Optional[float] = None, mode: Optional[str] = None
+) -> None:
+    """Changes the settings of the bulk writers created from now on.
+
+    Arguments left as None keep their current value.
+
+    Args:
+        rows (int, optional): Rows buffered before a flush.
+        seconds (float, optional): Seconds after a flush before the next added row flushes again.
+        mode (str, optional): "upsert" for executemany upserts, "copy" for COPY FROM STDIN.
+    """
+    if mode is not None and mode not in MODES:
+        raise ValueError(f"Unknown bulk mode {mode!r}, expected one of {', '.join(MODES)}")
+    for key, value in [("rows", rows), ("seconds", seconds), ("mode", mode)]:
+        if value is not None:
+            _config[key] = value
+
+
+def bulk_writer(session: sqlalchemy.orm.Session, **kwargs: Any) -> "BulkWriter":
+    """Returns a BulkWriter, or a CopyLoader if the bulk mode is "copy".
+
+    Args:
+        session (sqlalchemy.orm.Session): The database session object used for database operations.
+        **kwargs: Passed on to the writer, see BulkWriter.
+    """
+    if _config["mode"] == "copy":
+        from bettingAI.writer.copyload import CopyLoader
+
+        return CopyLoader(session, **kwargs)
+    return BulkWriter(session, **kwargs)
+
+
+class BulkWriter:
+    """Buffers ORM rows and upserts them with one executemany per table.
+
+    Args:
+        session (sqlalchemy.orm.Session): The database session object used for database operations.
+        rows (int, optional): Rows buffered before a flush. Defaults to BETTINGAI_BULK_ROWS or ROWS.
+        seconds (float, optional): Seconds after a flush before the next added row flushes again.
+            Defaults to BETTINGAI_BULK_SECONDS or SECONDS.
+        onRow (Callable[[str, Any, Optional[Exception]], None], optional): Called in every flush for
+            each row added with a key, with the name of its table, the key and the exception that
+            kept the row out, or None if the row is in the database now. It runs before the commit,
+            so whatever it stages in the session is committed together with the rows.
+        onFlush (Callable[[], None], optional): Called right before every commit.
+    """
+
+    def __init__(
+        self,
+        session: sqlalchemy.orm.Session,
+        rows: Optional[int] = None,
+        seconds: Optional[float] = None,
+        onRow: Optional[Callable[[str, Any, Optional[Exception]], None]] = None,
+        onFlush: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.session = session
+        self.rows = rows if rows is not None else _config["rows"]
+        self.seconds = seconds if seconds is not None else _config["seconds"]
+        self.onRow = onRow
+        self.onFlush = onFlush
+
+        self.inserted = Counter()  # rows inserted, by table
+        self.updated = Counter()  # rows that were there and changed, by table
+        self.skipped = Counter()  # rows that were there already, by table
+        self.failed = Counter()  # rows left out, by table
+        self.errors = Counter()  # exceptions of the rows left out, by message
+        self.elapsed = 0.0  # seconds spent flushing
+
+        self._buffer: Dict[Tuple[Table, Tuple[str, ...]], Buffered] = {}
+        self._buffered = 0
+        self._flushed = time.monotonic()
+
+    def add(self, row: Base, key: Optional[Hashable] = None) -> None:
+        """Buffers a row, and flushes if enough rows are waiting or enough time passed.
+
+        Args:
+            row (Base): The ORM row, e.g. from `add_match` or `add_player_performance`.
+            key (Hashable, optional): Passed to `onRow` with the outcome of the row.
+        """
+        self.add_values(row.__table__, row_values(row), key)
+
+    def add_values(self, table: Table, values: Dict[str, Any], key: Optional[Hashable] = None) -> None:
+        """Buffers the column values of a row like `add`, e.g. as built by rows.py, without an ORM object.
+
+        Args:
+            table (Table): The table the row belongs to.
+            values (Dict[str, Any]): The values of the row, by column.
+            key (Hashable, optional): Passed to `onRow` with the outcome of the row.
+        """
+        # executemany needs the same columns in every row, so rows are grouped by their columns
+        self._buffer.setdefault((table, tuple(values)), []).append((values, key))
+        self._buffered += 1
+        if self._buffered >= self.rows or time.monotonic() - self._flushed >= self.seconds:
+            self.flush()
+
+    def flush(self) -> None:
+        """Upserts the buffered rows and commits them with everything else staged in the session.
+
+        If the commit fails, the transaction is rolled back and the exception is raised.
+        """
+        start = time.perf_counter()
+        buffer, self._buffer, self._buffered = self._buffer, {}, 0
+        try:
+            with timed("flush", items=sum(len(rows) for rows in buffer.values())):
+                for (table, _), rows in sorted(buffer.items(), key=lambda item: _ORDER[item[0][0]]):
+                    self._insert(table, rows)
+                if self.onFlush is not None:
+                    self.onFlush()
+                self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        finally:
+            self._flushed = time.monotonic()
+            self.elapsed += time.perf_counter() - start
+
+    def _insert(self, table: Table, rows: Buffered) -> None:
+        try:
+            with self.session.begin_nested():
+                counts = self._load(table, [values for values, _ in rows])
+            outcomes: List[Optional[Exception]] = [None] * len(rows)
+        except sqlalchemy.exc.SQLAlchemyError:
+            counts, outcomes = Counter(), []
+            for values, _ in rows:  # find the bad rows, one savepoint each
+                try:
+                    with self.session.begin_nested():
+                        counts += upsert_values(self.session, table, [values])
+                    outcomes.append(None)
+                except sqlalchemy.exc.SQLAlchemyError as e:
+                    outcomes.append(e)
+
+        self.inserted[table.name] += counts["inserted"]
+        self.updated[table.name] += counts["updated"]
+        self.skipped[table.name] += counts["skipped"]
+        for (_, key), error in zip(rows, outcomes):
+            if error is not None:
+                self.failed[table.name] += 1
+                self.errors[f"{type(error)} : {error}"] += 1
+            if key is not None and self.onRow is not None:
+                self.onRow(table.name, key, error)
+
+    def _load(self, table: Table, rows: List[Dict[str, Any]]) -> Counter:
+        """Writes the rows of a table that have the same columns, all or none of them."""
+        return upsert_values(self.session, table, rows)
+
+    def rate(self) -> float:
+        """Returns the rows upserted per second spent flushing."""
+        rows = sum(self.inserted.values()) + sum(self.updated.values()) + sum(self.skipped.values())
+        return rows / self.elapsed if self.elapsed else 0.0
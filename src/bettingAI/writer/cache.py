@@ -0,0 +1,225 @@
+"""
+cache.py
+
+On-disk cache for the pages requested by the scraper.
+
+Page bodies are stored content-addressed under objects/, named by the SHA-256 of the body,
+so identical pages are only stored once. For every URL an entry under index/ records which
+object it points to, when it was fetched and the validators (ETag, Last-Modified) the server
+sent along.
+
+How long an entry is fresh depends on the kind of URL, see TTLS. A stale entry is revalidated
+with a conditional request, and a 304 answer only refreshes the timestamp. In replay mode the
+network is never touched: every page is served from disk, whatever its age, and a page that
+was never stored raises CacheMiss. This lets the parsers be re-run over stored pages offline.
+
+The cache is configured with configure_cache() or through the environment variables
+BETTINGAI_CACHE_DIR (default "cache") and BETTINGAI_CACHE_MODE ("on", "off" or "replay").
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from bettingAI.writer.client import get_page
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Time to live per class of URL, first match wins. None means the entry never goes stale.
+TTLS: List[Tuple[str, Optional[int]]] = [
+    (r"/match/", None),  # finished matches never change, the scraper forgets unfinished ones
+    (r"/leagues/", 10 * MINUTE),  # fixture lists and tables
+    (r"/teams/", DAY),  # squads
+    (r"/players/", DAY),  # player bios
+]
+DEFAULT_TTL = 10 * MINUTE
+
+_config = {
+    "directory": os.environ.get("BETTINGAI_CACHE_DIR", "cache"),
+    "mode": os.environ.get("BETTINGAI_CACHE_MODE", "on"),
+}
+
+
+class CacheMiss(LookupError):
+    """Raised in replay mode when a page is not in the cache."""
+
+
+def configure_cache(
+    directory: Optional[str] = None,
+    mode: Optional[str] = None
+) -> None:
+    """Changes where and how pages are cached.
+
+    Args:
+        directory (str, optional): Directory the cache is stored in.
+        mode (str, optional): "on" to use and fill the cache, "off" to always go to the network,
+            or "replay" to serve everything from disk without any network access.
+
+    Raises:
+        ValueError: If the mode is not one of "on", "off" or "replay".
+    """
+    if mode is not None:
+        if mode not in ["on", "off", "replay"]:
+            raise ValueError(f"Invalid cache mode '{mode}'. Valid options are 'on', 'off' and 'replay'")
+        _config["mode"] = mode
+    if directory is not None:
+        _config["directory"] = directory
+
+
+def ttl_for(url: str) -> Optional[int]:
+    """Returns the time to live in seconds for a URL, or None if it never goes stale.
+
+    Args:
+        url (str): The URL of the page.
+
+    Returns:
+        Optional[int]: The time to live of the first matching class in TTLS, otherwise DEFAULT_TTL.
+    """
+    for pattern, ttl in TTLS:
+        if re.search(pattern, url):
+            return ttl
+    return DEFAULT_TTL
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _index_path(url: str) -> str:
+    key = _digest(url.encode("utf-8"))
+    return os.path.join(_config["directory"], "index", key[:2], key + ".json")
+
+
+def _object_path(key: str) -> str:
+    return os.path.join(_config["directory"], "objects", key[:2], key)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Writes a file so concurrent readers never see it half written."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def read_entry(url: str) -> Optional[Dict]:
+    """Returns the index entry for a URL, or None if the URL is not cached."""
+    try:
+        with open(_index_path(url)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def read_object(key: str) -> bytes:
+    """Returns the page body stored under a content key."""
+    with open(_object_path(key), "rb") as f:
+        return f.read()
+
+
+def store(
+    url: str,
+    content: bytes,
+    etag: Optional[str] = None,
+    lastModified: Optional[str] = None
+) -> Dict:
+    """Stores a page body and points the entry for the URL at it.
+
+    Args:
+        url (str): The URL the page was fetched from.
+        content (bytes): The page body.
+        etag (str, optional): ETag header of the response.
+        lastModified (str, optional): Last-Modified header of the response.
+
+    Returns:
+        Dict: The new index entry.
+    """
+    key = _digest(content)
+    if not os.path.exists(_object_path(key)):
+        _write_atomic(_object_path(key), content)
+    entry = {
+        "url": url,
+        "object": key,
+        "fetched": time.time(),
+        "etag": etag,
+        "lastModified": lastModified,
+    }
+    _write_atomic(_index_path(url), json.dumps(entry).encode("utf-8"))
+    return entry
+
+
+def forget(url: str) -> None:
+    """Removes the entry for a URL so the next request goes to the network.
+
+    The body is left in objects/ as other URLs may point to it.
+    """
+    try:
+        os.remove(_index_path(url))
+    except FileNotFoundError:
+        pass
+
+
+def entries() -> Iterator[Dict]:
+    """Iterates over all index entries in the cache."""
+    root = os.path.join(_config["directory"], "index")
+    for dirpath, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            with open(os.path.join(dirpath, filename)) as f:
+                yield json.load(f)
+
+
+def load_page(url: str) -> bytes:
+    """Returns the body of a page, from the cache when possible.
+
+    Fresh entries are served from disk. Stale entries are revalidated with a conditional
+    request and refetched only if the page changed. In replay mode everything is served
+    from disk.
+
+    Args:
+        url (str): The URL of the page.
+
+    Returns:
+        bytes: The body of the page.
+
+    Raises:
+        CacheMiss: If the cache is in replay mode and the page is not stored.
+    """
+    mode = _config["mode"]
+    if mode == "off":
+        return get_page(url).content
+
+    entry = read_entry(url)
+    if mode == "replay":
+        if entry is None:
+            raise CacheMiss(url)
+        return read_object(entry["object"])
+
+    headers = {}
+    if entry is not None:
+        ttl = ttl_for(url)
+        if ttl is None or time.time() - entry["fetched"] < ttl:
+            try:
+                return read_object(entry["object"])
+            except FileNotFoundError:  # body was removed by hand, fetch it again
+                entry = None
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("lastModified"):
+                headers["If-Modified-Since"] = entry["lastModified"]
+
+    response = get_page(url, headers=headers)
+    if response.status_code == 304 and entry is not None:  # not modified, refresh timestamp
+        content = read_object(entry["object"])
+        store(url, content, entry.get("etag"), entry.get("lastModified"))
+        return content
+
+    store(url, response.content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return response.content
@@ -0,0 +1,176 @@
+"""
+client.py
+
+Pooled HTTP client shared by all scraper entry points.
+
+A single requests.Session is kept for the whole process. Its connection pool keeps
+connections to fotmob alive between pages, so the TCP and TLS handshakes are paid once
+per host instead of once per page. Every request has a timeout, and requests that fail
+with a connection error, 429 or 5xx are retried with exponential backoff.
+
+The session is safe to share between the worker threads of fetcher.py as long as the
+pool size is at least the number of requests in flight.
+
+All requests of the process also share one rate limiter, so the league workers of writer.py
+and update.py together never send more than RATE requests per second, however many of them
+run. Set BETTINGAI_FETCH_RATE, or the rate of `configure_client`, to change it, 0 turns the
+limit off.
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from bettingAI.writer.metrics import timed
+
+POOL_SIZE = 16  # connections kept alive per host
+TIMEOUT = (5, 30)  # seconds to connect, seconds to read
+RETRIES = 5  # attempts after the first one
+BACKOFF = 0.5  # waits 0.5s, 1s, 2s, 4s, ... between attempts
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; bettingAI)"}
+RATE = 10.0  # requests per second, over all threads
+
+_config = {
+    "poolSize": POOL_SIZE,
+    "timeout": TIMEOUT,
+    "retries": RETRIES,
+    "backoff": BACKOFF,
+    "rate": float(os.environ.get("BETTINGAI_FETCH_RATE", RATE)),
+}
+_session: Optional[requests.Session] = None
+_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Token bucket that lets `rate` calls of `wait` through per second, shared by all threads.
+
+    Up to `burst` calls pass at once after an idle spell, every further call waits for its turn.
+
+    Args:
+        rate (float): Calls per second, 0 or less for no limit.
+        burst (float, optional): Calls let through at once. Defaults to one second's worth.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> float:
+        """Blocks until the caller may send its request.
+
+        Returns:
+            float: The number of seconds waited.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1  # reserve a token, the callers before us took the ones in between
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+_limiter = RateLimiter(_config["rate"])
+
+
+def configure_client(
+    poolSize: Optional[int] = None,
+    timeout: Optional[float] = None,
+    retries: Optional[int] = None,
+    backoff: Optional[float] = None,
+    rate: Optional[float] = None,
+) -> None:
+    """Changes the settings of the shared HTTP client.
+
+    The current session is closed and a new one is created with the new settings on the next request.
+    Arguments left as None keep their current value.
+
+    Args:
+        poolSize (int, optional): Number of keep-alive connections per host.
+        timeout (float, optional): Timeout in seconds, or a (connect, read) tuple.
+        retries (int, optional): Number of retries after a failed request.
+        backoff (float, optional): Backoff factor for the exponential wait between retries.
+        rate (float, optional): Requests per second over all threads, 0 for no limit.
+    """
+    global _session, _limiter
+    with _lock:
+        for key, value in [
+            ("poolSize", poolSize),
+            ("timeout", timeout),
+            ("retries", retries),
+            ("backoff", backoff),
+            ("rate", rate),
+        ]:
+            if value is not None:
+                _config[key] = value
+        if rate is not None:
+            _limiter = RateLimiter(_config["rate"])
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def get_session() -> requests.Session:
+    """Returns the process-wide pooled session, creating it on first use.
+
+    Returns:
+        requests.Session: Session with keep-alive pooling and retries mounted for http and https.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                retry = Retry(
+                    total=_config["retries"],
+                    backoff_factor=_config["backoff"],
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=frozenset(["GET", "HEAD"]),
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=_config["poolSize"],
+                    pool_maxsize=_config["poolSize"],
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.headers.update(HEADERS)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_page(url: str, **kwargs) -> requests.Response:
+    """Requests a page through the shared session, once the rate limiter lets it through.
+
+    Args:
+        url (str): The URL to request.
+        **kwargs: Passed on to `requests.Session.get`, e.g. extra headers.
+
+    Returns:
+        requests.Response: The response once it succeeded or the retries ran out.
+
+    Raises:
+        requests.HTTPError: If the final response still has a 4xx or 5xx status.
+    """
+    kwargs.setdefault("timeout", _config["timeout"])
+    _limiter.wait()
+    with timed("fetch") as stage:  # the wait of the rate limiter is left out
+        response = get_session().get(url, **kwargs)
+        stage.bytes = len(response.content)
+    response.raise_for_status()
+    return response
@@ -0,0 +1,304 @@
+"""
+corpus.py
+
+Recorded corpus of fotmob pages to benchmark the token parsers and guard their output.
+
+A corpus is a page cache (see cache.py) holding a fixed set of match, league, squad and player
+pages, together with golden.json, the parsed output of every page. It is read in replay mode,
+so nothing in here touches the network.
+
+    record  copies up to --per-kind pages of each kind from a filled page cache into the corpus
+    golden  parses every page of the corpus and writes the output to golden.json
+    run     parses every page, times tokenize_page and each gather_* function separately,
+            measures the peak memory per page and compares the output with golden.json
+
+The run subcommand exits with status 1 if any page parses differently from golden.json, so a
+parser change can be proven safe by running it before and after. When a change of the output
+is intended, write new golden outputs with the golden subcommand.
+
+A small corpus of match, league, squad and player pages is checked in under tests/corpus, and
+tests/test_corpus.py compares the parsers with its golden.json on every test run. That
+golden.json is the output of the parsers from before the fast tokenizer, so do not rewrite it
+with the golden subcommand; tests/test_corpus.py lists where the parsers differ from it on
+purpose. The pages were written in the layout of fotmob's pages while fotmob could not be
+reached, replace them with recorded ones and write golden.json with the old parsers again.
+
+Usage:
+    python -m bettingAI.writer.corpus record [--cache DIR] [--corpus DIR] [--per-kind N]
+    python -m bettingAI.writer.corpus golden [--corpus DIR]
+    python -m bettingAI.writer.corpus run [--corpus DIR] [--repeat N]
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bettingAI.writer.cache import configure_cache, entries, read_object, store
+from bettingAI.writer.gather import (
+    TokenIndex,
+    gather_dtg,
+    gather_league,
+    gather_main_info,
+    gather_match_links,
+    gather_match_statistics,
+    gather_player_bio,
+    gather_player_links,
+    gather_player_performance,
+    gather_team_links,
+)
+from bettingAI.writer.scraper import tokenize_page
+
+# Kind of page per class of URL, first match wins
+KINDS: List[Tuple[str, str]] = [
+    ("match", r"/match/"),
+    ("squad", r"/teams/\d+/squad"),
+    ("league", r"/leagues/"),
+    ("player", r"/players/"),
+]
+
+Timer = Callable[..., Any]
+
+
+def page_kind(url: str) -> Optional[str]:
+    """Returns the kind of page a URL points to, or None if the corpus has no parser for it."""
+    for kind, pattern in KINDS:
+        if re.search(pattern, url):
+            return kind
+    return None
+
+
+def parse_match(url: str, timed: Timer) -> Dict[str, Any]:
+    """Parses a match page the way scraper.parse_match_tokens does, for matches played or not."""
+    tokens = timed("tokenize_page", tokenize_page, url, True)
+    index = timed("TokenIndex", TokenIndex, tokens)
+    dtg = timed("gather_dtg", gather_dtg, tokens[:50])
+    league = timed("gather_league", gather_league, tokens[10:100], index.window(10, 100))
+    mainInfo = timed("gather_main_info", gather_main_info, tokens[:150], index.window(0, 150))
+    statistics = timed(
+        "gather_match_statistics", gather_match_statistics, tokens[:6000], index.window(0, 6000)
+    )
+    players = None
+    if statistics is not None:
+        players = timed(
+            "gather_player_performance", gather_player_performance, tokens[2000:], index.window(2000)
+        )
+    return {
+        "dtg": dtg,
+        "league": league,
+        "maininfo": mainInfo,
+        "statistics": statistics,
+        "players": players,
+    }
+
+
+def parse_league(url: str, timed: Timer) -> Dict[str, Any]:
+    """Parses a league overview page the way scraper.get_team_links and get_match_links do."""
+    tokens = timed("tokenize_page", tokenize_page, url)
+    teams = timed("gather_team_links", gather_team_links, tokens)
+    matches = timed("gather_match_links", gather_match_links, tokens)
+    return {"teams": sorted(teams), "matches": sorted(matches)}
+
+
+def parse_squad(url: str, timed: Timer) -> Dict[str, Any]:
+    """Parses a team squad page the way scraper.get_player_links does."""
+    tokens = timed("tokenize_page", tokenize_page, url)
+    return {"players": timed("gather_player_links", gather_player_links, tokens)}
+
+
+def parse_player(url: str, timed: Timer) -> Dict[str, Any]:
+    """Parses a player page the way scraper.get_player_bio does."""
+    tokens = timed("tokenize_page", tokenize_page, url)
+    return timed("gather_player_bio", gather_player_bio, tokens)
+
+
+PARSERS: Dict[str, Callable[[str, Timer], Dict[str, Any]]] = {
+    "match": parse_match,
+    "league": parse_league,
+    "squad": parse_squad,
+    "player": parse_player,
+}
+
+
+def untimed(stage: str, function: Callable, *args: Any) -> Any:
+    """Timer that only calls the function."""
+    return function(*args)
+
+
+def parse(url: str, timed: Timer = untimed) -> Any:
+    """Parses a page of the corpus into its JSON form, as stored in golden.json.
+
+    A page the parsers fail on is recorded as the name of the exception, so a parser that
+    starts or stops failing on a page shows up as a difference too.
+    """
+    try:
+        output = PARSERS[page_kind(url)](url, timed)
+    except Exception as e:
+        output = {"error": type(e).__name__}
+    return json.loads(json.dumps(output, default=str, sort_keys=True))
+
+
+def _golden_path(directory: str) -> str:
+    return os.path.join(directory, "golden.json")
+
+
+def corpus_urls() -> List[str]:
+    """Returns the URLs of the pages in the corpus the cache is configured with, sorted by kind."""
+    urls = [entry["url"] for entry in entries() if page_kind(entry["url"]) is not None]
+    order = [kind for kind, _ in KINDS]
+    return sorted(urls, key=lambda url: (order.index(page_kind(url)), url))
+
+
+def record(source: str, directory: str, perKind: int = 20) -> Dict[str, int]:
+    """Copies pages of every kind from a page cache into a corpus.
+
+    Args:
+        source (str): Directory of the page cache to copy from.
+        directory (str): Directory of the corpus.
+        perKind (int, optional): Maximum number of pages of each kind. Defaults to 20.
+
+    Returns:
+        Dict[str, int]: The number of pages copied of each kind.
+    """
+    configure_cache(directory=source)
+    pages = {kind: [] for kind, _ in KINDS}
+    for entry in entries():
+        kind = page_kind(entry["url"])
+        if kind is None or len(pages[kind]) >= perKind:
+            continue
+        try:
+            pages[kind].append((entry["url"], read_object(entry["object"])))
+        except FileNotFoundError:
+            continue
+
+    configure_cache(directory=directory)
+    for kind in pages:
+        for url, content in pages[kind]:
+            store(url, content)
+    return {kind: len(pages[kind]) for kind in pages}
+
+
+def write_golden(directory: str) -> int:
+    """Parses every page of a corpus and writes the outputs to golden.json.
+
+    Returns:
+        int: The number of pages parsed.
+    """
+    configure_cache(directory=directory, mode="replay")
+    golden = {url: parse(url) for url in corpus_urls()}
+    with open(_golden_path(directory), "w") as f:
+        json.dump(golden, f, indent=1, sort_keys=True)
+    return len(golden)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Returns the q-th percentile of the values, by nearest rank."""
+    values = sorted(values)
+    return values[max(0, min(len(values) - 1, math.ceil(q / 100 * len(values)) - 1))]
+
+
+def run(directory: str, repeat: int = 1) -> int:
+    """Benchmarks the parsers on every page of a corpus and checks their output.
+
+    Every page is parsed `repeat` times while the time of each stage is measured, and once more
+    under tracemalloc for the peak memory, so the tracing does not slow down the timed runs.
+
+    Args:
+        directory (str): Directory of the corpus.
+        repeat (int, optional): Number of timed runs per page. Defaults to 1.
+
+    Returns:
+        int: The number of pages whose output differs from golden.json.
+    """
+    configure_cache(directory=directory, mode="replay")
+    urls = corpus_urls()
+    try:
+        with open(_golden_path(directory)) as f:
+            golden = json.load(f)
+    except FileNotFoundError:
+        golden = None
+        print("No golden.json in the corpus, only timing the parsers")
+
+    different = 0
+    for kind, _ in KINDS:
+        pages = [url for url in urls if page_kind(url) == kind]
+        if not pages:
+            continue
+
+        stages: Dict[str, List[float]] = {}
+        totals, peaks, failed = [], [], 0
+        for url in pages:
+            for _ in range(repeat):
+                times = {}
+
+                def timed(stage: str, function: Callable, *args: Any) -> Any:
+                    start = time.perf_counter()
+                    try:
+                        return function(*args)
+                    finally:
+                        times[stage] = time.perf_counter() - start
+
+                output = parse(url, timed)
+                for stage, seconds in times.items():
+                    stages.setdefault(stage, []).append(seconds)
+                totals.append(sum(times.values()))
+
+            tracemalloc.start()
+            parse(url)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+            if "error" in output:
+                failed += 1
+            if golden is not None and golden.get(url) != output:
+                different += 1
+                expected = golden.get(url)
+                if expected is None:
+                    print(f"{url}: not in golden.json")
+                else:
+                    keys = [key for key in sorted(set(expected) | set(output)) if expected.get(key) != output.get(key)]
+                    print(f"{url}: output differs from golden.json in {', '.join(map(str, keys))}")
+
+        print(
+            f"{kind}: {len(pages)} pages, {failed} failed, "
+            f"{len(totals) / sum(totals):.1f} pages/sec, "
+            f"peak memory p50 {_percentile(peaks, 50) / 2 ** 20:.1f} MB, "
+            f"max {max(peaks) / 2 ** 20:.1f} MB"
+        )
+        for stage, timings in stages.items():
+            print(
+                f"  {stage:>26}: p50 {1000 * _percentile(timings, 50):8.2f} ms, "
+                f"p95 {1000 * _percentile(timings, 95):8.2f} ms"
+            )
+
+    if golden is not None:
+        print(f"{len(urls) - different} of {len(urls)} pages match golden.json")
+    return different
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the token parsers on a recorded corpus of pages.")
+    parser.add_argument("command", choices=["record", "golden", "run"])
+    parser.add_argument("--corpus", default="corpus", help="directory of the corpus")
+    parser.add_argument("--cache", default="cache", help="page cache to record the corpus from")
+    parser.add_argument("--per-kind", type=int, default=20, help="pages of each kind to record")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per page")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        counts = record(args.cache, args.corpus, args.per_kind)
+        print(", ".join(f"{count} {kind} pages" for kind, count in counts.items()) + f" recorded in {args.corpus}")
+        print("Write the golden outputs with the golden command before changing the parsers")
+    elif args.command == "golden":
+        print(f"Wrote golden outputs of {write_golden(args.corpus)} pages")
+    elif run(args.corpus, args.repeat):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
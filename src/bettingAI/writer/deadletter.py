@@ -0,0 +1,146 @@
+"""
+deadletter.py
+
+Dead letters of the fixtures writer.py failed to fetch, parse or store.
+
+Every fixture that fails is written to dead_letters with the stage it failed in, the class and
+message of the exception, the number of failed attempts and the time of the next retry. The
+wait before a retry doubles with every attempt, from BACKOFF up to MAX_BACKOFF, and from there on
+the fixture is retried every MAX_BACKOFF until it is stored, so a page that is broken for days
+still gets in once fotmob fixes it. A fixture that is stored in the end leaves the table.
+
+retry.py takes the fixtures that are due from here, so after an outage of fotmob only the
+fixtures that failed are fetched again, instead of a full run of the writer.
+
+Like the crawl frontier, the changes are staged in the session and committed with the rows of
+the next flush. The table is created by migration 4, see googleCloud/migrations.py.
+
+Example:
+    deadLetters = DeadLetterQueue(session)
+    deadLetters.record("/match/3901289/...", 47, "2022-2023", FETCH, error)
+    deadLetters.resolve("/match/3901289/...")  # once it is stored
+    deadLetters.checkpoint()
+    session.commit()
+"""
+
+import datetime as dt
+import threading
+from typing import List, Optional, Set
+
+import requests
+import sqlalchemy
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from bettingAI.googleCloud.databaseClasses import DeadLetters
+from bettingAI.googleCloud.migrations import DEAD_LETTERS, require_migration
+from bettingAI.writer.cache import CacheMiss
+from bettingAI.writer.frontier import ERROR_LENGTH, match_id
+
+FETCH = "fetch"
+PARSE = "parse"
+STORE = "store"
+
+BACKOFF = dt.timedelta(minutes=2)  # wait before the first retry, doubled for every further one
+MAX_BACKOFF = dt.timedelta(hours=6)  # wait between the retries of a fixture that keeps failing
+
+
+def stage_of(error: Exception) -> str:
+    """Returns the stage a fixture failed in from the exception the pipeline passed on for it.
+
+    The pipeline hands the exceptions of fetching and of parsing to the writer the same way, so
+    network and cache errors count as FETCH and the rest as PARSE.
+    """
+    if isinstance(error, (requests.RequestException, CacheMiss, OSError)):
+        return FETCH
+    return PARSE
+
+
+def backoff(attempts: int) -> dt.timedelta:
+    """Returns the wait before the next retry of a fixture that failed `attempts` times."""
+    doublings = min(max(attempts - 1, 0), (MAX_BACKOFF // BACKOFF).bit_length())  # attempts have no limit
+    return min(BACKOFF * 2 ** doublings, MAX_BACKOFF)
+
+
+class DeadLetterQueue:
+    """The failed fixtures and when to retry them.
+
+    Raises:
+        MigrationMissing: If dead_letters is not migrated to the database of the session.
+    """
+
+    def __init__(self, session: sqlalchemy.orm.Session) -> None:
+        self.session = session
+        require_migration(session, DEAD_LETTERS)
+        self._resolved: Set[int] = set()  # stored fixtures, deleted with the next checkpoint
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        fixture: str,
+        leagueID: Optional[int],
+        season: str,
+        stage: str,
+        error: Exception,
+        now: Optional[dt.datetime] = None,
+    ) -> None:
+        """Stages a failed attempt of a fixture and schedules its next retry.
+
+        Args:
+            fixture (str): The fotmob link of the match.
+            leagueID (int, optional): The league the fixture was listed in.
+            season (str): The season the fixture was listed in.
+            stage (str): FETCH, PARSE or STORE.
+            error (Exception): The exception the attempt raised.
+            now (datetime.datetime, optional): The time of the attempt. Defaults to now.
+        """
+        id = match_id(fixture)
+        now = now if now is not None else dt.datetime.now()
+        with self._lock:
+            self._resolved.discard(id)
+        attempts = self.session.scalar(
+            select(DeadLetters.attempts).where(DeadLetters.match_id == id)
+        ) or 0
+        attempts += 1
+        values = {
+            "link": fixture,
+            "league_id": leagueID,
+            "season": season,
+            "stage": stage,
+            "error_class": type(error).__name__,
+            "error": str(error)[:ERROR_LENGTH],
+            "attempts": attempts,
+            "last_failed": now,
+            "next_retry": now + backoff(attempts),
+        }
+        statement = insert(DeadLetters).values(match_id=id, first_failed=now, **values)
+        self.session.execute(statement.on_conflict_do_update(index_elements=["match_id"], set_=values))
+
+    def resolve(self, fixture: str) -> None:
+        """Notes that a fixture is stored, its dead letter is deleted with the next checkpoint."""
+        with self._lock:
+            self._resolved.add(match_id(fixture))
+
+    def checkpoint(self) -> None:
+        """Stages the deletion of the dead letters of the fixtures stored since the last checkpoint."""
+        with self._lock:
+            resolved, self._resolved = self._resolved, set()
+        if resolved:
+            self.session.execute(delete(DeadLetters).where(DeadLetters.match_id.in_(resolved)))
+
+    def due(self, now: Optional[dt.datetime] = None, limit: Optional[int] = None) -> List[DeadLetters]:
+        """Returns the dead letters whose retry is due, the longest waiting first.
+
+        Args:
+            now (datetime.datetime, optional): The time to compare the retries with. Defaults to now.
+            limit (int, optional): The maximum number of dead letters. Defaults to all of them.
+        """
+        now = now if now is not None else dt.datetime.now()
+        query = (
+            self.session.query(DeadLetters)
+            .filter(DeadLetters.next_retry <= now)
+            .order_by(DeadLetters.next_retry)
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
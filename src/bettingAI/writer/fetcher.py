@@ -0,0 +1,159 @@
+"""
+fetcher.py
+
+Concurrent fetch engine for the fotmob scraper.
+
+The functions in scraper.py are blocking, one request per call. This module drives
+them from an asyncio event loop on a pool of worker threads, so many pages can be
+in flight at once while the number of concurrent requests stays bounded, both in
+total and per host. Results are handed back in the order they complete.
+
+Example:
+    fixtures = get_match_links(47, "2022-2023")
+    for fixture, result in get_match_infos(fixtures, concurrency=16):
+        if isinstance(result, Exception):
+            continue
+        matchStats, playerStats = result
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Tuple,
+    TypeVar,
+    Union,
+)
+from urllib.parse import urljoin, urlparse
+
+from bettingAI.writer.scraper import get_match_info
+
+BASE_URL = "https://www.fotmob.com"
+
+CONCURRENCY = 8  # requests in flight in total
+PER_HOST = 8  # requests in flight against a single host
+
+Item = TypeVar("Item")
+
+
+def host_of(item: str) -> str:
+    """Returns the host a fotmob link or URL will be fetched from.
+
+    Args:
+        item (str): An absolute URL or a fotmob path such as "/match/3901289".
+
+    Returns:
+        str: The network location of the URL, e.g. "www.fotmob.com".
+    """
+    return urlparse(urljoin(BASE_URL, item)).netloc
+
+
+async def fetch_concurrently(
+    items: Iterable[Item],
+    func: Callable[[Item], Any],
+    concurrency: int = CONCURRENCY,
+    perHost: int = PER_HOST,
+    host: Callable[[Item], str] = host_of,
+) -> AsyncIterator[Tuple[Item, Any]]:
+    """Calls a blocking fetch function for every item and yields the results as they complete.
+
+    Every call runs on a worker thread. At most `concurrency` calls are in flight at the
+    same time, and at most `perHost` of them against the same host.
+
+    Args:
+        items (Iterable[Item]): The items to fetch, typically fotmob links.
+        func (Callable[[Item], Any]): Blocking function that fetches and parses a single item.
+        concurrency (int, optional): Maximum number of calls in flight. Defaults to CONCURRENCY.
+        perHost (int, optional): Maximum number of calls in flight per host. Defaults to PER_HOST.
+        host (Callable[[Item], str], optional): Maps an item to the host it is fetched from.
+
+    Yields:
+        Tuple[Item, Any]: The item and the value returned by `func`. If `func` raised,
+        the exception instance is yielded in place of the value.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    overall = asyncio.Semaphore(concurrency)
+    hosts: Dict[str, asyncio.Semaphore] = {}
+
+    async def run(item: Item) -> Tuple[Item, Any]:
+        hostLimit = hosts.setdefault(host(item), asyncio.Semaphore(perHost))
+        # Take the host slot first so a busy host never holds global slots while waiting
+        async with hostLimit:
+            async with overall:
+                try:
+                    result = await loop.run_in_executor(executor, func, item)
+                except Exception as e:
+                    result = e
+        return item, result
+
+    tasks = [asyncio.ensure_future(run(item)) for item in items]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iterate(results: AsyncIterator[Item]) -> Iterator[Item]:
+    """Drives an async iterator from synchronous code.
+
+    The event loop only runs while the caller waits for the next value. Calls that are
+    already on a worker thread keep running in the meantime, so the pipeline stays full
+    as long as the caller handles each value quickly.
+
+    Args:
+        results (AsyncIterator[Item]): The async iterator to consume.
+
+    Yields:
+        Item: The values produced by `results`.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(results.aclose())
+        loop.close()
+
+
+def get_match_infos(
+    fixtures: Iterable[str],
+    concurrency: int = CONCURRENCY,
+    perHost: int = PER_HOST,
+    **kwargs: Any,
+) -> Iterator[Tuple[str, Union[Exception, Any]]]:
+    """Retrieves match information for many fixtures with several requests in flight.
+
+    This is the bulk version of `get_match_info`. The fixtures are fetched concurrently
+    and each result is yielded as soon as it is ready, so the order is not preserved.
+
+    Args:
+        fixtures (Iterable[str]): Match links as returned by `get_match_links`.
+        concurrency (int, optional): Maximum number of requests in flight. Defaults to CONCURRENCY.
+        perHost (int, optional): Maximum number of requests in flight per host. Defaults to PER_HOST.
+        **kwargs: Passed on to `get_match_info`, e.g. justMain=True.
+
+    Yields:
+        Tuple[str, Union[Exception, Any]]: The fixture link and what `get_match_info` returned
+        for it, or the exception it raised.
+
+    Example:
+        for fixture, result in get_match_infos(get_match_links(47, "2022-2023")):
+            ...
+    """
+
+    def fetch(fixture: str) -> Any:
+        return get_match_info(fixture, **kwargs)
+
+    return iterate(fetch_concurrently(fixtures, fetch, concurrency, perHost))
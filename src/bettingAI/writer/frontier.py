@@ -0,0 +1,168 @@
+"""
+frontier.py
+
+Persisted crawl frontier of writer.py, so a backfill that dies can resume where it stopped.
+
+Every season of every league is listed with `get_match_links` once. The fixtures found are
+stored in crawl_fixtures, and crawl_seasons records that the season was listed, so a restart
+takes the fixtures from the database instead of listing the season again. Each fixture moves
+through the states
+
+    discovered -> fetched -> parsed -> stored
+                                    -> failed
+
+"fetched" and "parsed" are reported by the pipeline while it works and written with the next
+checkpoint. "stored" and "failed" are staged in the same transaction as the rows of the match,
+so a fixture is marked stored exactly when its rows are committed. A restart only queues the
+fixtures that are neither stored nor failed. Failed fixtures are retried by retry.py on the
+schedule of their dead letters (see deadletter.py), never by the frontier.
+
+The tables are created on first use.
+
+Example:
+    frontier = Frontier(session)
+    fixtures = frontier.fixtures(47, "2022-2023", lambda: get_match_links(47, "2022-2023"))
+"""
+
+import datetime as dt
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import sqlalchemy
+from sqlalchemy import update
+
+from bettingAI.googleCloud.databaseClasses import CrawlFixtures, CrawlSeasons, Matches
+
+DISCOVERED = "discovered"
+FETCHED = "fetched"
+PARSED = "parsed"
+STORED = "stored"
+FAILED = "failed"
+
+ERROR_LENGTH = 500  # characters of the error kept per fixture
+
+
+def match_id(fixture: str) -> int:
+    """Returns the fotmob match ID of a fixture link such as "/match/3901289/..."."""
+    return int(fixture.split("/")[2])
+
+
+class Frontier:
+    """The crawl state of the fixtures of every league and season."""
+
+    def __init__(self, session: sqlalchemy.orm.Session) -> None:
+        self.session = session
+        for table in [CrawlSeasons.__table__, CrawlFixtures.__table__]:
+            table.create(session.get_bind(), checkfirst=True)
+        self._progress: Dict[int, str] = {}  # states reported by the pipeline, not written yet
+        self._lock = threading.Lock()
+
+    def fixtures(
+        self,
+        leagueID: int,
+        season: str,
+        listFixtures: Callable[[], Iterable[str]],
+        refresh: Optional[bool] = False,
+    ) -> List[str]:
+        """Returns the links of the fixtures of a season that still have to be stored.
+
+        The first time a season is seen its fixtures are listed with `listFixtures`, and the
+        ones already in the matches table are marked stored. The listing is committed at once,
+        so it is never repeated unless `refresh` is set.
+
+        Args:
+            leagueID (int): The ID of the league.
+            season (str): The season, e.g. "2022-2023".
+            listFixtures (Callable[[], Iterable[str]]): Lists the fixture links of the season,
+                typically by calling `get_match_links`.
+            refresh (bool, optional): List the season again to find new fixtures. Defaults to False.
+
+        Returns:
+            List[str]: The fixtures that are not stored yet and have not failed.
+        """
+        if refresh or self.session.get(CrawlSeasons, (leagueID, season)) is None:
+            self._list(leagueID, season, listFixtures())
+
+        rows = self.session.query(CrawlFixtures.link).filter(
+            (CrawlFixtures.league_id == leagueID)
+            & (CrawlFixtures.season == season)
+            & (CrawlFixtures.state != STORED)
+            & (CrawlFixtures.state != FAILED)  # retried by retry.py, when their dead letter is due
+        )
+        return [row.link for row in rows]
+
+    def _list(self, leagueID: int, season: str, links: Iterable[str]) -> None:
+        links = list(links)
+        known: Set[int] = {  # a fixture is only tracked once, under the season it was found in first
+            row.match_id
+            for row in self.session.query(CrawlFixtures.match_id).filter(
+                CrawlFixtures.match_id.in_([match_id(link) for link in links])
+            )
+        }
+        stored: Set[int] = {
+            row.id
+            for row in self.session.query(Matches.id).filter(
+                (Matches.league_id == leagueID) & (Matches.season == season)
+            )
+        }
+
+        now = dt.datetime.now()
+        for link in links:
+            id = match_id(link)
+            if id in known:
+                continue
+            known.add(id)
+            self.session.add(CrawlFixtures(
+                match_id=id,
+                league_id=leagueID,
+                season=season,
+                link=link,
+                state=STORED if id in stored else DISCOVERED,
+                attempts=0,
+                updated=now,
+            ))
+        self.session.merge(CrawlSeasons(league_id=leagueID, season=season, listed=now))
+        self.session.commit()  # checkpoint the listing
+
+    def progress(self, fixture: str, state: str) -> None:
+        """Notes that a fixture reached a state, to be written with the next checkpoint.
+
+        Safe to call from any thread, e.g. as the progress callback of `run_pipeline`.
+        """
+        with self._lock:
+            self._progress[match_id(fixture)] = state
+
+    def record(self, fixture: str, state: str, error: Optional[Exception] = None) -> None:
+        """Stages the new state of a fixture, to be committed with the session.
+
+        Args:
+            fixture (str): The fotmob link of the match.
+            state (str): The new state, usually STORED, FAILED or DISCOVERED.
+            error (Exception, optional): The exception a failed fixture raised.
+        """
+        id = match_id(fixture)
+        with self._lock:
+            self._progress.pop(id, None)
+        values = {"state": state, "updated": dt.datetime.now()}
+        if state == FAILED:
+            values["attempts"] = CrawlFixtures.attempts + 1
+            values["error"] = f"{type(error)} : {error}"[:ERROR_LENGTH]
+        statement = update(CrawlFixtures).where(CrawlFixtures.match_id == id)
+        if state != STORED:  # a stored fixture stays stored
+            statement = statement.where(CrawlFixtures.state != STORED)
+        self.session.execute(statement.values(**values))
+
+    def checkpoint(self) -> None:
+        """Stages the states reported with `progress` since the last checkpoint."""
+        with self._lock:
+            progress, self._progress = self._progress, {}
+        byState: Dict[str, List[int]] = {}
+        for id, state in progress.items():
+            byState.setdefault(state, []).append(id)
+        now = dt.datetime.now()
+        for state, ids in byState.items():
+            self.session.execute(
+                update(CrawlFixtures)
+                .where(CrawlFixtures.match_id.in_(ids) & (CrawlFixtures.state != STORED))
+                .values(state=state, updated=now)
+            )
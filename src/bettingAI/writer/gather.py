@@ -1,24 +1,189 @@
 import datetime as dt
+import re
+from bisect import bisect_left, bisect_right
+from itertools import compress, count, repeat
 from typing import List, Optional, Dict, Union, Any
 
 from bettingAI.writer.values import *
 
 
-def gather_dtg(
-    information: List[str]
-    ) -> dt.datetime:
-    """Extracts and returns datetime information from the match details.
+# Tokens the gather_* parsers look up, indexed when a TokenIndex is built. Other tokens are
+# indexed on their first lookup.
+INDEXED_TOKENS = frozenset([
+    "parentLeagueId", "homeTeam", "awayTeam", "score",
+    "showSuperLive", "Top", "Total", "shots", "xG", "Passes", "Defence", "Duels", "Yellow", "penalty",
+    "lineup", "firstName", "rating", "played", "Goals", "Assists", "passes", "created", "Touches",
+    "third", "Dispossessed", "won", "Recoveries", "fouled", "committed",
+    "__NEXT_DATA__",
+])
+
+
+class TokenIndex:
+    """The positions of the tokens of a page.
+
+    The index is built once per page and passed to the gather_* functions, so finding a token is
+    a dictionary lookup and a binary search instead of a scan of the token list. A window of the
+    index covers a slice of the tokens, e.g. `index.window(2000)` for `tokens[2000:]`, and gives
+    positions relative to the start of the slice.
+
+    Building the index is a single pass over the tokens that only keeps the tokens in
+    INDEXED_TOKENS, so it costs less than one of the scans it replaces.
+
+    Example:
+        index = TokenIndex(tokens)
+        statistics = gather_match_statistics(tokens[:6000], index.window(0, 6000))
+    """
+
+    def __init__(self, tokens: List[str]) -> None:
+        self.tokens = tokens
+        self.positions: Dict[str, List[int]] = {token: [] for token in INDEXED_TOKENS}
+        for i in compress(count(), map(INDEXED_TOKENS.__contains__, tokens)):
+            self.positions[tokens[i]].append(i)
+        self.prefixes: Dict[str, List[int]] = {}
+        self.start, self.stop = 0, len(tokens)
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def window(self, start: int = 0, stop: Optional[int] = None) -> "TokenIndex":
+        """Returns the index of tokens[start:stop], sharing the positions with this index."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        window = object.__new__(TokenIndex)
+        window.tokens, window.positions, window.prefixes = self.tokens, self.positions, self.prefixes
+        window.start, window.stop = self.start + start, self.start + max(start, stop)
+        return window
+
+    def _positions(self, token: str) -> List[int]:
+        if token not in self.positions:
+            self.positions[token] = list(compress(count(), map(token.__eq__, self.tokens)))
+        return self.positions[token]
+
+    def _prefix_positions(self, prefix: str) -> List[int]:
+        if prefix not in self.prefixes:
+            # Searching the joined tokens is much faster than testing every token, as long as no
+            # token contains the separator. The position of a token is the number of separators
+            # in front of it.
+            text = "\n" + "\n".join(self.tokens)
+            if text.count("\n") == len(self.tokens):
+                positions, position, previous = [], -1, 0
+                i = text.find("\n" + prefix)
+                while i != -1:
+                    position += text.count("\n", previous, i + 1)
+                    previous = i + 1
+                    positions.append(position)
+                    i = text.find("\n" + prefix, i + 1)
+            else:
+                positions = list(compress(count(), map(str.startswith, self.tokens, repeat(prefix))))
+            self.prefixes[prefix] = positions
+        return self.prefixes[prefix]
+
+    def _range(self, positions: List[int], start: int, stop: Optional[int]) -> List[int]:
+        start = self.start + max(start, 0)
+        stop = self.stop if stop is None else min(self.start + stop, self.stop)
+        return positions[bisect_left(positions, start):bisect_left(positions, stop)]
+
+    def find_all(self, token: str, start: int = 0, stop: Optional[int] = None) -> List[int]:
+        """Returns the positions of a token between start and stop."""
+        positions = self._range(self._positions(token), start, stop)
+        return [position - self.start for position in positions]
+
+    def find(self, token: str, start: int = 0, stop: Optional[int] = None) -> Optional[int]:
+        """Returns the first position of a token between start and stop, or None if it is not there."""
+        return self._first(self._positions(token), start, stop)
+
+    def find_all_prefix(self, prefix: str, start: int = 0, stop: Optional[int] = None) -> List[int]:
+        """Returns the positions of the tokens starting with prefix between start and stop."""
+        positions = self._range(self._prefix_positions(prefix), start, stop)
+        return [position - self.start for position in positions]
+
+    def find_prefix(self, prefix: str, start: int = 0, stop: Optional[int] = None) -> Optional[int]:
+        """Returns the first position of a token starting with prefix, or None if there is none."""
+        return self._first(self._prefix_positions(prefix), start, stop)
+
+    def _first(self, positions: List[int], start: int, stop: Optional[int]) -> Optional[int]:
+        i = bisect_left(positions, self.start + max(start, 0))
+        stop = self.stop if stop is None else min(self.start + stop, self.stop)
+        if i < len(positions) and positions[i] < stop:
+            return positions[i] - self.start
+        return None
+
+
+# Keys of each category of statistics returned by gather_match_statistics
+SHOTS_KEYS = [
+    "total shots",
+    "off target",
+    "on target",
+    "blocked shot",
+    "hit woodwork",
+    "inside box",
+    "outside box",
+]
+XG_KEYS = [
+    "expected goals",
+    "first half",
+    "second half",
+    "open play",
+    "set play",
+    "penalty",
+    "on target",
+]
+PASSES_KEYS = [
+    "passes",
+    "accurate passes",
+    "own half",
+    "opposition half",
+    "accurate long balls",
+    "accurate crosses",
+    "throws",
+]
+DEFENCE_KEYS = [
+    "tackles won",
+    "interceptions",
+    "blocks",
+    "clearances",
+    "keeper saves",
+]
+DUELS_KEYS = [
+    "duels won",
+    "ground duels",
+    "aerial duels",
+    "successfull dribbles",
+]
+CARDS_KEYS = ["yellow cards", "red cards"]
+
+
+# UTC offsets in hours of the time zone names a kickoff time can be given in
+TIMEZONES = {
+    "UTC": 0, "GMT": 0, "Z": 0, "WET": 0,
+    "BST": 1, "CET": 1, "WEST": 1,
+    "CEST": 2, "EET": 2,
+    "EEST": 3, "MSK": 3,
+}
+UTC_OFFSET = re.compile(r"(?:UTC|GMT)?([+-])(\d{1,2})(?::?(\d{2}))?")
+# Offset assumed for other time zones, the westernmost, so no kickoff is taken to be earlier than it is
+UNKNOWN_OFFSET = dt.timedelta(hours=-12)
+
+
+def utc_offset(timezone: str) -> dt.timedelta:
+    """Returns the UTC offset of a time zone such as "UTC", "CEST", "GMT+2" or "UTC-03:30".
 
     Args:
-        information (List[str]): A list of strings containing match details.
+        timezone (str): The time zone as written on the page.
 
     Returns:
-        datetime.datetime: The date and time of the match.
-    
-    Note:
-        If the match round is not available (e.g. Club Friendlies), 
-        it is set to None.
+        datetime.timedelta: The offset from UTC, UNKNOWN_OFFSET if the time zone is not recognised.
     """
+    if timezone.upper() in TIMEZONES:
+        return dt.timedelta(hours=TIMEZONES[timezone.upper()])
+    found = UTC_OFFSET.fullmatch(timezone.upper())
+    if found is None:
+        return UNKNOWN_OFFSET
+    sign = -1 if found.group(1) == "-" else 1
+    return sign * dt.timedelta(hours=int(found.group(2)), minutes=int(found.group(3) or 0))
+
+
+def _find_dtg(information: List[str]) -> Dict[str, Any]:
+    """Returns the tokens of the kickoff time, e.g. {"month": "Aug", ..., "timezone": "UTC"}."""
     for i in range(15):
         if information[i] in MONTHS:
             dtg = {}
@@ -28,6 +193,25 @@ def gather_dtg(
                 dtg["matchround"] = int(information[i + j + 2])
             except ValueError:
                 dtg["matchround"] = None
+    return dtg
+
+
+def gather_dtg(
+    information: List[str]
+    ) -> dt.datetime:
+    """Extracts and returns datetime information from the match details.
+
+    Args:
+        information (List[str]): A list of strings containing match details.
+
+    Returns:
+        datetime.datetime: The date and time of the match, in the time zone given on the page.
+    
+    Note:
+        If the match round is not available (e.g. Club Friendlies), 
+        it is set to None.
+    """
+    dtg = _find_dtg(information)
 
     # Convert month name to its corresponding integer value
     month = dt.datetime.strptime(dtg["month"], "%b").month
@@ -40,34 +224,50 @@ def gather_dtg(
     return dt.datetime(year, month, day, hour, minute)
 
 
-def gather_league(
+def gather_kickoff(
     information: List[str]
+    ) -> dt.datetime:
+    """Extracts and returns the kickoff time of the match in UTC.
+
+    Args:
+        information (List[str]): A list of strings containing match details.
+
+    Returns:
+        datetime.datetime: The date and time of the match in UTC. For a time zone that is not
+        recognised it is the latest time the kickoff can be, see UNKNOWN_OFFSET.
+    """
+    return gather_dtg(information) - utc_offset(_find_dtg(information)["timezone"])
+
+
+def gather_league(
+    information: List[str],
+    index: Optional[TokenIndex] = None
     ) -> Dict[str, Any]:
     """Extracts and returns the league ID from the provided match details.
 
     Args:
         information (List[str]): A list of strings containing match details.
+        index (TokenIndex, optional): Index of the same tokens. Built from information if not given.
 
     Returns:
         dict: A dictionary containing the league ID. If no ID is found, 
         the dictionary will contain a None value for the ID.
 
     Note:
-        The function searches for the key 'parentLeagueId' in the list.
+        The function searches for the key 'parentLeagueId' in the first 50 tokens of the list.
         If it is found, the following element (which is assumed to be the ID) is returned.
-        If 'parentLeagueId' is not found in the list, a UnboundLocalError is caught and None is returned.
+        If 'parentLeagueId' is not found, None is returned.
     """
-    for i in range(50):
-        if information[i] == "parentLeagueId":
-            id = information[i + 1][1:]  # removing colon in front of ID -> ':47' -> '47'
-            break
-    try:
-        return {"id": id}
-    except UnboundLocalError:
+    if index is None:
+        index = TokenIndex(information)
+    i = index.find("parentLeagueId", 0, 50)
+    if i is None:
         return {"id": None}
+    return {"id": information[i + 1][1:]}  # removing colon in front of ID -> ':47' -> '47'
 
 def gather_main_info(
-    information: List[str]
+    information: List[str],
+    index: Optional[TokenIndex] = None
     ) -> Dict[
         str,
         Union[str, int]]:
@@ -79,6 +279,7 @@ def gather_main_info(
     
     Args:
         information (List[str]): A list of strings containing match details.
+        index (TokenIndex, optional): Index of the same tokens. Built from information if not given.
 
     Returns:
         dict: A dictionary containing the following match stats:
@@ -91,25 +292,22 @@ def gather_main_info(
             - 'homegd' (int): The home goal difference (home score - away score)
             - 'awaygd' (int): The away goal difference (away score - home score)
     """
+    if index is None:
+        index = TokenIndex(information)
+
     # Find team names
     team = dict()
     ids = list()
     for side in ["homeTeam", "awayTeam"]:
-        for i, info in enumerate(information):
-            if info == side:
-                for j in range(1, 10):
-                    if information[i + j][0] == ":":
-                        length = j
-                        team[side] = [information[i + j] for j in range(1, length)]
-                        ids.append(information[i + j].replace(":", ""))
-                        break
+        for i in index.find_all(side):
+            for j in range(1, 10):
+                if information[i + j][0] == ":":
+                    length = j
+                    team[side] = [information[i + j] for j in range(1, length)]
+                    ids.append(information[i + j].replace(":", ""))
+                    break
     # Find score
-    score = []
-    for i, info in enumerate(information):
-        if len(score) == 2:
-            break
-        if info == "score":
-            score.append(information[i + 1].replace(":", ""))
+    score = [information[i + 1].replace(":", "") for i in index.find_all("score")[:2]]
 
     # Create dict with information
     mainInfo = {
@@ -125,7 +323,10 @@ def gather_main_info(
 
     return mainInfo
 
-def gather_match_statistics(information: List[str]) -> Dict[str, Any]:
+def gather_match_statistics(
+    information: List[str],
+    index: Optional[TokenIndex] = None
+    ) -> Dict[str, Any]:
     """Extracts and returns the match statistics from the provided match details.
 
     The function searches for specific activation words to locate the start index of each category of statistics.
@@ -182,35 +383,34 @@ def gather_match_statistics(information: List[str]) -> Dict[str, Any]:
 
     Args:
         information (List[str]): A list of strings containing match details.
+        index (TokenIndex, optional): Index of the same tokens. Built from information if not given.
 
     Returns:
         Optional[Dict[str, Dict[str, Union[str, List[List[str]]]]]]: A dictionary containing the match statistics.
         If the start index of the statistics cannot be found, None is returned.
     """
 
+    if index is None:
+        index = TokenIndex(information)
+
     def find_start_index(information: List[str]) -> int:
+        # The statistics start at the second "Total" after "showSuperLive"
         total = 0
-        start = None
-        for i, info in enumerate(information):
-            if info == "showSuperLive":
-                for j in range(200):
-                    if information[i + j] == "Total":
-                        total += 1
-                    if total == 2:
-                        return i + j
-
-        if start is None:
-            for i, info in enumerate(information):
-                if info == "Top":
-                    total = 0
-                    for j in range(200):
-                        if i + j == len(information):
-                            return False
-                        if information[i + j] == "Total":
-                            total += 1
-                        if total == 2:
-                            start = i + j
-                            return start
+        for i in index.find_all("showSuperLive"):
+            totals = index.find_all("Total", i, i + 200)
+            if total + len(totals) >= 2:
+                return totals[1 - total]
+            if i + 200 > len(information):
+                raise IndexError("statistics run past the end of the tokens")
+            total += len(totals)
+
+        # Or else at the second "Total" after "Top"
+        for i in index.find_all("Top"):
+            totals = index.find_all("Total", i, i + 200)
+            if len(totals) >= 2:
+                return totals[1]
+            if i + 200 > len(information):
+                return False
         return False
 
     def extract_stats_by_activation_word(
@@ -218,34 +418,32 @@ def gather_match_statistics(information: List[str]) -> Dict[str, Any]:
     ) -> List[List[str]]:
         data = []
         found_values = 0
-        i = start
+        i = index.find(activation_word, start)
+        if i is None:
+            return data
+        i += 1
         while found_values < stats_count and i < len(information):
-            if information[i] == activation_word:
-                i += 1
-                while found_values < stats_count and i < len(information):
-                    if any(char.isdigit() for char in information[i]):
-                        if "," not in information[i]:
-                            if information[i + 2] == "%":
-                                data.append(
-                                    [
-                                        information[i],
-                                        information[i + 1],
-                                        information[i + 3],
-                                        information[i + 4],
-                                    ]
-                                )
-                                found_values += 1
-                                i += 5
-                            else:
-                                data.append([information[i], information[i + 1]])
-                                found_values += 1
-                                i += 2
-                        else:
-                            data.append(information[i].split(","))
-                            found_values += 1
-                            i += 1
+            if any(char.isdigit() for char in information[i]):
+                if "," not in information[i]:
+                    if information[i + 2] == "%":
+                        data.append(
+                            [
+                                information[i],
+                                information[i + 1],
+                                information[i + 3],
+                                information[i + 4],
+                            ]
+                        )
+                        found_values += 1
+                        i += 5
                     else:
-                        i += 1
+                        data.append([information[i], information[i + 1]])
+                        found_values += 1
+                        i += 2
+                else:
+                    data.append(information[i].split(","))
+                    found_values += 1
+                    i += 1
             else:
                 i += 1
         return data
@@ -255,29 +453,12 @@ def gather_match_statistics(information: List[str]) -> Dict[str, Any]:
         return None
 
     # Shots
-    shots_keys = [
-        "total shots",
-        "off target",
-        "on target",
-        "blocked shot",
-        "hit woodwork",
-        "inside box",
-        "outside box",
-    ]
-    shots = extract_stats_by_activation_word("shots", start, len(shots_keys))
-    shots_dict = {key: value for key, value in zip(shots_keys, shots)}
+    shots = extract_stats_by_activation_word("shots", start, len(SHOTS_KEYS))
+    shots_dict = {key: value for key, value in zip(SHOTS_KEYS, shots)}
 
     # xG
-    xg_keys = [
-        "expected goals",
-        "first half",
-        "second half",
-        "open play",
-        "set play",
-        "penalty",
-        "on target",
-    ]
-    if "penalty" not in information[start : start + 200]:
+    xg_keys = list(XG_KEYS)
+    if index.find("penalty", start, start + 200) is None:
         xg_keys.remove(
             "penalty"
         )  # information will only contain xg penalty if there was a penalty
@@ -286,43 +467,20 @@ def gather_match_statistics(information: List[str]) -> Dict[str, Any]:
     xg_dict = {key: value for key, value in zip(xg_keys, xg)}
 
     # Passes
-    passes_keys = [
-        "passes",
-        "accurate passes",
-        "own half",
-        "opposition half",
-        "accurate long balls",
-        "accurate crosses",
-        "throws",
-    ]
-    passes = extract_stats_by_activation_word("Passes", start, len(passes_keys))
-    passes_dict = {key: value for key, value in zip(passes_keys, passes)}
+    passes = extract_stats_by_activation_word("Passes", start, len(PASSES_KEYS))
+    passes_dict = {key: value for key, value in zip(PASSES_KEYS, passes)}
 
     # Defence
-    defence_keys = [
-        "tackles won",
-        "interceptions",
-        "blocks",
-        "clearances",
-        "keeper saves",
-    ]
-    defence = extract_stats_by_activation_word("Defence", start, len(defence_keys))
-    defence_dict = {key: value for key, value in zip(defence_keys, defence)}
+    defence = extract_stats_by_activation_word("Defence", start, len(DEFENCE_KEYS))
+    defence_dict = {key: value for key, value in zip(DEFENCE_KEYS, defence)}
 
     # Duels
-    duels_keys = [
-        "duels won",
-        "ground duels",
-        "aerial duels",
-        "successfull dribbles",
-    ]
-    duels = extract_stats_by_activation_word("Duels", start, len(duels_keys))
-    duels_dict = {key: value for key, value in zip(duels_keys, duels)}
+    duels = extract_stats_by_activation_word("Duels", start, len(DUELS_KEYS))
+    duels_dict = {key: value for key, value in zip(DUELS_KEYS, duels)}
 
     # Cards
-    cards_keys = ["yellow cards", "red cards"]
-    cards = extract_stats_by_activation_word("Yellow", start, len(cards_keys))
-    cards_dict = {key: value for key, value in zip(cards_keys, cards)}
+    cards = extract_stats_by_activation_word("Yellow", start, len(CARDS_KEYS))
+    cards_dict = {key: value for key, value in zip(CARDS_KEYS, cards)}
 
     return {
         "shots": shots_dict,
@@ -335,6 +493,7 @@ def gather_match_statistics(information: List[str]) -> Dict[str, Any]:
 
 def gather_player_bio(
     information: List[str],
+    index: Optional[TokenIndex] = None
     ) -> Dict[
         str, 
         Union[Dict[str, Any], List]]:
@@ -363,14 +522,17 @@ def gather_player_bio(
 
     Args:
         information (List[str]): A list of strings containing player details.
+        index (TokenIndex, optional): Index of the same tokens. Built from information if not given.
 
     Returns:
         Dict[str, Union[Dict[str, Any], List]]: A dictionary containing the player's bio and season statistics.
     """
+    if index is None:
+        index = TokenIndex(information)
+
     # Find indexes for iteration
-    for i, info in enumerate(information):
-        if info == "__NEXT_DATA__":
-            information = information[i : i + 200]
+    for i in index.find_all("__NEXT_DATA__"):
+        information = information[i : i + 200]
 
     # Find bio statistics
     bio = {}
@@ -419,7 +581,10 @@ def gather_player_bio(
     return {"bio": bio, "season": season}
 
 
-def gather_player_performance(information: List[str]) -> Dict[str, Any]:
+def gather_player_performance(
+    information: List[str],
+    index: Optional[TokenIndex] = None
+    ) -> Dict[str, Any]:
     """
     Extracts and returns the performance statistics for each player from the provided match details.
 
@@ -456,18 +621,20 @@ def gather_player_performance(information: List[str]) -> Dict[str, Any]:
 
     Args:
         information (List[str]): A list of strings containing player performance details.
+        index (TokenIndex, optional): Index of the same tokens. Built from information if not given.
 
     Returns:
         Dict[str, Any]: A dictionary containing the performance statistics for each player.
     """
     playerPerformance = {}  # init the dict to store players
+    if index is None:
+        index = TokenIndex(information)
 
     # Find the start of the player stats section
-    for i, info in enumerate(information):
-        if (
-            info == "lineup" and information[i + 1] == "lineup"
-        ):  # two lineup following each other is the start signal
+    for i in index.find_all("lineup"):
+        if information[i + 1] == "lineup":  # two lineup following each other is the start signal
             information = information[i:]
+            index = index.window(i)
             break
 
     playerInfo = [
@@ -512,11 +679,18 @@ def gather_player_performance(information: List[str]) -> Dict[str, Any]:
     currentPlayer, idx = {}, 0  # to store current player stats
     onPlayer = False  # to switch between to modes: gather stats or find new player
 
-    for i, info in enumerate(information):
+    # Only the tokens the parser acts on are visited
+    following = sorted(set(
+        index.find_all_prefix("/players")
+        + [i for token in set(playerInfo + ["firstName"]) for i in index.find_all(token)]
+    ))
+    i = following[0] if following else None
+    while i is not None:
+        info = information[i]
 
         # Check if we are starting on a new player
         if (info == "firstName" and onPlayer) or (
-            len(currentPlayer.keys()) == len(playerStat) - 1
+            len(currentPlayer.keys()) == len(playerStat)
         ):
             if currentPlayer != {}:
                 playerPerformance[playerName] = currentPlayer
@@ -530,11 +704,11 @@ def gather_player_performance(information: List[str]) -> Dict[str, Any]:
             if info == playerInfo[idx]:  # find current stat
                 if idx > 0:
                     if any(char.isdigit() for char in information[i + 1]):
-                        currentPlayer[playerStat[idx]] = information[i + 1].replace(
+                        currentPlayer[playerStat[idx - 1]] = information[i + 1].replace(
                             ":", ""
                         )  # append the current stat and remove colon from number: ":2" -> "2"
                     else:
-                        currentPlayer[playerStat[idx]] = None
+                        currentPlayer[playerStat[idx - 1]] = None
                 idx += 1  # next index value
         else:  # if in find new player mode
             if info == "firstName":  # gather the name of the player
@@ -549,12 +723,16 @@ def gather_player_performance(information: List[str]) -> Dict[str, Any]:
                                 if information[i + n] not in ["firstName", "lastName"]
                             ]
                         )
-                        if playerName in playerPerformance.keys():
-                            pass
-                        playerPerformance[playerName] = {}
                         onPlayer = True  # we are on a player and the following stats will belong to current player
                         break
 
+        # A complete player is stored at the next token, whatever it is
+        if len(currentPlayer.keys()) == len(playerStat):
+            i = i + 1 if i + 1 < len(information) else None
+        else:
+            j = bisect_right(following, i)
+            i = following[j] if j < len(following) else None
+
     # Return a dict containing all players
     return playerPerformance
 
@@ -586,4 +764,56 @@ def gather_next_match_info(
                 return ids
             nextNumber = False
             
-    return None
\ No newline at end of file
+    return None
+
+def gather_team_links(
+    information: List[str]
+    ) -> List[str]:
+    """Extracts and returns the team links from the tokens of a league overview page.
+
+    Args:
+        information (List[str]): A list of strings containing league details.
+
+    Returns:
+        List[str]: The distinct links starting with "/teams", in no particular order.
+    """
+    return [*set(info for info in information if info[:6] == "/teams")]
+
+
+def gather_match_links(
+    information: List[str]
+    ) -> List[str]:
+    """Extracts and returns the match links from the tokens of a league overview page.
+
+    Args:
+        information (List[str]): A list of strings containing league details.
+
+    Returns:
+        List[str]: The distinct links starting with "/match", in no particular order.
+    """
+    return [*set(info for info in information if info[:6] == "/match")]
+
+
+def gather_player_links(
+    information: List[str]
+    ) -> List[str]:
+    """Extracts and returns the player links from the tokens of a team squad page.
+
+    The links on the page are absolute, e.g. "//www.fotmob.com/players/123/name",
+    and are returned relative to the site, e.g. "/players/123/name".
+
+    Args:
+        information (List[str]): A list of strings containing squad details.
+
+    Returns:
+        List[str]: The distinct player links, in the order they appear on the page.
+    """
+    main = "//www.fotmob.com"
+    player = "/players"
+
+    playerUrls = []
+    for info in information:
+        if info[len(main) : len(main) + len(player)] == player:
+            if info[len(main) :] not in playerUrls:
+                playerUrls.append(info[len(main) :])
+    return playerUrls
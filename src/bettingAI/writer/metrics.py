@@ -0,0 +1,263 @@
+"""
+metrics.py
+
+Per-stage timings of the writer, the updater and the prediction scripts.
+
+Every call of a stage is timed and kept for the run, together with the items it handled and
+the bytes it read. The stages are
+
+    fetch     a page downloaded by client.py, with the bytes of its body
+    tokenize  a page tokenized by scraper.py
+    parse     a match page parsed by scraper.py, its tokenizing included
+    build     the rows of a match built by rows.py, with the rows as items
+    flush     rows written to the database and committed, with the rows as items
+    features  the model inputs of a match computed by processing/features.py
+    predict   a model prediction
+
+At the end of a run `write_report` writes the percentiles (p50, p95, p99) of every stage, its
+total time, and its items and bytes per second of the run to a JSON file in the reports
+directory. If BETTINGAI_METRICS_TEXTFILE_DIR is set, the same numbers are written to
+bettingai_<job>.prom there, for the textfile collector of the Prometheus node exporter.
+
+The timings are kept per process. The parser processes of pipeline.py run their work through
+`measured`, which hands the timings back with the result so `merge` can add them here.
+
+Example:
+    with timed("flush") as stage:
+        stage.items = len(rows)
+        ...
+    write_report("writer", counters=trackData)
+"""
+
+import datetime as dt
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_config = {
+    "directory": os.environ.get("BETTINGAI_METRICS_DIR", "reports"),
+    "textfileDirectory": os.environ.get("BETTINGAI_METRICS_TEXTFILE_DIR"),
+}
+
+Sample = Tuple[str, float, int, int]  # stage, seconds, items, bytes
+
+
+class Stage:
+    """The timings of one stage."""
+
+    def __init__(self) -> None:
+        self.samples: List[float] = []  # seconds of every call
+        self.items = 0
+        self.bytes = 0
+
+
+class Measure:
+    """What a timed call handled, filled in by the caller inside `timed`."""
+
+    def __init__(self, items: int = 1, bytes: int = 0) -> None:
+        self.items = items
+        self.bytes = bytes
+
+
+_stages: Dict[str, Stage] = {}
+_started = time.time()
+_lock = threading.Lock()
+_local = threading.local()  # collects the samples of `measured` instead of _stages
+
+
+def configure_metrics(directory: Optional[str] = None, textfileDirectory: Optional[str] = None) -> None:
+    """Changes where the reports are written.
+
+    Args:
+        directory (str, optional): Directory of the JSON reports.
+        textfileDirectory (str, optional): Directory of the Prometheus textfiles.
+    """
+    for key, value in [("directory", directory), ("textfileDirectory", textfileDirectory)]:
+        if value is not None:
+            _config[key] = value
+
+
+def reset() -> None:
+    """Forgets the timings so far and starts the clock of the run again."""
+    global _started
+    with _lock:
+        _stages.clear()
+        _started = time.time()
+
+
+def observe(stage: str, seconds: float, items: int = 1, bytes: int = 0) -> None:
+    """Records one call of a stage.
+
+    Args:
+        stage (str): The name of the stage, e.g. "fetch".
+        seconds (float): How long the call took.
+        items (int, optional): Pages, rows or matches handled by the call. Defaults to 1.
+        bytes (int, optional): Bytes read by the call. Defaults to 0.
+    """
+    sink = getattr(_local, "sink", None)
+    if sink is not None:
+        sink.append((stage, seconds, items, bytes))
+        return
+    with _lock:
+        timings = _stages.setdefault(stage, Stage())
+        timings.samples.append(seconds)
+        timings.items += items
+        timings.bytes += bytes
+
+
+@contextmanager
+def timed(stage: str, items: int = 1) -> Iterator[Measure]:
+    """Times the block as one call of a stage, also when it raises.
+
+    Args:
+        stage (str): The name of the stage.
+        items (int, optional): Items handled, unless the block sets `items` of the Measure. Defaults to 1.
+
+    Yields:
+        Measure: Set its `items` and `bytes` to what the block handled.
+    """
+    measure = Measure(items)
+    start = time.perf_counter()
+    try:
+        yield measure
+    finally:
+        observe(stage, time.perf_counter() - start, measure.items, measure.bytes)
+
+
+def measured(func: Callable[..., Any], *args: Any) -> Tuple[Any, List[Sample]]:
+    """Calls a function and returns its result together with the samples it recorded.
+
+    Meant for worker processes, whose timings would be lost otherwise. Pass the samples to `merge`.
+    """
+    _local.sink = []
+    try:
+        result = func(*args)
+        return result, _local.sink
+    finally:
+        _local.sink = None
+
+
+def merge(samples: List[Sample]) -> None:
+    """Records the samples returned by `measured`."""
+    for sample in samples:
+        observe(*sample)
+
+
+def percentile(samples: List[float], quantile: float) -> float:
+    """Returns the nearest-rank percentile of sorted samples, 0 if there are none."""
+    if not samples:
+        return 0.0
+    return samples[max(0, math.ceil(quantile * len(samples)) - 1)]
+
+
+def summary() -> Dict[str, Any]:
+    """Returns the timings of the run so far.
+
+    Returns:
+        Dict[str, Any]: When the run started, its seconds so far, and for every stage the number
+        of calls, the total, mean, percentile and maximum seconds per call, the items and bytes,
+        and the items and bytes per second of the run.
+    """
+    with _lock:
+        stages = {name: (sorted(stage.samples), stage.items, stage.bytes) for name, stage in _stages.items()}
+        started = _started
+    seconds = max(time.time() - started, 1e-9)
+
+    report: Dict[str, Any] = {
+        "started": dt.datetime.fromtimestamp(started).isoformat(),
+        "seconds": seconds,
+        "stages": {},
+    }
+    for name, (samples, items, bytes) in stages.items():
+        total = sum(samples)
+        report["stages"][name] = {
+            "calls": len(samples),
+            "seconds": total,
+            "mean": total / len(samples) if samples else 0.0,
+            **{f"p{round(quantile * 100)}": percentile(samples, quantile) for quantile in QUANTILES},
+            "max": samples[-1] if samples else 0.0,
+            "items": items,
+            "bytes": bytes,
+            "itemsPerSecond": items / seconds,
+            "bytesPerSecond": bytes / seconds,
+        }
+    return report
+
+
+def prometheus_text(job: str, report: Dict[str, Any], counters: Optional[Mapping[str, Any]] = None) -> str:
+    """Formats a summary in the Prometheus text exposition format."""
+    lines = [
+        "# HELP bettingai_stage_seconds Seconds per call of a stage in the last run.",
+        "# TYPE bettingai_stage_seconds summary",
+    ]
+    for name, stage in report["stages"].items():
+        labels = f'job="{job}",stage="{name}"'
+        for quantile in QUANTILES:
+            lines.append(f'bettingai_stage_seconds{{{labels},quantile="{quantile}"}} {stage[f"p{round(quantile * 100)}"]}')
+        lines.append(f"bettingai_stage_seconds_sum{{{labels}}} {stage['seconds']}")
+        lines.append(f"bettingai_stage_seconds_count{{{labels}}} {stage['calls']}")
+    for metric, key, help in [
+        ("bettingai_stage_items", "items", "Items handled by a stage in the last run."),
+        ("bettingai_stage_bytes", "bytes", "Bytes read by a stage in the last run."),
+    ]:
+        lines += [f"# HELP {metric} {help}", f"# TYPE {metric} gauge"]
+        for name, stage in report["stages"].items():
+            lines.append(f'{metric}{{job="{job}",stage="{name}"}} {stage[key]}')
+    lines += [
+        "# HELP bettingai_run_seconds Wall time of the last run.",
+        "# TYPE bettingai_run_seconds gauge",
+        f'bettingai_run_seconds{{job="{job}"}} {report["seconds"]}',
+        "# HELP bettingai_run_end_timestamp_seconds When the last run ended.",
+        "# TYPE bettingai_run_end_timestamp_seconds gauge",
+        f'bettingai_run_end_timestamp_seconds{{job="{job}"}} {time.time()}',
+    ]
+    if counters:
+        lines += [
+            "# HELP bettingai_run_count Counters of the last run, e.g. matches added.",
+            "# TYPE bettingai_run_count gauge",
+        ]
+        for name, value in sorted(counters.items()):
+            lines.append(f'bettingai_run_count{{job="{job}",name="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def write_report(
+    job: str,
+    counters: Optional[Mapping[str, Any]] = None,
+    test: Optional[bool] = False,
+) -> Dict[str, Any]:
+    """Writes the timings of the run to a JSON report, and to a Prometheus textfile if configured.
+
+    Args:
+        job (str): The program that ran, e.g. "writer", "update" or "upcoming".
+        counters (Mapping[str, Any], optional): Counters of the run to include, e.g. the
+            Counter passed to `createReport`.
+        test (bool, optional): Only return the report without writing any file. Defaults to False.
+
+    Returns:
+        Dict[str, Any]: The report, as written to the JSON file.
+    """
+    report = {"job": job, **summary(), "counters": dict(counters or {})}
+    if test:
+        return report
+
+    formattedDate = dt.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    os.makedirs(_config["directory"], exist_ok=True)
+    with open(os.path.join(_config["directory"], f"metrics {job} {formattedDate}.json"), "w") as f:
+        json.dump(report, f, indent=2)
+
+    if _config["textfileDirectory"]:
+        # Write next to the file and rename, so the collector never reads half a file
+        directory = _config["textfileDirectory"]
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, "w") as f:
+            f.write(prometheus_text(job, report, counters))
+        os.replace(temporary, os.path.join(directory, f"bettingai_{job}.prom"))
+    return report
@@ -0,0 +1,167 @@
+"""
+pipeline.py
+
+Staged pipeline that fetches, parses and stores match pages at the same time.
+
+The fetch engine in fetcher.py runs `get_match_info` on worker threads, so the parsing of a page
+happens on the same thread as its download and the whole program parses on a single core because
+of the GIL. This module splits the work into three stages connected by bounded queues:
+
+    fetch   asyncio tasks download the pages on a thread pool, at most `fetchers` at a time
+    parse   the pages are parsed by `parse_match_page` on a pool of `parsers` processes
+    write   a single writer hands the parsed fixtures in batches to a callback on one thread,
+            which owns the database session
+
+The queues between the stages hold at most `queueSize` items. A stage that runs ahead of the
+next one waits for room in its queue, so a slow database slows down the parsers and the
+fetchers instead of piling up pages in memory.
+
+Example:
+    def write(batch):
+        for fixture, result in batch:
+            ...  # add the rows to the session and commit once
+
+    run_pipeline(get_match_links(47, "2022-2023"), write)
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Union
+
+from bettingAI.writer import scraper
+from bettingAI.writer.cache import forget, load_page
+from bettingAI.writer.fetcher import BASE_URL, CONCURRENCY
+from bettingAI.writer.metrics import measured, merge
+from bettingAI.writer.scraper import configure_extraction, parse_match_page
+
+PARSERS = os.cpu_count() or 1  # parser processes
+QUEUE_SIZE = 32  # items waiting between two stages
+BATCH_SIZE = 20  # fixtures per call of the write callback
+
+Result = Tuple[str, Union[Exception, Any]]
+
+
+async def _pipeline(
+    fixtures: Iterable[str],
+    write: Callable[[List[Result]], None],
+    fetchers: int,
+    parsers: int,
+    batchSize: int,
+    queueSize: int,
+    progress: Optional[Callable[[str, str], None]],
+) -> None:
+    loop = asyncio.get_running_loop()
+    pages: asyncio.Queue = asyncio.Queue(queueSize)
+    parsed: asyncio.Queue = asyncio.Queue(queueSize)
+    fixtures = iter(fixtures)
+
+    # Spawn the parser processes instead of forking them, as the fetch threads may hold locks
+    processes = ProcessPoolExecutor(
+        max_workers=parsers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=configure_extraction,
+        initargs=(scraper._config["extraction"],),
+    )
+    threads = ThreadPoolExecutor(max_workers=fetchers)
+    database = ThreadPoolExecutor(max_workers=1)
+
+    async def fetch() -> None:
+        for fixture in fixtures:  # the fetch tasks share the iterator
+            try:
+                content = await loop.run_in_executor(threads, load_page, BASE_URL + fixture)
+            except Exception as e:
+                await parsed.put((fixture, e))  # nothing to parse, go straight to the writer
+                continue
+            if progress is not None:
+                progress(fixture, "fetched")
+            await pages.put((fixture, content))
+
+    async def parse() -> None:
+        while True:
+            item = await pages.get()
+            if item is None:
+                await parsed.put(None)
+                return
+            fixture, content = item
+            try:
+                # the timings of the parser process come back with the result
+                result, samples = await loop.run_in_executor(processes, measured, parse_match_page, content)
+                merge(samples)
+                if result[0] is False:  # the page will change, do not keep it cached
+                    forget(BASE_URL + fixture)
+                elif progress is not None:
+                    progress(fixture, "parsed")
+            except Exception as e:
+                forget(BASE_URL + fixture)  # the cached copy may be broken, the retry downloads it again
+                result = e
+            await parsed.put((fixture, result))
+
+    async def store() -> None:
+        batch: List[Result] = []
+        flushing: Optional[asyncio.Future] = None
+        remaining = parsers
+        while remaining:
+            item = await parsed.get()
+            if item is None:
+                remaining -= 1
+                continue
+            batch.append(item)
+            if len(batch) >= batchSize:
+                if flushing is not None:
+                    await flushing  # one batch at a time, the next one is gathered meanwhile
+                flushing = loop.run_in_executor(database, write, batch)
+                batch = []
+        if flushing is not None:
+            await flushing
+        if batch:
+            await loop.run_in_executor(database, write, batch)
+
+    async def fetch_all() -> None:
+        await asyncio.gather(*[fetch() for _ in range(fetchers)])
+        for _ in range(parsers):
+            await pages.put(None)
+
+    tasks = [asyncio.ensure_future(fetch_all())]
+    tasks += [asyncio.ensure_future(parse()) for _ in range(parsers)]
+    tasks.append(asyncio.ensure_future(store()))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        threads.shutdown(wait=False, cancel_futures=True)
+        processes.shutdown(wait=False, cancel_futures=True)
+        database.shutdown(wait=True)
+
+
+def run_pipeline(
+    fixtures: Iterable[str],
+    write: Callable[[List[Result]], None],
+    fetchers: int = CONCURRENCY,
+    parsers: int = PARSERS,
+    batchSize: int = BATCH_SIZE,
+    queueSize: int = QUEUE_SIZE,
+    progress: Optional[Callable[[str, str], None]] = None,
+) -> None:
+    """Fetches, parses and writes match pages in three concurrent stages.
+
+    Each fixture ends up in exactly one batch passed to `write`, together with what
+    `get_match_info` would have returned for it, or the exception raised while fetching or
+    parsing the page. Batches are written one at a time, in the order the fixtures finish
+    parsing, on a single thread that is never used for anything else. If `write` raises,
+    the pipeline stops and the exception is raised here.
+
+    Args:
+        fixtures (Iterable[str]): Match links as returned by `get_match_links`.
+        write (Callable[[List[Tuple[str, Any]]], None]): Stores a batch of (fixture, result) pairs.
+        fetchers (int, optional): Maximum number of pages downloaded at a time. Defaults to CONCURRENCY.
+        parsers (int, optional): Number of parser processes. Defaults to the number of CPUs.
+        batchSize (int, optional): Fixtures per batch. Defaults to BATCH_SIZE.
+        queueSize (int, optional): Maximum number of items waiting between two stages. Defaults to QUEUE_SIZE.
+        progress (Callable[[str, str], None], optional): Called with the fixture and "fetched" or
+            "parsed" when a page passes a stage, e.g. `Frontier.progress`. Runs on the event loop,
+            so it must return quickly.
+    """
+    asyncio.run(_pipeline(fixtures, write, fetchers, parsers, batchSize, queueSize, progress))
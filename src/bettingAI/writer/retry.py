@@ -0,0 +1,127 @@
+"""
+retry.py
+
+Fetches the fixtures in dead_letters again once their retry is due (see deadletter.py).
+
+The due fixtures are grouped by league and season and run through the same pipeline and bulk
+writer as in writer.py. A fixture that is stored now leaves dead_letters, one that fails again
+is rescheduled with a longer wait. A fixture that turns out not to be played yet is dropped, as
+update.py adds it once it is.
+
+Ment to be run every few minutes, e.g. every 10 minutes from cron, so the matches lost to an
+outage are filled in without a full run of the writer.
+
+Usage:
+    python -m bettingAI.writer.retry             # retry the fixtures that are due
+    python -m bettingAI.writer.retry --limit 500 # at most 500 of them
+    python -m bettingAI.writer.retry --list      # only list the dead letters that are due
+"""
+
+import argparse
+import datetime as dt
+import logging
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import sqlalchemy
+
+from bettingAI.googleCloud.databaseClasses import Matches, PlayerStats
+from bettingAI.googleCloud.initPostgreSQL import initSession
+from bettingAI.writer.bulk import bulk_writer
+from bettingAI.writer.deadletter import STORE, DeadLetterQueue
+from bettingAI.writer.frontier import FAILED, STORED, Frontier
+from bettingAI.writer.metrics import write_report
+from bettingAI.writer.pipeline import run_pipeline
+from bettingAI.writer.writer import initLogger, write_matches
+
+logger = logging.getLogger()
+
+
+def retry(
+    session: sqlalchemy.orm.Session,
+    limit: Optional[int] = None,
+    now: Optional[dt.datetime] = None,
+) -> Counter:
+    """Fetches, parses and stores the fixtures whose retry is due.
+
+    Args:
+        session (sqlalchemy.orm.Session): The database session object used for database operations.
+        limit (int, optional): The maximum number of fixtures retried. Defaults to all that are due.
+        now (datetime.datetime, optional): The time to compare the retries with. Defaults to now.
+
+    Returns:
+        Counter: Counter of explored and added rows, like the one of writer.py.
+    """
+    deadLetters = DeadLetterQueue(session)
+    frontier = Frontier(session)
+
+    groups: Dict[Tuple[Optional[int], str], List[str]] = defaultdict(list)
+    for letter in deadLetters.due(now, limit):
+        groups[(letter.league_id, letter.season)].append(letter.link)
+    logger.info(f"Retrying {sum(len(fixtures) for fixtures in groups.values())} fixtures")
+
+    trackData: Counter = Counter()
+    errors: Counter = Counter()
+    for (leagueID, season), fixtures in groups.items():
+
+        def written(table: str, fixture: str, error: Optional[Exception]) -> None:
+            frontier.record(fixture, FAILED if error else STORED, error)
+            if error:
+                deadLetters.record(fixture, leagueID, season, STORE, error)
+            else:
+                deadLetters.resolve(fixture)
+
+        def flushed() -> None:
+            frontier.checkpoint()
+            deadLetters.checkpoint()
+
+        def failed(fixture: str, stage: str, error: Exception) -> None:
+            deadLetters.record(fixture, leagueID, season, stage, error)
+
+        bulk = bulk_writer(session, onRow=written, onFlush=flushed)
+
+        def write(batch: List[Tuple[str, Any]]) -> None:
+            for fixture, result in batch:
+                if not isinstance(result, Exception) and result[0] is False:  # not played yet
+                    deadLetters.resolve(fixture)
+            write_matches(bulk, season, batch, trackData, errors, frontier, failed)
+
+        run_pipeline(fixtures, write, progress=frontier.progress)
+        bulk.flush()
+        trackData["mAdded"] += bulk.inserted[Matches.__tablename__]
+        trackData["mUpdated"] += bulk.updated[Matches.__tablename__]
+        trackData["psAdded"] += bulk.inserted[PlayerStats.__tablename__]
+        errors.update(bulk.errors)
+
+    for error, count in errors.items():
+        logger.error(f"    {error}   ->  {count}")
+    return trackData
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Retry the fixtures in dead_letters that are due.")
+    parser.add_argument("--limit", type=int, default=None, help="maximum number of fixtures to retry")
+    parser.add_argument("--list", action="store_true", help="only list the fixtures that are due")
+    args = parser.parse_args()
+
+    session = initSession()
+    if args.list:
+        for letter in DeadLetterQueue(session).due(limit=args.limit):
+            print(
+                f"{letter.next_retry}  {letter.stage:<5}  {letter.attempts}x  "
+                f"{letter.link}  {letter.error_class}: {letter.error}"
+            )
+        return
+
+    initLogger()
+    trackData = retry(session, args.limit)
+    session.close()
+    logger.info(f"Retried dead letters: {dict(trackData)}")
+    try:
+        write_report("retry", trackData)
+    except Exception as e:
+        logger.error(f"Could not write the metrics: {e}")
+
+
+if __name__ == "__main__":
+    main()
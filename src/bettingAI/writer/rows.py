@@ -0,0 +1,234 @@
+"""
+rows.py
+
+Declarative row builders for the match and player statistics parsed by scraper.py.
+
+The columns of matchstats and playerstats are described once, in MATCH_FIELDS and PLAYER_FIELDS,
+by where their value is found in the dictionaries of `parse_match_page`:
+
+    matchstats   statistics[group][label][index], with one index for the home and one for the
+                 away side. Two-valued stats are [home, away], the ones with a percentage are
+                 [home, home %, away, away %]. A label that is missing gives None.
+    playerstats  stats[label], or one part of a "made/attempted" string such as "23/30"
+
+At import the descriptions are compiled into the column tuples and lookups the builders run, so
+a match only costs its lookups, and each "made/attempted" string is split once per player. The
+builders return plain dictionaries of column values, ready for `BulkWriter.add_values` or a Core
+insert, without creating ORM objects or touching the identity map of a session. addRow.py builds
+its ORM rows from the same dictionaries.
+
+Example:
+    match, homeSide, awaySide = match_rows(3901289, "2022-2023", matchStats)
+    performances, errors = player_rows(3901289, playerStats)
+    bulk.add_values(PlayerStats.__table__, performances[0])
+"""
+
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+# column, group, label, index of the home value, index of the away value
+MATCH_FIELDS: List[Tuple[str, str, str, int, int]] = [
+    ("total_shots", "shots", "total shots", 0, 1),
+    ("shots_off_target", "shots", "off target", 0, 1),
+    ("shots_on_target", "shots", "on target", 0, 1),
+    ("blocked_shots", "shots", "blocked shot", 0, 1),
+    ("hit_woodwork", "shots", "hit woodwork", 0, 1),
+    ("shots_inside_box", "shots", "inside box", 0, 1),
+    ("shots_outside_box", "shots", "outside box", 0, 1),
+    ("xG_total", "xG", "expected goals", 0, 1),
+    ("xG_first_half", "xG", "first half", 0, 1),
+    ("xG_second_half", "xG", "second half", 0, 1),
+    ("xG_open_play", "xG", "open play", 0, 1),
+    ("xG_set_play", "xG", "set play", 0, 1),
+    ("xGOT", "xG", "on target", 0, 1),
+    ("accurate_passes", "passes", "accurate passes", 0, 2),
+    ("accuracy", "passes", "accurate passes", 1, 3),
+    ("own_half", "passes", "own half", 0, 1),
+    ("opposition_half", "passes", "opposition half", 0, 1),
+    ("accurate_long_balls", "passes", "accurate long balls", 0, 2),
+    ("accurate_crosses", "passes", "accurate crosses", 0, 2),
+    ("throws", "passes", "throws", 0, 1),
+    ("tackles_won", "defence", "tackles won", 0, 2),
+    ("accuracy_tackles", "defence", "tackles won", 1, 3),
+    ("interceptions", "defence", "interceptions", 0, 1),
+    ("blocks", "defence", "blocks", 0, 1),
+    ("clearances", "defence", "clearances", 0, 1),
+    ("keeper_saves", "defence", "keeper saves", 0, 1),
+    ("yellow_cards", "cards", "yellow cards", 0, 1),
+    ("red_cards", "cards", "red cards", 0, 1),
+    ("duels_won", "duels", "duels won", 0, 1),
+    ("ground_duels_won", "duels", "ground duels", 0, 2),
+    ("aerial_duels_won", "duels", "aerial duels", 0, 2),
+    ("successfull_dribbles", "duels", "successfull dribbles", 0, 2),
+]
+
+# How a player stat is read from its value
+VALUE = "value"  # as it is
+MADE = "made"  # the first number of "made/attempted"
+RATIO = "ratio"  # made / attempted, truncated to an integer
+
+# column, label, kind
+PLAYER_FIELDS: List[Tuple[str, str, str]] = [
+    ("rating", "fotmob rating", VALUE),
+    ("minutes_played", "minutes played", VALUE),
+    ("goals", "goals", VALUE),
+    ("assists", "assists", VALUE),
+    ("shots", "shots", VALUE),
+    ("passes", "passes", MADE),
+    ("passes_accuracy", "passes", RATIO),
+    ("chances_created", "chances created", VALUE),
+    ("touches", "touches", VALUE),
+    ("passes_into_final_third", "passes into final third", VALUE),
+    ("dispossesed", "dispossessed", VALUE),
+    ("tackles_won", "tackles won", MADE),
+    ("tackles_accuracy", "tackles won", RATIO),
+    ("recoveries", "recoveries", VALUE),
+    ("ground_duels_won", "ground duels won", MADE),
+    ("aerial_duels_won", "aerial duels won", MADE),
+    ("was_fouled", "was fouled", VALUE),
+    ("fouls_committed", "fouls committed", VALUE),
+]
+
+MatchBuilder = Callable[[Mapping], Tuple[Tuple[Any, ...], Tuple[Any, ...]]]
+PlayerBuilder = Callable[[Mapping], Tuple[Any, ...]]
+
+
+def compile_match_fields(fields: List[Tuple[str, str, str, int, int]]) -> Tuple[Tuple[str, ...], MatchBuilder]:
+    """Compiles match stat fields into their columns and a function building both sides.
+
+    Args:
+        fields (List[Tuple[str, str, str, int, int]]): The fields, as in MATCH_FIELDS.
+
+    Returns:
+        Tuple[Tuple[str, ...], MatchBuilder]: The columns, and a function that takes the
+        "statistics" of the parsed match stats and returns the home and away values in the
+        order of the columns.
+    """
+    columns = tuple(column for column, _, _, _, _ in fields)
+    lookups = tuple((group, label, home, away) for _, group, label, home, away in fields)
+
+    def build(statistics: Mapping) -> Tuple[Tuple[Any, ...], Tuple[Any, ...]]:
+        homeValues, awayValues = [], []
+        for group, label, home, away in lookups:
+            values = statistics[group].get(label)
+            homeValues.append(None if values is None else values[home])
+            awayValues.append(None if values is None else values[away])
+        return tuple(homeValues), tuple(awayValues)
+
+    return columns, build
+
+
+def compile_player_fields(fields: List[Tuple[str, str, str]]) -> Tuple[Tuple[str, ...], PlayerBuilder]:
+    """Compiles player stat fields into their columns and a function building a performance.
+
+    Args:
+        fields (List[Tuple[str, str, str]]): The fields, as in PLAYER_FIELDS.
+
+    Returns:
+        Tuple[Tuple[str, ...], PlayerBuilder]: The columns, and a function that takes the parsed
+        stats of one player and returns the values in the order of the columns.
+
+    Raises:
+        ValueError: If a field has an unknown kind.
+    """
+    columns = tuple(column for column, _, _ in fields)
+    fractions = tuple(sorted({label for _, label, kind in fields if kind != VALUE}))
+    lookups = []
+    for _, label, kind in fields:
+        if kind not in [VALUE, MADE, RATIO]:
+            raise ValueError(f"Unknown kind {kind!r} of player stat {label!r}")
+        lookups.append((label, kind))
+    lookups = tuple(lookups)
+
+    def build(stats: Mapping) -> Tuple[Any, ...]:
+        split = {label: stats[label].split("/") for label in fractions}  # once per string
+        values = []
+        for label, kind in lookups:
+            if kind == VALUE:
+                values.append(stats[label])
+            elif kind == MADE:
+                values.append(split[label][0])
+            else:
+                made, attempted = split[label][0], split[label][1]
+                values.append(int(float(made) / float(attempted)))
+        return tuple(values)
+
+    return columns, build
+
+
+MATCH_STATS_COLUMNS, _build_sides = compile_match_fields(MATCH_FIELDS)
+PLAYER_STATS_COLUMNS, _build_player = compile_player_fields(PLAYER_FIELDS)
+
+
+def match_rows(
+    id: int, season: str, matchStats: Mapping
+) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Builds the column values of a match and of its two sides in matchstats.
+
+    Args:
+        id (int): The fotmob ID of the match.
+        season (str): The season the match belongs to.
+        matchStats (Mapping): The match stats returned by `parse_match_page`.
+
+    Returns:
+        Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]: The values of
+        the matches row, and of the home and away matchstats rows, which are None if the page
+        had no statistics.
+    """
+    mainInfo = matchStats["maininfo"]
+    match = {
+        "id": id,
+        "home_team_id": mainInfo["homeID"],
+        "away_team_id": mainInfo["awayID"],
+        "league_id": matchStats["league"]["id"],
+        "season": season,
+        "date": matchStats["dtg"],
+        "home_goals": mainInfo["homescore"],
+        "away_goals": mainInfo["awayscore"],
+    }
+    if matchStats["statistics"] is None:
+        return match, None, None
+
+    homeValues, awayValues = _build_sides(matchStats["statistics"])
+    homeSide = {"match_id": id, "side": "home", **dict(zip(MATCH_STATS_COLUMNS, homeValues))}
+    awaySide = {"match_id": id, "side": "away", **dict(zip(MATCH_STATS_COLUMNS, awayValues))}
+    return match, homeSide, awaySide
+
+
+def player_row(matchID: int, stats: Mapping) -> Dict[str, Any]:
+    """Builds the column values of the playerstats row of one player in a match.
+
+    Args:
+        matchID (int): The fotmob ID of the match.
+        stats (Mapping): The parsed stats of the player, one value of `playerStats`.
+
+    Returns:
+        Dict[str, Any]: The values of the playerstats row.
+
+    Raises:
+        Exception: If a stat is missing or malformed, e.g. KeyError or ZeroDivisionError.
+    """
+    return {
+        "player_id": stats["id"],
+        "match_id": matchID,
+        **dict(zip(PLAYER_STATS_COLUMNS, _build_player(stats))),
+    }
+
+
+def player_rows(matchID: int, playerStats: Optional[Mapping]) -> Tuple[List[Dict[str, Any]], List[Exception]]:
+    """Builds the playerstats rows of every player in a match.
+
+    Args:
+        matchID (int): The fotmob ID of the match.
+        playerStats (Mapping, optional): The player stats returned by `parse_match_page`, by player.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], List[Exception]]: The values of the rows that could be built,
+        and the exceptions raised for the players whose stats could not be read.
+    """
+    rows, errors = [], []
+    for stats in (playerStats or {}).values():
+        try:
+            rows.append(player_row(matchID, stats))
+        except Exception as e:
+            errors.append(e)
+    return rows, errors
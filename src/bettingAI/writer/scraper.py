@@ -13,30 +13,59 @@ Author: Erik Nymo Bohne
 """
 
 import datetime
+import os
+from itertools import islice
 from time import strptime
 from typing import List, Optional, Dict, Union, Any, Tuple
 
-import requests
-from bs4 import BeautifulSoup
-from nltk.tokenize import word_tokenize
-
 # My own libraries
+from bettingAI.writer import structured
+from bettingAI.writer.cache import forget, load_page
+from bettingAI.writer.tokenizer import iter_tokens, tokenize
 from bettingAI.writer.values import *
 from bettingAI.writer.gather import *
+from bettingAI.writer.metrics import timed
+
+# How match and player pages are parsed: "tokens" runs the gather.py parsers over the tokenized
+# page, "json" decodes the __NEXT_DATA__ blob and runs the structured.py parsers over it.
+_config = {"extraction": os.environ.get("BETTINGAI_EXTRACTION", "tokens")}
+
+# Time from kickoff until a match page is final, with stoppage time, extra time and penalties.
+# Pages of played matches are cached for good, see cache.TTLS.
+MATCH_LENGTH = datetime.timedelta(hours=3)
+
+
+def configure_extraction(mode: str) -> None:
+    """Selects how match and player pages are parsed.
+
+    Args:
+        mode (str): "tokens" for the token parsers in gather.py, "json" for the
+            structured parsers in structured.py.
+
+    Raises:
+        ValueError: If the mode is not "tokens" or "json".
+    """
+    if mode not in ["tokens", "json"]:
+        raise ValueError(f"Invalid extraction mode '{mode}'. Valid options are 'tokens' and 'json'")
+    _config["extraction"] = mode
 
 
 def tokenize_page(
     url: str,
-    match: Optional[bool] = False
+    match: Optional[bool] = False,
+    limit: Optional[int] = None
     ) -> List[str]:
     """Tokenizes the content of a web page and returns the tokens.
 
-    The function requests the content of the specified URL and tokenizes the HTML document using the NLTK library.
+    The function requests the content of the specified URL and tokenizes the HTML document with tokenizer.py.
     The resulting tokens are returned as a list.
+    The page is requested through the pooled session in client.py, which reuses connections
+    and retries transient failures, and is served from the on-disk cache in cache.py when possible.
 
     Args:
         url (str): The URL of the web page to tokenize.
         match (bool, optional): Specifies whether to extract specified data for matches. Default is False.
+        limit (int, optional): Maximum number of tokens to return. Default is None, which returns all tokens.
 
     Returns:
         List[str]: A list of tokens extracted from the web page content.
@@ -46,20 +75,43 @@ def tokenize_page(
         It returns a subset of tokens starting from the "matchName" token.
         This behavior is useful when extracting specific information from match-related pages.
         If the `match` parameter is False or not provided, the function tokenizes the entire web page content.
+        With a `limit` the page is tokenized lazily and tokenizing stops once `limit` tokens past
+        the "matchName" token (or the start of the page) are found.
 
     Example:
         tokens = tokenize_page("https://www.fotmob.com/match/3901289", match=True)
         # Returns a list of tokens containing specified match-related data.
     """
     # Request page
-    page = requests.get(url)
+    content = load_page(url)
+
+    return tokenize_content(content, match, limit)
+
+
+def tokenize_content(
+    content: bytes,
+    match: Optional[bool] = False,
+    limit: Optional[int] = None
+    ) -> List[str]:
+    """Tokenizes an HTML document and returns the tokens.
 
-    # Read and format HTML doc from page
-    soup = BeautifulSoup(page.content, "html.parser")
-    text = soup.prettify()
+    This is the parsing half of `tokenize_page`, for pages that are already downloaded.
 
-    # Tokenize the text so it is iterable
-    tokenized = [token for token in word_tokenize(text) if token not in notIncluded]
+    Args:
+        content (bytes): The HTML document.
+        match (bool, optional): Specifies whether to extract specified data for matches. Default is False.
+        limit (int, optional): Maximum number of tokens to return. Default is None, which returns all tokens.
+
+    Returns:
+        List[str]: A list of tokens extracted from the document.
+    """
+    with timed("tokenize"):
+        if limit is not None:  # Stop tokenizing once the tokens are found
+            tokens = iter_tokens(content, anchor="matchName" if match else None)
+            return list(islice(tokens, limit))
+
+        # Tokenize the HTML doc so it is iterable
+        tokenized = tokenize(content)
 
     information = []
     if match:  # Get spesified data for matches
@@ -102,14 +154,8 @@ def get_team_links(
     """
     tokenized = tokenize_page(f"https://www.fotmob.com/leagues/{leagueID}/overview/")
 
-    # Find all the urls from the page
-    teamUrls = list()
-    for token in tokenized:
-        if token[:6] == "/teams":
-            teamUrls.append(token)
-
-    # Remove duplicate links
-    teamUrls = [*set(teamUrls)]
+    # Find all the distinct urls from the page
+    teamUrls = gather_team_links(tokenized)
 
     if nTeams is not None:
         if len(teamUrls) != nTeams:
@@ -149,16 +195,8 @@ def get_match_links(
         f"https://www.fotmob.com/leagues/{leagueID}/overview/league?season={season}"
     )
 
-    # Find all the urls from the page
-    matchUrls = list()
-    for token in tokenized:
-        if token[:6] == "/match":  # and teamUrlName in token
-            matchUrls.append(token)
-
-    # Remove duplicates links
-    matchUrls = [*set(matchUrls)]
-
-    return matchUrls
+    # Find all the distinct urls from the page
+    return gather_match_links(tokenized)
 
 
 def get_player_links(
@@ -186,18 +224,8 @@ def get_player_links(
     # Tokenize page
     tokenized = tokenize_page(f"https://www.fotmob.com/teams/{teamID}/squad/")
 
-    # Main page and specific page
-    main = "//www.fotmob.com"
-    player = "/players"
-
     # Find all the urls from the page
-    playerUrls = []
-    for token in tokenized:
-        if token[len(main) : len(main) + len(player)] == player:
-            if token[len(main) :] not in playerUrls:
-                playerUrls.append(token[len(main) :])
-
-    return playerUrls
+    return gather_player_links(tokenized)
 
 
 def get_match_info(
@@ -220,43 +248,117 @@ def get_match_info(
         with the match information and a dictionary with player performance stats.
 
     Note:
-        The function uses the `tokenize_page` function to tokenize the match page.
-        It calls various helper functions, such as `gather_dtg`, `gather_league`, `gather_main_info`,
-        `gather_match_statistics`, and `gather_player_performance`, to extract specific information
-        from the tokenized data.
+        The page is parsed by `parse_match_page`. Pages of matches that are not played yet
+        will change, so they are removed from the cache. This includes the pages read with
+        justMain, which are often requested shortly after kickoff while the score is still live.
+        Pages that fail to parse are removed as well, so a retry does not parse the same copy.
 
     Example:
         match_info = get_match_info("/match/12345")
         # Returns a tuple with the match information and player performance stats for the match with ID 12345.
     """
-    # Request page
-    tokenized = tokenize_page("https://www.fotmob.com" + url, match=True)
+    page = "https://www.fotmob.com" + url
+    content = load_page(page)
+    try:
+        result = parse_match_page(content, justMain)
+        if justMain:
+            played = is_played(parse_match_kickoff(content))
+        else:
+            played = result[0] is not False
+    except Exception:
+        forget(page)  # the cached copy may be broken, the retry downloads it again
+        raise
+    if not played:
+        forget(page)  # the page will change, do not keep it cached
+    return result
+
+
+def parse_match_page(
+    content: bytes,
+    justMain=False
+) -> Union[bool, Tuple[Dict[str, Any], Dict[Any, Any]]]:
+    """Parses a downloaded match page with the configured extraction mode.
+
+    Args:
+        content (bytes): The HTML document of the match page.
+        justMain (bool, optional): If True, only the initial match stats are returned. Defaults to False.
+
+    Returns:
+        Union[bool, Tuple[Dict[str, Any], Dict[Any, Any]]]: The same as `get_match_info`.
+        (False, False) is returned for matches that are not played yet.
+    """
+    with timed("parse"):
+        if _config["extraction"] == "json":
+            return parse_match_structured(content, justMain)
+        return parse_match_tokens(content, justMain)
+
+
+def is_played(kickoff: datetime.datetime) -> bool:
+    """Checks if a match is over, i.e. a full match length has passed since its kickoff.
+
+    Args:
+        kickoff (datetime.datetime): The kickoff time of the match in UTC.
+
+    Returns:
+        bool: True once MATCH_LENGTH has passed since the kickoff.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return now - kickoff >= MATCH_LENGTH
+
+
+def parse_match_kickoff(content: bytes) -> datetime.datetime:
+    """Parses only the kickoff time of a match page with the configured extraction mode.
+
+    Args:
+        content (bytes): The HTML document of the match page.
+
+    Returns:
+        datetime.datetime: The kickoff time of the match in UTC.
+    """
+    with timed("parse"):
+        if _config["extraction"] == "json":
+            return structured.gather_kickoff(structured.extract_next_data(content))
+        return gather_kickoff(tokenize_content(content, match=True, limit=50))
+
+
+def parse_match_tokens(
+    content: bytes,
+    justMain=False
+) -> Union[bool, Tuple[Dict[str, Any], Dict[Any, Any]]]:
+    """Parses a match page by tokenizing the whole document.
+
+    Note:
+        It calls various helper functions, such as `gather_dtg`, `gather_league`, `gather_main_info`,
+        `gather_match_statistics`, and `gather_player_performance`, to extract specific information
+        from the tokenized data.
+    """
+    # The initial match stats are in the first 150 tokens
+    tokenized = tokenize_content(content, match=True, limit=150 if justMain else None)
+    index = TokenIndex(tokenized)  # shared by the parsers below
 
     if not justMain:
         # Get time and date of match
         dtg = gather_dtg(tokenized[:50])
 
-        # Check if match is in the past
-        today = datetime.date.today()  # current day
-        difference = today - dtg.date()  # find time delta
-        if difference.days < 1:  # if game is not played yet
+        # Check if match is over
+        if not is_played(gather_kickoff(tokenized[:50])):
             return False, False
 
         # Get competition name and id
-        league = gather_league(tokenized[10:100])
+        league = gather_league(tokenized[10:100], index.window(10, 100))
 
     # Block to get init stats from match
-    mainInfo = gather_main_info(tokenized[:150])
+    mainInfo = gather_main_info(tokenized[:150], index.window(0, 150))
     
     if justMain:
         return mainInfo
 
     # Block to get all stats from match
-    statistics = gather_match_statistics(tokenized[:6000])
+    statistics = gather_match_statistics(tokenized[:6000], index.window(0, 6000))
 
     # Get player stats from match
     if statistics is not None:
-        playerPerformance = gather_player_performance(tokenized[2000:])
+        playerPerformance = gather_player_performance(tokenized[2000:], index.window(2000))
     else:
         playerPerformance = None
 
@@ -266,6 +368,42 @@ def get_match_info(
         "maininfo": mainInfo,
         "statistics": statistics,
     }, playerPerformance
+
+
+def parse_match_structured(
+    content: bytes,
+    justMain=False
+) -> Union[bool, Tuple[Dict[str, Any], Dict[Any, Any]]]:
+    """Parses a match page from the JSON data embedded in it.
+
+    Note:
+        Uses the structured parsers in structured.py, which return the same structures as gather.py.
+    """
+    data = structured.extract_next_data(content)
+
+    mainInfo = structured.gather_main_info(data)
+    if justMain:
+        return mainInfo
+
+    # Get time and date of match and check if it is over
+    dtg = structured.gather_dtg(data)
+    if not is_played(structured.gather_kickoff(data)):
+        return False, False
+
+    statistics = structured.gather_match_statistics(data)
+    if statistics is not None:
+        playerPerformance = structured.gather_player_performance(data)
+    else:
+        playerPerformance = None
+
+    return {
+        "dtg": dtg,
+        "league": structured.gather_league(data),
+        "maininfo": mainInfo,
+        "statistics": statistics,
+    }, playerPerformance
+
+
     
 def get_next_match_info(
     url: str,
@@ -300,11 +438,24 @@ def get_next_match_info(
         # Returns a dictionary with the necessary information for the upcoming match with ID 67890,
         # or False if the match is not within a week ahead or the necessary information is not available.
     """
-    # Request page
-    tokenized = tokenize_page("https://www.fotmob.com" + url, match=True)
+    if _config["extraction"] == "json":
+        data = structured.extract_next_data(load_page("https://www.fotmob.com" + url))
+        dtg = structured.gather_dtg(data)
+        kickoff = structured.gather_kickoff(data)
+        info = structured.gather_next_match_info(data)
+        league = structured.gather_league(data)
+    else:
+        # Request page
+        tokenized = tokenize_page("https://www.fotmob.com" + url, match=True, limit=200)
+
+        # Get time and date of match
+        dtg = gather_dtg(tokenized[:50])
+        kickoff = gather_kickoff(tokenized[:50])
 
-    # Get time and date of match
-    dtg = gather_dtg(tokenized[:50])
+        info = gather_next_match_info(tokenized[:200])
+
+        # Get competition name and id
+        league = gather_league(tokenized[10:100])
 
     # Check if match is in the past
     today = datetime.date.today()  # current day
@@ -312,11 +463,8 @@ def get_next_match_info(
     if not -7 <= difference.days < 0:  # makes sure the game is within a week ahead of time
         #return False
         pass
-
-    info = gather_next_match_info(tokenized[:200])
-    
-    # Get competition name and id
-    league = gather_league(tokenized[10:100])
+    if not is_played(kickoff):  # the page will change until the game is played
+        forget("https://www.fotmob.com" + url)
     
     if info is not None:
         return {
@@ -368,6 +516,10 @@ def get_player_bio(
         # Returns a dictionary with the player's bio information and season statistics
         # for the player with ID 12345 on FotMob.
     """
+    if _config["extraction"] == "json":
+        data = structured.extract_next_data(load_page("https://www.fotmob.com" + url))
+        return structured.gather_player_bio(data)
+
     # Request page
     tokenized = tokenize_page("https://www.fotmob.com" + url)
 
@@ -0,0 +1,324 @@
+"""
+structured.py
+
+Structured extraction of fotmob pages.
+
+fotmob is a Next.js site and every page embeds the data it is rendered from as a JSON blob in
+<script id="__NEXT_DATA__" type="application/json">. Instead of parsing and tokenizing the whole
+HTML document, the functions in this module find that blob, decode it once and read the fields
+straight out of it.
+
+The gather_* functions mirror the ones in gather.py and return dictionaries of the same shape,
+with values as strings where the token parsers return strings, so addRow.py works unchanged with
+either extraction mode.
+"""
+
+import datetime as dt
+import json
+import re
+from typing import Any, Dict, List, Optional, TypedDict, Union
+
+from bettingAI.writer.gather import (
+    CARDS_KEYS,
+    DEFENCE_KEYS,
+    DUELS_KEYS,
+    PASSES_KEYS,
+    SHOTS_KEYS,
+    XG_KEYS,
+)
+
+NEXT_DATA = re.compile(
+    rb'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL
+)
+
+
+class Team(TypedDict, total=False):
+    id: int
+    name: str
+    score: int
+
+
+class General(TypedDict, total=False):
+    matchId: str
+    matchTimeUTCDate: str
+    leagueId: int
+    parentLeagueId: int
+    homeTeam: Team
+    awayTeam: Team
+    started: bool
+    finished: bool
+
+
+class Header(TypedDict, total=False):
+    teams: List[Team]
+    status: Dict[str, Any]
+
+
+class MatchPage(TypedDict, total=False):
+    """The pageProps of a match page."""
+
+    general: General
+    header: Header
+    content: Dict[str, Any]
+
+
+class PlayerPage(TypedDict, total=False):
+    """The player data of a player page."""
+
+    id: int
+    name: str
+    playerInformation: List[Dict[str, Any]]
+    origin: Dict[str, Any]
+    mainLeague: Dict[str, Any]
+
+
+def extract_next_data(content: bytes) -> Dict[str, Any]:
+    """Finds and decodes the __NEXT_DATA__ blob of a fotmob page.
+
+    Args:
+        content (bytes): The HTML document of the page.
+
+    Returns:
+        Dict[str, Any]: The pageProps of the page.
+
+    Raises:
+        ValueError: If the page does not embed a __NEXT_DATA__ blob.
+    """
+    found = NEXT_DATA.search(content)
+    if found is None:
+        raise ValueError("Page does not contain __NEXT_DATA__")
+    return json.loads(found.group(1))["props"]["pageProps"]
+
+
+def gather_dtg(data: MatchPage) -> dt.datetime:
+    """Extracts and returns the kickoff time of the match.
+
+    Args:
+        data (MatchPage): The decoded match page.
+
+    Returns:
+        datetime.datetime: The date and time of the match, in the time zone given on the page,
+        like gather.gather_dtg reads it from the same field.
+    """
+    kickoff = data["general"].get("matchTimeUTC")  # e.g. "Sat, Aug 12, 2023, 11:30 UTC"
+    if kickoff:
+        return dt.datetime.strptime(kickoff.rsplit(" ", 1)[0], "%a, %b %d, %Y, %H:%M")
+    utc = data["general"].get("matchTimeUTCDate") or data["header"]["status"]["utcTime"]
+    return dt.datetime.strptime(utc[:16], "%Y-%m-%dT%H:%M")
+
+
+def gather_kickoff(data: MatchPage) -> dt.datetime:
+    """Extracts and returns the kickoff time of the match in UTC.
+
+    Args:
+        data (MatchPage): The decoded match page.
+
+    Returns:
+        datetime.datetime: The date and time of the match in UTC.
+    """
+    utc = data["general"].get("matchTimeUTCDate") or data["header"]["status"]["utcTime"]
+    return dt.datetime.strptime(utc[:16], "%Y-%m-%dT%H:%M")
+
+
+def gather_league(data: MatchPage) -> Dict[str, Any]:
+    """Extracts and returns the parent league ID of the match.
+
+    Args:
+        data (MatchPage): The decoded match page.
+
+    Returns:
+        dict: A dictionary containing the league ID, or None for the ID if it is not available.
+    """
+    id = data["general"].get("parentLeagueId")
+    return {"id": str(id) if id is not None else None}
+
+
+def gather_main_info(data: MatchPage) -> Dict[str, Union[str, int]]:
+    """Extracts and returns the initial match stats.
+
+    Args:
+        data (MatchPage): The decoded match page.
+
+    Returns:
+        dict: The same keys as gather.gather_main_info, i.e. 'hometeam', 'awayteam', 'homeID',
+        'awayID', 'homescore', 'awayscore', 'homegd' and 'awaygd'.
+    """
+    home, away = data["header"]["teams"][:2]
+    return {
+        "hometeam": home["name"],
+        "awayteam": away["name"],
+        "homeID": str(home["id"]),
+        "awayID": str(away["id"]),
+        "homescore": str(home["score"]),
+        "awayscore": str(away["score"]),
+        "homegd": int(home["score"]) - int(away["score"]),
+        "awaygd": int(away["score"]) - int(home["score"]),
+    }
+
+
+# Titles of the groups of match stats on fotmob, and the keys gather.gather_match_statistics
+# gives their stats in the order they are listed. The token parser reads the rendered groups
+# the same way, by position after the title.
+STAT_GROUPS = {
+    "shots": ("Shots", SHOTS_KEYS),
+    "xG": ("Expected goals (xG)", XG_KEYS),
+    "passes": ("Passes", PASSES_KEYS),
+    "defence": ("Defence", DEFENCE_KEYS),
+    "duels": ("Duels", DUELS_KEYS),
+    "cards": ("Discipline", CARDS_KEYS),
+}
+
+VALUE = re.compile(r"([\d.]+)(?:\s*\((\d+)%\))?")
+
+
+def _split_value(value: Any) -> List[str]:
+    """Splits a stat value such as "386 (85%)" into ["386", "85"], and 12 into ["12"]."""
+    found = VALUE.match(str(value))
+    if found is None:
+        return [str(value)]
+    return [group for group in found.groups() if group is not None]
+
+
+def gather_match_statistics(data: MatchPage) -> Optional[Dict[str, Any]]:
+    """Extracts and returns the match statistics.
+
+    Each value is a list of strings in the same layout as the token parser produces:
+    [home, away] for plain numbers and [home, home %, away, away %] for stats with a percentage.
+
+    Args:
+        data (MatchPage): The decoded match page.
+
+    Returns:
+        Optional[Dict[str, Any]]: The same structure as gather.gather_match_statistics,
+        or None if the page has no statistics.
+    """
+    try:
+        categories = data["content"]["stats"]["Periods"]["All"]["stats"]
+    except (KeyError, TypeError):
+        return None
+
+    groups = {category.get("title"): category.get("stats") or [] for category in categories}
+    statistics = {}
+    for name, (title, keys) in STAT_GROUPS.items():
+        stats = [
+            stat for stat in groups.get(title, [])
+            if stat.get("type") != "title" and stat.get("stats") and None not in stat["stats"][:2]
+        ]
+        if name == "xG" and not any("penalty" in str(stat.get("title", "")).lower() for stat in stats):
+            keys = [key for key in keys if key != "penalty"]  # only listed if there was a penalty
+        statistics[name] = {}
+        for key, stat in zip(keys, stats):
+            home, away = stat["stats"][:2]
+            statistics[name][key] = _split_value(home) + _split_value(away)
+    return statistics
+
+
+# Titles of the player stats on fotmob for each of the keys used by gather.gather_player_performance
+PLAYER_STATS = {
+    "fotmob rating": "FotMob rating",
+    "minutes played": "Minutes played",
+    "goals": "Goals",
+    "assists": "Assists",
+    "shots": "Total shots",
+    "passes": "Accurate passes",
+    "chances created": "Chances created",
+    "touches": "Touches",
+    "passes into final third": "Passes into final third",
+    "dispossessed": "Dispossessed",
+    "tackles won": "Tackles won",
+    "recoveries": "Recoveries",
+    "ground duels won": "Ground duels won",
+    "aerial duels won": "Aerial duels won",
+    "was fouled": "Was fouled",
+    "fouls committed": "Fouls committed",
+}
+
+
+def _player_stat(stat: Any) -> Optional[str]:
+    """Formats a player stat like the token parser does, e.g. "23/27" for accurate passes."""
+    if isinstance(stat, dict):
+        stat = stat.get("stat", stat)
+        value, total = stat.get("value"), stat.get("total")
+        if value is None:
+            return None
+        return f"{value}/{total}" if total is not None else str(value)
+    if stat is None:
+        return None
+    return str(stat).split(" ")[0]
+
+
+def gather_player_performance(data: MatchPage) -> Dict[str, Any]:
+    """Extracts and returns the performance statistics for each player in the lineups.
+
+    Args:
+        data (MatchPage): The decoded match page.
+
+    Returns:
+        Dict[str, Any]: The same structure as gather.gather_player_performance,
+        a dictionary of stats per player name including the player "id".
+    """
+    playerPerformance = {}
+    lineups = (data.get("content") or {}).get("lineup") or {}
+    for team in lineups.get("lineup", []):
+        players = [player for row in team.get("players", []) for player in row]
+        for player in players + team.get("bench", []):
+            stats = {}
+            for group in player.get("stats") or []:
+                stats.update(group.get("stats", {}))
+            if not stats:  # did not play
+                continue
+            name = player["name"]["fullName"] if isinstance(player["name"], dict) else player["name"]
+            performance = {key: _player_stat(stats.get(title)) for key, title in PLAYER_STATS.items()}
+            performance["id"] = str(player["id"])
+            playerPerformance[name] = performance
+    return playerPerformance
+
+
+def gather_player_bio(data: PlayerPage) -> Dict[str, Union[Dict[str, Any], List]]:
+    """Extracts and returns the player's bio and season statistics.
+
+    Args:
+        data (PlayerPage): The decoded player page.
+
+    Returns:
+        Dict[str, Union[Dict[str, Any], List]]: The same structure as gather.gather_player_bio.
+    """
+    data = data.get("data", data)
+
+    bio = {}
+    try:
+        bio["position"] = data["origin"]["positionDesc"]["primaryPosition"]["label"]
+    except (KeyError, TypeError):
+        pass
+    titles = {"Height": "Height", "Age": "Age", "Country": "Country", "Shirt": "Shirt", "Market value": "Market"}
+    for info in data.get("playerInformation", []):
+        if info.get("title") in titles:
+            value = info.get("value", {})
+            if info["title"] == "Market value":
+                bio["Market"] = value.get("fallback")
+            elif value.get("numberValue") is not None:
+                bio[titles[info["title"]]] = str(value["numberValue"])
+            else:
+                bio[titles[info["title"]]] = value.get("fallback")
+
+    season = {}
+    titles = {"Matches": "Matches", "Goals": "Goals", "Assists": "Assists", "Rating": "FotMob"}
+    for stat in (data.get("mainLeague") or {}).get("stats", []):
+        if stat.get("title") in titles:
+            season[titles[stat["title"]]] = stat.get("value", 0)
+    return {"bio": bio, "season": season}
+
+
+def gather_next_match_info(data: MatchPage) -> Optional[List[str]]:
+    """Extracts and returns the team IDs for an upcoming match.
+
+    Args:
+        data (MatchPage): The decoded match page.
+
+    Returns:
+        Optional[List[str]]: The IDs of the home and away team, or None if they are not available.
+    """
+    try:
+        return [str(data["general"]["homeTeam"]["id"]), str(data["general"]["awayTeam"]["id"])]
+    except (KeyError, TypeError):
+        return None
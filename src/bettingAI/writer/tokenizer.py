@@ -0,0 +1,714 @@
+"""
+tokenizer.py
+
+Fast tokenizer for fotmob pages.
+
+The token parsers in gather.py were written against the tokens of
+BeautifulSoup(content, "html.parser").prettify() run through nltk.word_tokenize, with the
+tokens in notIncluded removed. This module produces the same token list without building a
+parse tree and without NLTK:
+
+1. render() feeds the page to the standard library HTMLParser, which is the parser BeautifulSoup
+   uses for "html.parser", and writes out the pieces prettify() would print, one per line and
+   indented by their depth. Open tags are tracked on a stack the way BeautifulSoup does, so
+   unclosed and stray tags end up where they would in the tree.
+2. word_tokenize() finds the sentence breaks the punkt sentence tokenizer would make and applies
+   the rules of NLTKWordTokenizer once to the whole text instead of once per sentence. The rules
+   only look at neighbouring characters, so all a sentence changes is that its last period is
+   split off, that it ends a token even when no whitespace follows, and that a quote starting it
+   is written as ``.
+
+Punkt decides whether a period ends a sentence with parameters trained on English text, which are
+not shipped with NLTK's code. nltk_data/ next to this module holds the parameters of NLTK's
+English punkt model (tokenizers/punkt/PY3/english.pickle) in the punkt_tab format NLTK reads, and
+sentence_breaks() runs the second pass of punkt with them: collocations, abbreviations and
+ellipses decided with the orthographic context, and initials and numbers before a capitalised or
+lowercase word.
+
+tests/test_tokenizer.py checks the tokens, stop tokens included, against nltk.word_tokenize with
+the same parameters on the pages of tests/corpus and on texts around the breaks and quotes.
+`python -m bettingAI.writer.benchmark --check` does the same on the pages in the page cache.
+
+iter_tokens() gives the same tokens lazily. The page is parsed a block at a time and the lines are
+tokenized in chunks that end at a tag, so callers that only need the first tokens after an anchor
+such as "matchName" stop parsing the page there.
+"""
+
+import codecs
+import os
+import re
+from html.entities import html5
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from bettingAI.writer.values import notIncluded
+
+STOP_TOKENS = frozenset(notIncluded)
+
+# Tags that are never given content (BeautifulSoup prints them as <br/>)
+VOID_ELEMENTS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem",
+    "meta", "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame",
+    "image", "isindex", "nextid", "spacer",
+])
+# Tags whose content is printed as is
+PRESERVE_WHITESPACE = frozenset(["pre", "textarea"])
+# Tags whose text is not escaped
+RAW_TEXT = frozenset(["script", "style"])
+# Attributes holding a whitespace separated list of values
+LIST_ATTRIBUTES = {
+    "*": frozenset(["class", "accesskey", "dropzone"]),
+    "a": frozenset(["rel", "rev"]),
+    "link": frozenset(["rel", "rev"]),
+    "td": frozenset(["headers"]),
+    "th": frozenset(["headers"]),
+    "form": frozenset(["accept-charset"]),
+    "object": frozenset(["archive"]),
+    "area": frozenset(["rel"]),
+    "icon": frozenset(["sizes"]),
+    "iframe": frozenset(["sandbox"]),
+    "output": frozenset(["for"]),
+}
+ASCII_SPACES = " \n\t\x0c\r"
+ENCODING = "utf-8"  # encoding prettify() writes into <meta> tags
+
+ENTITIES: Dict[str, str] = {}
+for _name, _character in sorted(html5.items()):
+    ENTITIES.setdefault(_name.rstrip(";"), _character)
+
+# Character references in 0x80-0x9F are taken to be Windows-1252
+WINDOWS_1252: Dict[int, str] = {}
+for _code in range(0x80, 0xA0):
+    try:
+        WINDOWS_1252[_code] = bytes([_code]).decode("cp1252")
+    except UnicodeDecodeError:
+        pass
+
+ESCAPE = re.compile("[&<>]")
+ESCAPES = {"&": "&amp;", "<": "&lt;", ">": "&gt;"}
+NON_WHITESPACE = re.compile(r"\S+")
+META_CHARSET = re.compile(r"((^|;)\s*charset=)([^;]*)", re.M)
+XML_ENCODING = re.compile(rb"^\s*<\?.*encoding=['\"](.*?)['\"].*\?>", re.I)
+HTML_CHARSET = re.compile(rb"<\s*meta[^>]+charset\s*=\s*[\"']?([^>]*?)[ /;'\">]", re.I)
+
+
+def _escape(text: str) -> str:
+    return ESCAPE.sub(lambda found: ESCAPES[found.group()], text) if ESCAPE.search(text) else text
+
+
+def _quote(value: str) -> str:
+    """Quotes an attribute value like prettify() does."""
+    value = _escape(value)
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', "&quot;") + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+
+def _character_reference(name: str) -> str:
+    """Resolves a numeric character reference such as "#39" (without "&#")."""
+    base, digits = 10, "0123456789"
+    if name[:1] in "xX":
+        name, base, digits = name[1:], 16, "0123456789abcdefABCDEF"
+    end = 0
+    while end < len(name) and name[end] in digits:
+        end += 1
+    if end == 0:
+        return name
+    number, rest = int(name[:end], base), name[end:]
+    if number == 0 or number > 0x10FFFF or 0xD800 <= number <= 0xDFFF:
+        return "�" + rest
+    return WINDOWS_1252.get(number, chr(number)) + rest
+
+
+class _Renderer(HTMLParser):
+    """Writes out the pieces of a page in the order and form prettify() prints them."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        self.pieces: List[str] = []
+        self.stack: List[str] = []  # names of the open tags
+        self.data: List[str] = []  # text since the last tag
+        self.literal: Optional[List[str]] = None  # pieces inside <pre> and <textarea>
+        self.literalDepth = 0
+        self.closedVoid: List[str] = []  # void tags that may still get an end tag
+
+    def emit(self, piece: str, string: bool = False) -> None:
+        if self.literal is not None:
+            self.literal.append(piece)
+            return
+        if string:
+            piece = piece.strip()
+        if piece:
+            self.pieces.append(" " * len(self.stack) + piece)  # indented by the open tags
+
+    def end_data(self, prefix: str = "", suffix: str = "") -> None:
+        if not self.data:
+            return
+        text = "".join(self.data)
+        self.data = []
+        if self.literal is None and all(character in ASCII_SPACES for character in text):
+            text = "\n" if "\n" in text else " "
+        if prefix:  # comments and declarations are not escaped
+            self.emit(prefix + text + suffix, string=True)
+        elif self.stack and self.stack[-1] in RAW_TEXT:
+            self.emit(text, string=True)
+        else:
+            self.emit(_escape(text), string=True)
+
+    def format_start(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> str:
+        values: Dict[str, str] = {}
+        for key, value in attrs:
+            values[key] = "" if value is None else value
+        if not values:
+            return "<" + tag + ("/>" if tag in VOID_ELEMENTS else ">")
+
+        lists = LIST_ATTRIBUTES["*"] | LIST_ATTRIBUTES.get(tag, frozenset())
+        for key in lists.intersection(values):
+            values[key] = " ".join(NON_WHITESPACE.findall(values[key]))
+        if tag == "meta":
+            if "charset" in values:
+                values["charset"] = ENCODING
+            elif "content" in values and values.get("http-equiv", "").lower() == "content-type":
+                values["content"] = META_CHARSET.sub(lambda found: found.group(1) + ENCODING, values["content"])
+
+        attributes = " ".join(key + "=" + _quote(value) for key, value in sorted(values.items()))
+        return "<" + tag + " " + attributes + ("/>" if tag in VOID_ELEMENTS else ">")
+
+    def handle_starttag(self, tag, attrs, emptyElement=True):
+        self.end_data()
+        self.emit(self.format_start(tag, attrs))
+        if tag in VOID_ELEMENTS:
+            if emptyElement:
+                self.closedVoid.append(tag)
+            return
+        self.stack.append(tag)
+        if tag in PRESERVE_WHITESPACE and self.literal is None:
+            self.literal = []
+            self.literalDepth = len(self.stack)
+            self.literal.append(self.pieces.pop())
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, emptyElement=False)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag, checkClosed=False)
+
+    def handle_endtag(self, tag, checkClosed=True):
+        if checkClosed and tag in self.closedVoid:
+            self.closedVoid.remove(tag)
+            return
+        self.end_data()
+        if tag in self.stack:
+            while self.stack:
+                name = self.pop()
+                if name == tag:
+                    break
+
+    def pop(self) -> str:
+        name = self.stack.pop()
+        self.emit("</" + name + ">")
+        if self.literal is not None and len(self.stack) < self.literalDepth:
+            literal, self.literal = self.literal, None
+            self.pieces.append("".join(literal))
+        return name
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_entityref(self, name):
+        self.data.append(ENTITIES.get(name, "&" + name))
+
+    def handle_charref(self, name):
+        self.data.append(_character_reference(name))
+
+    def handle_comment(self, data):
+        self.end_data()
+        self.data.append(data)
+        self.end_data("<!--", "-->")
+
+    def handle_decl(self, decl):
+        self.end_data()
+        self.data.append(decl[len("DOCTYPE "):])
+        self.end_data("<!DOCTYPE ", ">\n")
+
+    def unknown_decl(self, data):
+        self.end_data()
+        if data.upper().startswith("CDATA["):
+            self.data.append(data[len("CDATA["):])
+            self.end_data("<![CDATA[", "]]>")
+        else:
+            self.data.append(data)
+            self.end_data("<?", "?>")
+
+    def handle_pi(self, data):
+        self.end_data()
+        self.data.append(data)
+        self.end_data("<?", ">")
+
+    def finish(self) -> List[str]:
+        self.close()
+        self.end_data()
+        while self.stack:
+            self.pop()
+        return self.pieces
+
+
+def decode(content: Union[bytes, str]) -> str:
+    """Decodes a page the way BeautifulSoup does.
+
+    The encoding declared in the page is tried first, then UTF-8 and finally Windows-1252.
+    BeautifulSoup asks chardet before UTF-8 when it is installed, which only matters for pages
+    without a declared encoding; fotmob declares UTF-8.
+    """
+    if isinstance(content, str):
+        return content
+    if content.startswith(codecs.BOM_UTF8):
+        content = content[len(codecs.BOM_UTF8):]
+    encodings = []
+    declared = XML_ENCODING.search(content, 0, 1024) or HTML_CHARSET.search(
+        content, 0, max(2048, int(len(content) * 0.05))
+    )
+    if declared is not None and declared.group(1):
+        encodings.append(declared.group(1).decode("ascii", "replace").lower())
+    for encoding in encodings + ["utf-8", "windows-1252"]:
+        try:
+            return content.decode(encoding)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return content.decode("windows-1252", errors="replace")
+
+
+def render(content: Union[bytes, str]) -> str:
+    """Returns the text BeautifulSoup(content, "html.parser").prettify() prints.
+
+    Args:
+        content (Union[bytes, str]): The HTML document.
+
+    Returns:
+        str: The tags, text and comments of the page, one per line and indented by their depth.
+    """
+    renderer = _Renderer()
+    renderer.feed(decode(content))
+    return "".join(piece + "\n" for piece in renderer.finish())
+
+
+# Sentence breaks, following nltk.tokenize.punkt
+NON_WORD = "[)\";}\\]*:@'({\\[‘’“”\xab\xbb?!]"
+MULTI_CHAR = r"(?:\-{2,}|\.{2,}|(?:\.\s){2,}\.)"
+PUNKT_WORD = re.compile(
+    rf"""(
+        {MULTI_CHAR}
+        |
+        (?=[^\(\"\`{{\[:;&\#\*@\)}}\]\-,])\S+?
+        (?=\s|$|{NON_WORD}|{MULTI_CHAR}|,(?=$|\s|{NON_WORD}|{MULTI_CHAR}))
+        |
+        \S
+    )""",
+    re.UNICODE | re.VERBOSE,
+)
+PERIOD_CONTEXT = re.compile(
+    rf"[.?!](?=(?P<after_tok>{NON_WORD}|\s+(?P<next_tok>\S+)))", re.UNICODE
+)
+REALIGN = re.compile(r"[\"')\]}‘’“”«»]+?(?:\s+|(?=--)|$)", re.MULTILINE)
+CLOSED_PERIOD = re.compile(r"\.[\]\)}>\"'»”’ ]*")
+ELLIPSIS = re.compile(r"\.\.+$")
+NUMERIC = re.compile(r"^-?[\.,]?\d[\d,\.-]*\.?$")
+INITIAL = re.compile(r"[^\W\d]\.$", re.UNICODE)
+WHITESPACE = " \t\n\r\x0b\x0c"
+
+# The parameters of NLTK's English punkt model, in the punkt_tab format of nltk_data
+NLTK_DATA = os.path.join(os.path.dirname(__file__), "nltk_data")
+PUNKT_ENGLISH = os.path.join(NLTK_DATA, "tokenizers", "punkt_tab", "english")
+
+# Orthographic context flags of punkt: a word was seen starting upper or lower case at the
+# beginning of a sentence, in the middle of one, or where it was not known which
+ORTHO_BEG_UC, ORTHO_MID_UC, ORTHO_UNK_UC = 1 << 1, 1 << 2, 1 << 3
+ORTHO_BEG_LC, ORTHO_MID_LC, ORTHO_UNK_LC = 1 << 4, 1 << 5, 1 << 6
+ORTHO_UC = ORTHO_BEG_UC | ORTHO_MID_UC | ORTHO_UNK_UC
+ORTHO_LC = ORTHO_BEG_LC | ORTHO_MID_LC | ORTHO_UNK_LC
+
+SENTENCE_ENDS = (".", "?", "!")
+PUNCTUATION = (";", ":", ",", ".", "!", "?")  # sentences do not start with them
+
+
+def _lines(name: str) -> List[str]:
+    with open(os.path.join(PUNKT_ENGLISH, name), encoding="utf-8") as f:
+        return [line[:-1] if line.endswith("\n") else line for line in f]
+
+
+# A period after an abbreviation does not end a sentence, unless the next word says otherwise
+ABBREVIATIONS = frozenset(_lines("abbrev_types.txt"))
+# Pairs of words around a period that does not end a sentence, e.g. ("##number##", "abreast")
+COLLOCATIONS = frozenset(tuple(line.split("\t")) for line in _lines("collocations.tab"))
+# Words that often start a sentence
+SENTENCE_STARTERS = frozenset(_lines("sent_starters.txt"))
+# The ORTHO_ flags of every word seen in the training text
+ORTHO_CONTEXT: Dict[str, int] = {
+    word: int(flags) for word, flags in (line.split("\t") for line in _lines("ortho_context.tab"))
+}
+
+
+def _type(word: str) -> str:
+    """The case and number normalised type of a word, e.g. "##number##" for "3.5"."""
+    return NUMERIC.sub("##number##", word.lower())
+
+
+def _without_period(type: str) -> str:
+    return type[:-1] if len(type) > 1 and type[-1] == "." else type
+
+
+def _first_pass(word: str) -> Tuple[bool, bool]:
+    """Classifies a word by its type alone: does it end a sentence, and is it an abbreviation
+    or an ellipsis."""
+    if word in SENTENCE_ENDS:
+        return True, False
+    if ELLIPSIS.match(word):
+        return False, True
+    if word.endswith(".") and not word.endswith(".."):
+        stem = word[:-1].lower()
+        if stem in ABBREVIATIONS or stem.split("-")[-1] in ABBREVIATIONS:
+            return False, True
+        return True, False
+    return False, False
+
+
+def _starts_sentence(word: str, type: str) -> Optional[bool]:
+    """The orthographic heuristic of punkt: does a word start a sentence, None if unknown."""
+    if word in PUNCTUATION:
+        return False
+    flags = ORTHO_CONTEXT.get(type, 0)
+    if word[0].isupper() and flags & ORTHO_LC and not flags & ORTHO_MID_UC:
+        return True
+    if word[0].islower() and (flags & ORTHO_UC or not flags & ORTHO_BEG_LC):
+        return False
+    return None
+
+
+def _ends_sentence(word: str, following: Optional[str]) -> bool:
+    """Decides if a punkt word token ends a sentence, given the token after it."""
+    sentbreak, abbreviation = _first_pass(word)
+    if following is None or not word.endswith("."):
+        return sentbreak
+
+    # The second pass of punkt reclassifies the word by the one that follows
+    type = _without_period(_type(word))
+    nextType = _type(following)
+    if _first_pass(following)[0]:
+        nextType = _without_period(nextType)
+    if (type, nextType) in COLLOCATIONS:
+        return False
+    initial = INITIAL.match(word) is not None
+    if abbreviation and not initial:
+        if _starts_sentence(following, nextType) is True:
+            return True
+        if following[0].isupper() and nextType in SENTENCE_STARTERS:
+            return True
+    if initial or type == "##number##":
+        starts = _starts_sentence(following, nextType)
+        if starts is False:
+            return False
+        if starts is None and initial and following[0].isupper() and not ORTHO_CONTEXT.get(nextType, 0) & ORTHO_LC:
+            return False
+    return sentbreak
+
+
+def _contains_break(context: str) -> bool:
+    words = [word for line in context.split("\n") for word in PUNKT_WORD.findall(line)]
+    for i in range(len(words) - 1):
+        if _ends_sentence(words[i], words[i + 1]):
+            return True
+    return False
+
+
+def sentence_breaks(text: str, continued: bool = False) -> Tuple[List[int], List[int], List[int]]:
+    """Finds the places where punkt would end a sentence.
+
+    Args:
+        text (str): The text.
+        continued (bool, optional): Whether the text is cut out of a longer one at whitespace.
+            Punkt does not see whitespace at the start of a text. Defaults to False.
+
+    Returns:
+        Tuple[List[int], List[int], List[int]]: The positions of the periods that are split off
+        the end of a sentence, the positions of the breaks that are not followed by whitespace,
+        and the positions where the sentences start.
+    """
+    periods, boundaries = [], []
+    lastBreak = 0
+    starts = [0]
+    candidates = []
+    previousStart, previousStop = 0, 0
+    previous = None
+    spaces = [character for character in WHITESPACE if character in text]
+    for match in PERIOD_CONTEXT.finditer(text):
+        # The word before the candidate starts after the last whitespace since the previous one
+        space = max([text.rfind(character, previousStop, match.start()) for character in spaces] or [-1])
+        start = space + 1 if space > previousStop or continued and space == 0 else previousStart
+        if previous is not None and previousStop <= start:
+            candidates.append((previous, previousStart))
+        previous, previousStart, previousStop = match, start, match.start()
+    if previous is not None:
+        candidates.append((previous, previousStart))
+
+    breaks = []
+    for match, start in candidates:
+        if match.group() == "." and not _contains_break(text[start:match.end()] + match.group("after_tok")):
+            continue
+        breaks.append(match)
+
+    # Closing quotes and brackets after a break are moved to the end of the sentence before it
+    for i, match in enumerate(breaks):
+        period = match.start()
+        sentenceStart = lastBreak
+        lastBreak = match.start("next_tok") if match.group("next_tok") else match.end()
+        stop = match.end()
+        closing = REALIGN.match(text, lastBreak, breaks[i + 1].end() if i + 1 < len(breaks) else len(text))
+        if closing is not None:
+            stop = lastBreak + len(closing.group().rstrip())
+            lastBreak = closing.end()
+        starts.append(lastBreak)
+        if lastBreak < len(text) and text[lastBreak - 1] not in WHITESPACE:
+            boundaries.append(lastBreak)
+        if match.group() == "." and period > sentenceStart and text[period - 1] != ".":
+            # The period is only split off if nothing but closing quotes and brackets follow it
+            tail = text[period:stop]
+            if CLOSED_PERIOD.fullmatch(tail) and ' "' not in tail and " ''" not in tail:
+                periods.append(period)
+    return periods, boundaries, starts
+
+
+# NLTKWordTokenizer rules
+QUOTES_OPEN = re.compile("([«“‘„]|[`]+)", re.U)
+DOUBLE_BACKTICK = re.compile(r"(``)")
+QUOTES_OPENING = re.compile(r"(?<=[ \(\[{<«“‘„`\"])(\"|\'{2})", re.U)
+APOSTROPHE_OPEN = re.compile(r"(?i)(?<!\w)(\')(?!(?:re|ve|ll|m|t|s|d|n)\b)(?=\w)", re.U)
+COLON_COMMA = re.compile(r"([:,])([^\d])")
+ELLIPSES = re.compile(r"\.{2,}", re.U)
+PAD = re.compile(r"[;@#$%&?!‒-―]", re.U)
+APOSTROPHE_CLOSE = re.compile(r"([^'])' ")
+BRACKETS = re.compile(r"[*\]\[\(\)\{\}\<\>]")
+FINAL_PERIOD = re.compile(r'([^\.])(\.)([\]\)}>"\'' "»”’ " r"]*)\s*$", re.U)
+QUOTES_CLOSE = re.compile("[»”’]", re.U)
+SPACES = re.compile(r"\s+")
+CLITICS = [
+    re.compile(r"([^' ])('[sS]|'[mM]|'[dD]|') "),
+    re.compile(r"([^' ])('ll|'LL|'re|'RE|'ve|'VE|n't|N'T) "),
+]
+# Contractions split in two, by the word they are found with
+CONTRACTIONS = {
+    "cannot": re.compile(r"(?i)\b(can)(?#X)(not)\b"),
+    "d'ye": re.compile(r"(?i)\b(d)(?#X)('ye)\b"),
+    "gimme": re.compile(r"(?i)\b(gim)(?#X)(me)\b"),
+    "gonna": re.compile(r"(?i)\b(gon)(?#X)(na)\b"),
+    "gotta": re.compile(r"(?i)\b(got)(?#X)(ta)\b"),
+    "lemme": re.compile(r"(?i)\b(lem)(?#X)(me)\b"),
+    "more'n": re.compile(r"(?i)\b(more)(?#X)('n)\b"),
+    "wanna": re.compile(r"(?i)\b(wan)(?#X)(na)(?=\s)"),
+    "'tis": re.compile(r"(?i) ('t)(?#X)(is)\b"),
+    "'twas": re.compile(r"(?i) ('t)(?#X)(was)\b"),
+}
+ANY_CONTRACTION = re.compile(r"(?i)cannot|d'ye|gimme|gonna|gotta|lemme|more'n|wanna|'t(?:is|was)")
+
+
+def _pad(found: re.Match) -> str:
+    # A function is faster than the template r" \g<0> " when there are many matches
+    return " " + found.group() + " "
+
+
+def word_tokenize(text: str, continued: bool = False) -> List[str]:
+    """Splits a text into the tokens nltk.word_tokenize returns for it.
+
+    Args:
+        text (str): The text.
+        continued (bool, optional): Whether the text is cut out of a longer one at whitespace, and
+            is to be tokenized as part of it. Defaults to False.
+
+    Returns:
+        List[str]: The tokens.
+    """
+    # Split off the periods that end a sentence and separate sentences that are not yet separated.
+    # A cut is (position, replaced characters, replacement).
+    periods, boundaries, starts = sentence_breaks(text, continued)
+    end = len(text.rstrip())
+    final = FINAL_PERIOD.search(text, max(starts[-1], end - 1000))
+    if final is not None and final.start() >= starts[-1]:
+        if ' "' not in final.group(3) and " ''" not in final.group(3):  # opening quotes are `` by then
+            periods.append(final.start(2))
+    cuts = [(period, 1, " . ") for period in periods] + [(boundary, 0, " ") for boundary in boundaries]
+    if '"' in text or "''" in text:
+        # Quotes that start a sentence or follow a space or an opening bracket or quote are ``.
+        # They are replaced before the periods are split off, which puts spaces in front of quotes.
+        starts = set(starts)
+        cuts.extend((start, 1, " `` ") for start in starts if text.startswith('"', start))
+        for quote in QUOTES_OPENING.finditer(text, 1):
+            position = quote.start()
+            if position not in starts and (text[position - 1] != '"' or position - 1 in starts):
+                cuts.append((position, len(quote.group()), " `` "))
+    if cuts:
+        parts, start = [], 0
+        for position, replaced, separator in sorted(cuts):
+            parts.append(text[start:position])
+            parts.append(separator)
+            start = position + replaced
+        parts.append(text[start:])
+        text = "".join(parts)
+
+    # Starting quotes
+    if "`" in text or "«" in text or "“" in text or "‘" in text or "„" in text:
+        text = QUOTES_OPEN.sub(r" \1 ", text)
+        text = DOUBLE_BACKTICK.sub(r" \1 ", text)
+    apostrophes = "'" in text
+    if apostrophes:
+        text = APOSTROPHE_OPEN.sub(r"\1 ", text)
+
+    # Punctuation
+    text = COLON_COMMA.sub(r" \1 \2", text)
+    if text.endswith(":") or text.endswith(","):
+        text = text[:-1] + " " + text[-1] + " "
+    if ".." in text:
+        text = ELLIPSES.sub(r" \g<0> ", text)
+    text = PAD.sub(_pad, text)
+    if apostrophes:
+        text = APOSTROPHE_CLOSE.sub(r"\1 ' ", text)
+    text = BRACKETS.sub(_pad, text)
+    if "--" in text:
+        text = text.replace("--", " -- ")
+
+    # Ending quotes
+    text = " " + text + " "
+    if "»" in text or "”" in text or "’" in text:
+        text = QUOTES_CLOSE.sub(_pad, text)
+    if "''" in text:
+        text = text.replace("''", " '' ")
+    text = text.replace('"', " '' ")
+    if apostrophes:
+        text = SPACES.sub(" ", text)
+        for regexp in CLITICS:
+            text = regexp.sub(r"\1 \2 ", text)
+    found = {contraction.group().casefold() for contraction in ANY_CONTRACTION.finditer(text)}
+    for word, regexp in CONTRACTIONS.items():
+        if word in found:
+            text = regexp.sub(r" \1 \2 ", text)
+
+    return text.split()
+
+
+def tokenize(
+    content: Union[bytes, str],
+    stopTokens: Iterable[str] = STOP_TOKENS
+) -> List[str]:
+    """Tokenizes an HTML document like prettify() followed by nltk.word_tokenize.
+
+    Args:
+        content (Union[bytes, str]): The HTML document.
+        stopTokens (Iterable[str], optional): Tokens to leave out. Defaults to STOP_TOKENS.
+
+    Returns:
+        List[str]: The tokens of the document.
+    """
+    stopTokens = stopTokens if isinstance(stopTokens, (set, frozenset)) else frozenset(stopTokens)
+    return [token for token in word_tokenize(render(content)) if token not in stopTokens]
+
+
+# Characters of the page fed to the parser at a time, and characters of text tokenized at a time
+BLOCK_SIZE = 1 << 16
+CHUNK_SIZE = 1 << 14
+# HTMLParser stops parsing at a "&#" that does not start a character reference until it is fed
+# again, so a page with one has to be fed at once to be parsed the same way
+BAD_CHARREF = re.compile(r"&#(?!(?:[0-9]+|[xX][0-9a-fA-F]+)[^0-9a-fA-F])")
+# The text may be cut at whitespace after a word, a comma, a colon or the end of a tag. Nothing a
+# sentence break or a word rule looks at reaches past such whitespace, unless a sentence ends
+# right before the end of the tag.
+CUT = re.compile(r"(?<=[\w,:>])[ \t\n\r\x0b\x0c]")
+OPEN_END = re.compile(r"[.?!][\]\)}>\"'»”’ ]*$")
+
+
+def _cuts(text: str, start: int) -> Iterator[int]:
+    """Finds the positions after start where the text can be cut in two chunks."""
+    for space in CUT.finditer(text, start):
+        position = space.start()
+        if text[position - 1] != ">" or not OPEN_END.search(text, max(0, position - 100), position):
+            yield position
+
+
+def _chunks(content: Union[bytes, str]) -> Iterator[str]:
+    """Renders a page a block at a time and yields the rendered text in chunks.
+
+    Joined together the chunks are the text render() returns. Chunks are cut at whitespace that
+    no sentence or word continues over, so tokenizing the chunks one by one gives the same tokens
+    as tokenizing the whole text.
+    """
+    text = decode(content)
+    blockSize = len(text) if BAD_CHARREF.search(text) else BLOCK_SIZE
+    renderer = _Renderer()
+    lines: List[str] = []
+    size = 0
+    searched = 0  # the lines are not cut before this position
+    start = 0
+    while start <= len(text):
+        if start < len(text):
+            # Blocks end after a ">", blocks that end in an entity reference are parsed differently
+            stop = len(text)
+            if start + blockSize < len(text):
+                stop = text.rfind(">", start, start + blockSize) + 1
+                if stop <= start:
+                    stop = text.find(">", start + blockSize) + 1 or len(text)
+            renderer.feed(text[start:stop])
+            start = stop
+            # The last piece may still be taken back when a <pre> or <textarea> starts
+            done = len(renderer.pieces) - 1
+        else:
+            renderer.finish()
+            done = len(renderer.pieces)
+            start += 1
+        for line in renderer.pieces[:done]:
+            lines.append(line)
+            size += len(line) + 1
+        del renderer.pieces[:done]
+
+        if size - searched >= CHUNK_SIZE:
+            # The newline before the next line counts as whitespace to cut at
+            chunk = "\n".join(lines) + "\n"
+            begin = 0
+            for cut in _cuts(chunk, searched):
+                if cut - begin >= CHUNK_SIZE:
+                    yield chunk[begin:cut]
+                    begin = cut
+            lines = [chunk[begin:-1]]
+            size = searched = len(lines[0]) + 1
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def iter_tokens(
+    content: Union[bytes, str],
+    stopTokens: Iterable[str] = STOP_TOKENS,
+    anchor: Optional[str] = None
+) -> Iterator[str]:
+    """Tokenizes an HTML document lazily, giving the same tokens as tokenize().
+
+    Args:
+        content (Union[bytes, str]): The HTML document.
+        stopTokens (Iterable[str], optional): Tokens to leave out. Defaults to STOP_TOKENS.
+        anchor (str, optional): If given, tokens before the first occurrence of this token are
+            skipped, and chunks of the page without it are not tokenized at all.
+
+    Yields:
+        str: The tokens of the document, starting from the anchor if one is given.
+    """
+    stopTokens = stopTokens if isinstance(stopTokens, (set, frozenset)) else frozenset(stopTokens)
+    for chunk in _chunks(content):
+        if anchor is not None:
+            if anchor not in chunk:  # tokens are never joined, so the anchor is in the text
+                continue
+            tokens = word_tokenize(chunk, continued=True)
+            if anchor not in tokens:
+                continue
+            tokens = tokens[tokens.index(anchor):]
+            anchor = None
+        else:
+            tokens = word_tokenize(chunk, continued=True)
+        for token in tokens:
+            if token not in stopTokens:
+                yield token
@@ -2,99 +2,306 @@
 Program to update the database with the latest matches
 
 Ment to be run everyday @ 3 am to catch all the matches played each and everyday.
+
+In the incremental mode, the default, a league only fetches the matches played since the last
+successful run. Its high-water mark in update_marks is the time every earlier match of the
+league is stored by. The matches after the mark are taken from the schedule table, up to the
+start of today, as matches are only parsed once the day they are played is over. Without a mark
+the latest stored match of the league is used instead. Leagues that have nothing in the schedule
+table are listed with `get_match_links` like in the full mode. The mark moves up to the first
+match that failed, or that its page says is not played yet, e.g. because it was postponed, so it
+is fetched again the next night.
+
+The full mode lists the whole current season of every league and adds the matches that are not
+stored yet. Set BETTINGAI_UPDATE_MODE to "full" or "incremental" to choose.
+
+A match is stored with the season the schedule gives it, or else the season its own date falls
+in, so the matches of a backlog that reaches into the previous season keep their season.
+The incremental mode needs update_marks, see migration 3 in googleCloud/migrations.py.
 """
 from bettingAI.googleCloud.initPostgreSQL import initSession
-from bettingAI.writer.scraper import get_match_links, get_match_info
+from bettingAI.googleCloud.migrations import UPDATE_MARKS, require_migration
+from bettingAI.writer.scraper import get_match_links
+from bettingAI.writer.fetcher import CONCURRENCY, get_match_infos
 from bettingAI.writer.addRow import add_match, add_player_performance
+from bettingAI.writer.metrics import timed, write_report
+from bettingAI.writer.upsert import require_keys, upsert
 
 from sqlalchemy import text
 import sqlalchemy
 
 import datetime as dt
 import logging
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from bettingAI.googleCloud.databaseClasses import Matches, Schedule, UpdateMarks
 
-def update(session: sqlalchemy.orm.session) -> None:
+WORKERS = 1  # leagues updated at a time
+MODES = ("full", "incremental")
+SEASON_START = 7  # month the seasons of leagues spanning two years start in, if the schedule does not say
+
+def update(
+    session: sqlalchemy.orm.session, workers: Optional[int] = None, mode: Optional[str] = None
+) -> None:
     """Executes the main logic of the update program.
     
     This functions updates the ...
+
+    With more than one worker the leagues are updated at the same time, each by a worker thread
+    with a session of its own, while the rate limiter of client.py keeps their requests to fotmob
+    within BETTINGAI_FETCH_RATE together.
     
     Args: 
         session (sqlalchemy.orm.session): The database session object used for database operations.
+        workers (int, optional): Number of leagues updated at a time. Defaults to BETTINGAI_UPDATE_WORKERS or WORKERS.
+        mode (str, optional): "incremental" or "full". Defaults to BETTINGAI_UPDATE_MODE or "incremental".
     
     Returns:
         None
+
+    Raises:
+        ValueError: If the mode is not one of MODES.
+        MigrationMissing: If a migration the update needs is not applied to the database.
     """
+    workers = workers if workers is not None else int(os.environ.get("BETTINGAI_UPDATE_WORKERS", WORKERS))
+    mode = mode if mode is not None else os.environ.get("BETTINGAI_UPDATE_MODE", "incremental")
+    if mode not in MODES:
+        raise ValueError(f"Unknown update mode {mode!r}, expected one of {', '.join(MODES)}")
+    require_keys(session)  # before any page is fetched, every upsert would fail without it
+    if mode == "incremental":
+        require_migration(session, UPDATE_MARKS)
+
     # Import leagues from database
     leagues = session.execute(text(
         "SELECT id as id, name as name, year_span as span FROM leagues;"
-    ))
+    )).all()
     
-    for league in leagues:
-        matchesAdded = 0
-        
-        season = "2023" if league.span == 1 else "2022-2023"
+    progress = {league.name: Counter() for league in leagues}
+    if workers <= 1:
+        for league in leagues:
+            update_league(session, league, progress[league.name], mode=mode)
+    else:
+        concurrency = max(1, CONCURRENCY // workers)  # the same number of requests in flight as one league
+
+        def work(league: Any) -> None:
+            leagueSession = initSession()
+            try:
+                update_league(leagueSession, league, progress[league.name], concurrency, mode)
+            finally:
+                leagueSession.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(work, league): league for league in leagues}
+            for future in as_completed(futures):
+                league = futures[future]
+                try:
+                    future.result()
+                except Exception as e:  # the other leagues carry on
+                    progress[league.name]["exceptions"] += 1
+                    logger.error(f"Stopped {league.name}: {e}")
+
+    total = sum(progress.values(), Counter())
+    for name, counts in progress.items():
+        logger.info(f"{name}: {counts['matchesAdded']} matches added, {counts['exceptions']} exceptions")
+    logger.info(f"Update complete, {total['matchesAdded']} matches added, {total['exceptions']} exceptions")
+    try:
+        write_report("update", total)
+    except Exception as e:
+        logger.error(f"Could not write the metrics: {e}")
+
+
+def update_league(
+    session: sqlalchemy.orm.session,
+    league: Any,
+    progress: Counter,
+    concurrency: int = CONCURRENCY,
+    mode: str = "incremental",
+) -> None:
+    """Adds the matches of the current season of a league that are not in the database yet.
+
+    Args:
+        session (sqlalchemy.orm.session): The database session object used for database operations.
+        league (Any): Row of the league with its id, name and span.
+        progress (Counter): Counter of the matches added and the exceptions raised.
+        concurrency (int, optional): Maximum number of requests in flight. Defaults to CONCURRENCY.
+        mode (str, optional): "incremental" or "full". Defaults to "incremental".
+    """
+    listed = current_season(league.span)  # the season get_match_links lists
+    
+    # The matches played since the last run, if the schedule knows the league
+    scheduled, until = None, None
+    if mode == "incremental":
+        scheduled, until = scheduled_fixtures(session, league.id)
+        if scheduled is None:
+            logger.info(f"No schedule for {league.name}, listing the season")
+    
+    if scheduled is not None:
+        all_fixtures = list(scheduled)
         
+        # Only look up the scheduled matches in the database
+        fixtures = session.query(Matches.id).filter(
+            Matches.id.in_([int(fixture.split("/")[2]) for fixture in all_fixtures])
+        )
+    else:
         # Fetch a list of all fixtures in the database
         fixtures = session.execute(text(
             "SELECT id FROM matches WHERE league_id = :id AND season = :season;"
             ),
             {
                 "id": league.id,
-                "season": season
+                "season": listed
             }
         )
-        fixtures = set([id[0] for id in fixtures])
         
         # Fetch the links of all matches in that league in the current season
         all_fixtures = get_match_links(league.id)
+    fixtures = set([id[0] for id in fixtures])
+    
+    # Make sure the matches are not already in the database
+    new_fixtures = [
+        fixture for fixture in all_fixtures if int(fixture.split("/")[2]) not in fixtures
+    ]
+    failed = []  # fixtures to fetch again on the next run
+    
+    # Gather info about the new fixtures, several at a time
+    for fixture, result in get_match_infos(new_fixtures, concurrency):
+        fixture_id = int(fixture.split("/")[2])
         
-        for fixture in all_fixtures:
-            fixture_id = int(fixture.split("/")[2])
-            
-            # Make sure the match is not already in the database
-            if fixture_id in fixtures:
-                continue
+        if isinstance(result, Exception):
+            progress["exceptions"] += 1
+            failed.append(fixture)
+            logger.error(result)
+            continue
+        matchStats, playerStats = result
+        if not matchStats: # if game returned false
+            # A scheduled match that is not played yet, e.g. postponed, holds the mark like a failure
+            progress["notPlayed"] += 1
+            failed.append(fixture)
+            continue
+        
+        # The season of the match itself, not of today, as a backlog can reach into the last season
+        if scheduled is not None and scheduled[fixture].season:
+            season = scheduled[fixture].season
+        else:
+            season = current_season(league.span, matchStats["dtg"].date())
+
+        # Add match to the database, or update it if it is already there
+        try:
+            match, homeSide, awaySide = add_match(fixture_id, season, matchStats)
+            with timed("flush", items=1 if homeSide is None else 3):
+                counts = upsert(session, [match])
+                if homeSide is not None:
+                    upsert(session, [homeSide, awaySide])
+                session.commit()
+            progress["matchesAdded"] += counts["inserted"]
+        except Exception as e:
+            session.rollback()
+            progress["exceptions"] += 1
+            failed.append(fixture)
+            logger.error(e)
+            continue # the player performances need the match
             
-            # Try to gather info about the current fixture
-            matchStats = False
+        if playerStats is None:
+            continue
+        playerPerformances = []
+        for player in playerStats.keys():
             try:
-                matchStats, playerStats = get_match_info(fixture)
+                playerPerformances.append(add_player_performance(
+                    fixture_id, playerStats, player
+                ))
             except Exception as e:
-                logger.error(e)
-            finally:
-                if not matchStats: # if game returned false
-                    continue
-            
-            # Add match to the database
-            try:
-                match, homeSide, awaySide = add_match(fixture_id, season, matchStats)
-                session.add(match)
-                if homeSide is not None:
-                    session.add(homeSide)
-                    session.add(awaySide)
+                logging.error(e)
+        try:
+            with timed("flush", items=len(playerPerformances)):
+                counts = upsert(session, playerPerformances)
                 session.commit()
-                matchesAdded += 1
-            except Exception as e:
-                session.rollback()
-                logger.error(e)
+            progress["playersAdded"] += counts["inserted"]
+        except Exception as e:
+            session.rollback()
+            logging.error(e)
                 
-            if playerStats is None:
-                continue
-            continue
-            for player in playerStats.keys():
-                try:
-                    session.add(add_player_performance(
-                        fixture, playerStats, player
-                    ))
-                    session.commit()
-                except Exception as e:
-                    session.rollback()
-                    logging.error(e)
-                    
-        print(league.name, matchesAdded)
-                    
-    logger.info("Update complete")
-    
+    if until is not None:
+        # Everything before the first failure or unplayed match is stored now
+        failedDates = [scheduled[fixture].date for fixture in failed if fixture in (scheduled or {})]
+        played_until = min(failedDates) - dt.timedelta(microseconds=1) if failedDates else until
+        record_mark(session, league.id, played_until)
+    print(league.name, progress["matchesAdded"])
+
+
+def current_season(span: int, day: Optional[dt.date] = None) -> str:
+    """Returns the season a league is playing on a day, in the format of values.SEASONS.
+
+    Args:
+        span (int): The number of years a season of the league spans, 1 or 2.
+        day (datetime.date, optional): The day. Defaults to today.
+
+    Returns:
+        str: E.g. "2023" for a league playing within a year, "2023-2024" for one spanning two.
+    """
+    day = day if day is not None else dt.date.today()
+    if int(span) == 1:
+        return str(day.year)
+    start = day.year if day.month >= SEASON_START else day.year - 1
+    return f"{start}-{start + 1}"
+
+
+def high_water_mark(session: sqlalchemy.orm.session, leagueID: int) -> Optional[dt.datetime]:
+    """Returns the time every match of a league before is stored by.
+
+    This is the mark of the last run, or the date of the latest stored match of the league if no
+    run recorded one yet, or None if there is neither.
+    """
+    mark = session.get(UpdateMarks, leagueID)
+    if mark is not None:
+        return mark.played_until
+    return session.execute(
+        text("SELECT MAX(date) FROM matches WHERE league_id = :id"), {"id": leagueID}
+    ).scalar()
+
+
+def scheduled_fixtures(
+    session: sqlalchemy.orm.session, leagueID: int, now: Optional[dt.datetime] = None
+) -> Tuple[Optional[Dict[str, Any]], Optional[dt.datetime]]:
+    """Returns the scheduled matches of a league played since its high-water mark.
+
+    Args:
+        session (sqlalchemy.orm.session): The database session object used for database operations.
+        leagueID (int): The ID of the league.
+        now (datetime.datetime, optional): The time of the run. Defaults to now.
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], Optional[datetime.datetime]]: The links of the matches with
+        their row of the schedule, which has the date and season, and the time the new mark can be
+        moved to once they are stored. Both are None if the schedule has no matches of the league.
+    """
+    now = now if now is not None else dt.datetime.now()
+    until = dt.datetime.combine(now.date(), dt.time())  # matches are parsed the day after
+    mark = high_water_mark(session, leagueID)
+
+    scheduled = session.query(Schedule.match_id, Schedule.date, Schedule.season).filter(
+        Schedule.league_id == leagueID
+    )
+    if scheduled.first() is None:  # the schedule does not cover the league
+        return None, None
+    if mark is not None:
+        scheduled = scheduled.filter(Schedule.date > mark)
+    rows = scheduled.filter(Schedule.date < until).order_by(Schedule.date).all()
+    return {f"/match/{row.match_id}": row for row in rows}, until
+
+
+def record_mark(session: sqlalchemy.orm.session, leagueID: int, playedUntil: dt.datetime) -> None:
+    """Stores the high-water mark of a league and commits it, it never moves back."""
+    mark = session.get(UpdateMarks, leagueID)
+    if mark is None:
+        session.add(UpdateMarks(league_id=leagueID, played_until=playedUntil, updated=dt.datetime.now()))
+    elif playedUntil > mark.played_until:
+        mark.played_until = playedUntil
+        mark.updated = dt.datetime.now()
+    session.commit()
+
 def initLogger() -> logging.Logger:
     """Initializes and configures a logger object for logging messages.
 
@@ -0,0 +1,163 @@
+"""
+upsert.py
+
+INSERT ... ON CONFLICT helpers for the tables filled by writer.py and update.py.
+
+Duplicates used to be found by inserting the row anyway, letting a unique constraint raise,
+rolling back and counting the exception. Here every row is sent with an ON CONFLICT clause
+instead, so a row that is already there never fails:
+
+    teams, players, matches, matchstats, playerstats
+        ON CONFLICT (key) DO UPDATE the other columns, but only if one of them changed
+    any other table
+        ON CONFLICT DO NOTHING
+
+The statement returns `xmax = 0` for every row it inserts or updates, which is true for a new
+row, so the rows are counted as inserted, updated or skipped (already there and unchanged)
+without a single rollback. This is PostgreSQL only.
+
+ON CONFLICT needs a unique index on the key columns. The one of matchstats is created by
+migration 1 (see googleCloud/migrations.py), which the upserts check once per engine.
+
+Example:
+    counts = upsert(session, [match, homeSide, awaySide])
+    session.commit()
+    print(counts["inserted"], counts["updated"], counts["skipped"])
+"""
+
+import weakref
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import sqlalchemy
+from sqlalchemy import Table, literal_column, or_
+from sqlalchemy.dialects.postgresql import Insert, insert
+
+from bettingAI.googleCloud.databaseClasses import Base
+from bettingAI.googleCloud.migrations import INDEXES, require_migration
+
+# Columns identifying a row, per table
+KEYS: Dict[str, Tuple[str, ...]] = {
+    "teams": ("id",),
+    "players": ("id",),
+    "matches": ("id",),
+    "matchstats": ("match_id", "side"),
+    "playerstats": ("player_id", "match_id"),
+}
+
+# Columns never overwritten by an update, per table
+KEEP: Dict[str, Tuple[str, ...]] = {
+    "teams": ("stadium",),  # add_team only knows a placeholder
+}
+
+_keysChecked = weakref.WeakSet()  # the engines that have the unique indexes, see require_keys
+
+
+def row_values(row: Base) -> Dict[str, Any]:
+    """Returns the column values of an ORM row, leaving out primary keys the database generates."""
+    values = {}
+    for column in row.__table__.columns:
+        value = getattr(row, column.key)
+        if value is None and column.primary_key:  # left to the sequence
+            continue
+        values[column.key] = value
+    return values
+
+
+def on_conflict(statement: Insert, table: Table, inserted: Optional[Iterable[str]] = None) -> Insert:
+    """Adds the ON CONFLICT clause of a table to an insert into it.
+
+    The statement returns one boolean per row inserted (true) or updated (false). Rows that
+    were skipped return nothing.
+
+    Args:
+        statement (Insert): The insert into the table.
+        table (Table): The table.
+        inserted (Iterable[str], optional): The columns the statement inserts, only those are
+            updated. Defaults to all columns.
+    """
+    keys = KEYS.get(table.name)
+    inserted = set(table.columns.keys() if inserted is None else inserted)
+    columns = [
+        column.key
+        for column in table.columns
+        if column.key in inserted
+        and column.key not in (keys or ())
+        and column.key not in KEEP.get(table.name, ())
+        and not column.primary_key
+    ]
+    if keys is None or not columns:
+        statement = statement.on_conflict_do_nothing()
+    else:
+        statement = statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: statement.excluded[column] for column in columns},
+            where=or_(*[table.c[column].is_distinct_from(statement.excluded[column]) for column in columns]),
+        )
+    return statement.returning(literal_column("xmax = 0").label("inserted"))
+
+
+@lru_cache(maxsize=None)
+def upsert_statement(table: Table) -> Insert:
+    """Returns the INSERT ... ON CONFLICT statement of a table, see `on_conflict`."""
+    return on_conflict(insert(table), table)
+
+
+def require_keys(session: sqlalchemy.orm.Session) -> None:
+    """Checks that the unique indexes ON CONFLICT needs on the key columns exist, once per engine.
+
+    Raises:
+        MigrationMissing: If migration 1, which creates them, is not applied to the database.
+    """
+    bind = session.get_bind()
+    if bind not in _keysChecked:
+        require_migration(session, INDEXES)
+        _keysChecked.add(bind)
+
+
+def upsert_values(session: sqlalchemy.orm.Session, table: Table, rows: List[Dict[str, Any]]) -> Counter:
+    """Upserts rows given as column values into a table with a single executemany.
+
+    The rows must all have the same columns.
+
+    Args:
+        session (sqlalchemy.orm.Session): The database session object used for database operations.
+        table (Table): The table to upsert into.
+        rows (List[Dict[str, Any]]): The column values of every row.
+
+    Returns:
+        Counter: The number of rows "inserted", "updated" and "skipped".
+    """
+    require_keys(session)
+    inserted = session.execute(upsert_statement(table), rows).scalars().all()
+    return Counter(
+        inserted=sum(inserted),
+        updated=len(inserted) - sum(inserted),
+        skipped=len(rows) - len(inserted),
+    )
+
+
+def upsert(session: sqlalchemy.orm.Session, rows: Iterable[Base]) -> Counter:
+    """Upserts ORM rows, such as the ones built in addRow.py, without committing.
+
+    The rows are grouped by table and inserted parents first, so a match can be upserted in the
+    same call as its stats.
+
+    Args:
+        session (sqlalchemy.orm.Session): The database session object used for database operations.
+        rows (Iterable[Base]): The rows to insert or update.
+
+    Returns:
+        Counter: The number of rows "inserted", "updated" and "skipped".
+    """
+    groups: Dict[Tuple[Table, Tuple[str, ...]], List[Dict[str, Any]]] = {}
+    for row in rows:
+        values = row_values(row)
+        groups.setdefault((row.__table__, tuple(values)), []).append(values)
+
+    order = Base.metadata.sorted_tables
+    counts = Counter()
+    for (table, _), values in sorted(groups.items(), key=lambda group: order.index(group[0][0])):
+        counts += upsert_values(session, table, values)
+    return counts
@@ -3,31 +3,58 @@ import json
 import logging
 import os
 from collections import Counter
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import sqlalchemy
 
 from bettingAI.googleCloud.initPostgreSQL import initSession
 from bettingAI.googleCloud.databaseClasses import *
 from bettingAI.writer.addRow import *
+from bettingAI.writer.bulk import BulkWriter, bulk_writer
+from bettingAI.writer.deadletter import PARSE, STORE, DeadLetterQueue, stage_of
+from bettingAI.writer.fetcher import CONCURRENCY
+from bettingAI.writer.frontier import DISCOVERED, FAILED, STORED, Frontier
+from bettingAI.writer.metrics import timed, write_report
+from bettingAI.writer.pipeline import PARSERS, run_pipeline
+from bettingAI.writer.rows import match_rows, player_rows
 from bettingAI.writer.scraper import *
+from bettingAI.writer.upsert import upsert
 from bettingAI.writer.values import *
 
+WORKERS = 1  # leagues written at a time
 
-def runner(session: sqlalchemy.orm.Session) -> None:
+
+def runner(session: sqlalchemy.orm.Session, workers: Optional[int] = None) -> None:
     """Executes the main logic of the writer program.
 
     This function updates team and player information, gathers match data, and adds it to the database.
     It iterates over each league, retrieves team links, updates team information, retrieves player links,
     updates player information, retrieves match links, gathers match information, and adds it to the database.
     The function also handles exceptions and logs error messages.
+    The fixtures of every season are kept in the crawl frontier (see frontier.py), so a run that
+    stops halfway resumes with the fixtures that are not stored yet. The match rows are upserted
+    in bulk (see bulk.py), with a commit per flush instead of one per row. Fixtures that fail are
+    kept as dead letters (see deadletter.py) and retried by retry.py.
+
+    With more than one worker the leagues are written at the same time, each by a worker thread
+    with a session of its own, so a slow league no longer holds up the others. The workers share
+    the fetchers and parser processes of a single run, and the rate limiter of client.py keeps
+    their requests to fotmob within BETTINGAI_FETCH_RATE together. The counters of every league
+    are merged into the report once all workers are done.
 
     Args:
         session (sqlalchemy.orm.Session): The database session object used for database operations.
+        workers (int, optional): Number of leagues written at a time. Defaults to BETTINGAI_WRITER_WORKERS or WORKERS.
 
     Returns:
         None
     """
+    workers = workers if workers is not None else int(os.environ.get("BETTINGAI_WRITER_WORKERS", WORKERS))
+
+    # Resume from the fixtures listed by earlier runs, creating the crawl tables before the workers start
+    frontier = Frontier(session)
+
     # Import leagues from database
     leagues = session.query(Leagues).all()
     leagues = [league.__dict__ for league in leagues]
@@ -37,146 +64,46 @@ def runner(session: sqlalchemy.orm.Session) -> None:
     trackData = (
         Counter()
     )  # class to track explored, updated and added teams, matches and players
-    for league in leagues:  # iterate over each league
-        logger.info(f"Updating {league['name']}")
+    leagueData: Dict[str, Counter] = {}  # the same counts for every league
+    for league in leagues:
         exceptions[league["id"]] = Counter()  # create specific Counter() for this league
+        leagueData[league["name"]] = Counter()
 
-        # PART ONE: GET / UPDATE TEAM AND PLAYER INFO
-        # Get the fotmob links to all team in that league
-        teams = get_team_links(league["id"], nTeams=league["n_teams"])
-        teamIDs = [
-            row.id
-            for row in session.query(Teams.id)
-            .filter(Teams.league_id == league["id"])
-            .all()
-        ]
-
-        for team in teams:  # iterate over each team
-            continue
-            teamID = int(team.split("/")[2])  # fotmob team id
+    if workers <= 1:
+        for league in leagues:  # iterate over each league
+            write_league(session, frontier, league, leagueData[league["name"]], exceptions[league["id"]])
+    else:
+        fetchers = max(1, CONCURRENCY // workers)  # the same number of requests in flight as one league
+        parsers = max(1, PARSERS // workers)
 
-            if teamID not in teamIDs:  # check if we already have the team in the database
-                # Add the team if possible
-                try:
-                    trackData["tExplored"] += 1
-                    teamSQL = add_team(teamID, get_name(team), league["id"])
-                    session.add(teamSQL)
-                    session.commit()
-                    trackData["tAdded"] += 1
-                except Exception as e:
-                    session.rollback()
-                    exceptions[league["id"]][f"{type(e)} : {e}"] += 1
-
-            # Get the fotmob links to all matches and players for the given team
-            players = get_player_links(teamID)
+        def work(league: Dict[str, Any]) -> None:
+            leagueSession = initSession()
             try:
-                playerIDs = [
-                    row.id
-                    for row in session.query(Players.id)
-                    .filter(Players.team_id == teamID)
-                    .all()
-                ]
-            except sqlalchemy.exc.DatabaseError as e:
-                playerIDs = []
-
-            for player in players:  # iterate over all players in the team
-                continue
-                playerID = int(player.split("/")[2])
-                if playerID in playerIDs:  # check if player already is listed for team
-                    continue
-
+                write_league(
+                    leagueSession,
+                    Frontier(leagueSession),
+                    league,
+                    leagueData[league["name"]],
+                    exceptions[league["id"]],
+                    fetchers,
+                    parsers,
+                )
+            finally:
+                leagueSession.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(work, league): league for league in leagues}
+            for future in as_completed(futures):
+                league = futures[future]
                 try:
-                    trackData["pExplored"] += 1  # update number of explored players
-                    playerBio = add_player_bio(
-                        player.split("/")[2],
-                        teamID,
-                        get_name(player),
-                        get_player_bio(player),
-                    )
-                    session.add(playerBio)  # add player
-                    session.commit()  # commit player to databse
-                    trackData["pAdded"] += 1  # keep track of players added
-                except Exception as e:
-                    session.rollback()
+                    future.result()
+                    logger.info(f"Finished {league['name']}")
+                except Exception as e:  # the other leagues carry on
                     exceptions[league["id"]][f"{type(e)} : {e}"] += 1
+                    logger.error(f"Stopped {league['name']}: {type(e)} : {e}")
 
-        # PART TWO: GET MATCH INFO
-        seasons = SEASONS[league["year_span"]]
-        seasons = ["2022-2023"] if int(league["year_span"]) == 2 else ["2023"]
-        for season in seasons:  # iterate over last ten seasons for the league
-            logger.info(f"Begun on {season} season for {league['name']}")
-            if league["level"] > 2:
-                print("Will not add leagues with lower lever than 2")
-                continue
-
-            fixtures = get_match_links(
-                league["id"], season
-            )  # find all matches in that season
-            fixtureIDs = [
-                row.id
-                for row in session.query(Matches.id)
-                .filter((Matches.league_id == league["id"]) & (Matches.season == season))
-                .all()
-            ]  # find all matches already in the db
-
-            for fixture in fixtures:  # iterate over all matches found for the team
-                fixtureID = int(fixture.split("/")[2])
-                if fixtureID in fixtureIDs:
-                    continue
-                # Gather info about that fixture
-                try:
-                    matchStats, playerStats = get_match_info(fixture)
-                    matchID = fixture.split("/")[2]  # get match ID from fotmob
-                except Exception as e:
-                    exceptions[league["id"]][f"{type(e)} : {e}"] += 1
-                    continue
-
-                if (
-                    matchStats is False
-                ):  # it will return False if the match is in the future
-                    continue
-
-                # Add match data to the database
-                try:
-                    trackData["mExplored"] += 1  # track matches explored
-                    match, homeSide, awaySide = add_match(matchID, season, matchStats)
-                    session.add(match)  # add main info
-                    if homeSide is not None:
-                        session.add(homeSide)  # add home stats
-                        session.add(awaySide)  # add away stats
-                    session.commit()  # commit match stats
-                    trackData["mAdded"] += 1  # track match added
-                except Exception as e:
-                    session.rollback()
-                    exceptions[league["id"]][f"{type(e)} : {e}"] += 1
-
-                # Add player performance stats do database
-                if playerStats is None:
-                    continue
-                for player in playerStats.keys():  # iterate over all players returned from gather_player_performance()
-                    try:
-                        trackData["psExplored"] += 1
-                        playerPerformance = add_player_performance(
-                            matchID, playerStats, player
-                        )
-                        session.add(playerPerformance)
-                        session.commit()
-                        trackData["psAdded"] += 1
-                    except Exception as e:
-                        session.rollback()
-                        exceptions[league["id"]][f"{type(e)} : {e}"] += 1
-            print(trackData)
-
-        # Log error messages that occoured in the league
-        if exceptions[league["id"]].items():  # check for any exceptions
-            logger.info(f"Exceptions for {league['name']}:")
-            for error, count in exceptions[
-                league["id"]
-            ].items():  # iterate over all exceptions
-                if (
-                    count > 5
-                ):  # ensure we dont record the error of trying to add something that is already there
-                    logger.error(f"    {error}   ->  {count}")  # log each exception
+    for counts in leagueData.values():
+        trackData.update(counts)
 
     print(exceptions)
     # Get the end time of the data gathering
@@ -185,15 +112,236 @@ def runner(session: sqlalchemy.orm.Session) -> None:
 
     # Create a report of the writer.py execution
     try:
-        createReport(startTime, endTime, trackData)
+        createReport(
+            startTime,
+            endTime,
+            trackData,
+            leagues=leagueData,
+            errors={league["name"]: exceptions[league["id"]] for league in leagues},
+        )
     except:
         logger.error("Could not create report")
         print(startTime, endTime, trackData)
+    try:
+        write_report("writer", trackData)
+    except Exception as e:
+        logger.error(f"Could not write the metrics: {e}")
 
     # Exit program after successful execution
     logger.info(f"Successfully run in a time of {str(endTime - startTime)}")
 
 
+def write_league(
+    session: sqlalchemy.orm.Session,
+    frontier: Frontier,
+    league: Dict[str, Any],
+    trackData: Counter,
+    errors: Counter,
+    fetchers: int = CONCURRENCY,
+    parsers: int = PARSERS,
+) -> None:
+    """Updates the teams and players of a league and writes the matches of its seasons.
+
+    Args:
+        session (sqlalchemy.orm.Session): The database session object used for database operations.
+        frontier (Frontier): The crawl frontier, on the same session.
+        league (Dict[str, Any]): The columns of the league's row in the leagues table.
+        trackData (Counter): Counter of explored and added rows.
+        errors (Counter): Counter of the exceptions raised, by message.
+        fetchers (int, optional): Pages downloaded at a time. Defaults to CONCURRENCY.
+        parsers (int, optional): Parser processes. Defaults to PARSERS.
+    """
+    logger.info(f"Updating {league['name']}")
+
+    # PART ONE: GET / UPDATE TEAM AND PLAYER INFO
+    # Get the fotmob links to all team in that league
+    teams = get_team_links(league["id"], nTeams=league["n_teams"])
+    teamIDs = [
+        row.id
+        for row in session.query(Teams.id)
+        .filter(Teams.league_id == league["id"])
+        .all()
+    ]
+
+    for team in teams:  # iterate over each team
+        continue
+        teamID = int(team.split("/")[2])  # fotmob team id
+
+        if teamID not in teamIDs:  # check if we already have the team in the database
+            # Add the team if possible
+            try:
+                trackData["tExplored"] += 1
+                teamSQL = add_team(teamID, get_name(team), league["id"])
+                counts = upsert(session, [teamSQL])
+                session.commit()
+                trackData["tAdded"] += counts["inserted"]
+            except Exception as e:
+                session.rollback()
+                errors[f"{type(e)} : {e}"] += 1
+
+        # Get the fotmob links to all matches and players for the given team
+        players = get_player_links(teamID)
+        try:
+            playerIDs = [
+                row.id
+                for row in session.query(Players.id)
+                .filter(Players.team_id == teamID)
+                .all()
+            ]
+        except sqlalchemy.exc.DatabaseError as e:
+            playerIDs = []
+
+        for player in players:  # iterate over all players in the team
+            continue
+            playerID = int(player.split("/")[2])
+            if playerID in playerIDs:  # check if player already is listed for team
+                continue
+
+            try:
+                trackData["pExplored"] += 1  # update number of explored players
+                playerBio = add_player_bio(
+                    player.split("/")[2],
+                    teamID,
+                    get_name(player),
+                    get_player_bio(player),
+                )
+                counts = upsert(session, [playerBio])  # add or update player
+                session.commit()  # commit player to databse
+                trackData["pAdded"] += counts["inserted"]  # keep track of players added
+                trackData["pUpdated"] += counts["updated"]
+            except Exception as e:
+                session.rollback()
+                errors[f"{type(e)} : {e}"] += 1
+
+    # PART TWO: GET MATCH INFO
+    deadLetters = DeadLetterQueue(session)  # fixtures that fail are retried by retry.py
+    seasons = SEASONS[league["year_span"]]
+    seasons = ["2022-2023"] if int(league["year_span"]) == 2 else ["2023"]
+    for season in seasons:  # iterate over last ten seasons for the league
+        logger.info(f"Begun on {season} season for {league['name']}")
+        if league["level"] > 2:
+            print("Will not add leagues with lower lever than 2")
+            continue
+
+        # Find the matches of the season we do not have yet, listing the season only once
+        fixtures = frontier.fixtures(
+            league["id"], season, lambda: get_match_links(league["id"], season)
+        )
+
+        # Insert the rows in bulk, a match is stored once its row is committed
+        def written(table: str, fixture: str, error: Optional[Exception]) -> None:
+            frontier.record(fixture, FAILED if error else STORED, error)
+            if error:
+                deadLetters.record(fixture, league["id"], season, STORE, error)
+            else:
+                deadLetters.resolve(fixture)
+
+        def flushed() -> None:
+            frontier.checkpoint()
+            deadLetters.checkpoint()
+
+        def failed(fixture: str, stage: str, error: Exception) -> None:
+            deadLetters.record(fixture, league["id"], season, stage, error)
+
+        bulk = bulk_writer(session, onRow=written, onFlush=flushed)
+
+        # Fetch, parse and store the fixtures in a pipeline, several at a time
+        def write(batch: List[Tuple[str, Any]]) -> None:
+            write_matches(bulk, season, batch, trackData, errors, frontier, failed)
+
+        run_pipeline(fixtures, write, fetchers, parsers, progress=frontier.progress)
+        bulk.flush()
+        trackData["mAdded"] += bulk.inserted[Matches.__tablename__]
+        trackData["mUpdated"] += bulk.updated[Matches.__tablename__]
+        trackData["psAdded"] += bulk.inserted[PlayerStats.__tablename__]
+        errors.update(bulk.errors)
+        logger.info(
+            f"Wrote {sum(bulk.inserted.values())} new rows of {league['name']}, "
+            f"updated {sum(bulk.updated.values())} and skipped {sum(bulk.skipped.values())} "
+            f"at {bulk.rate():.0f} rows/sec"
+        )
+        print(league["name"], trackData)
+
+    # Log error messages that occoured in the league
+    if errors.items():  # check for any exceptions
+        logger.info(f"Exceptions for {league['name']}:")
+        for error, count in errors.items():  # iterate over all exceptions, rows already there are upserted and never raise
+            logger.error(f"    {error}   ->  {count}")  # log each exception
+
+
+def write_matches(
+    bulk: BulkWriter,
+    season: str,
+    batch: List[Tuple[str, Any]],
+    trackData: Counter,
+    errors: Counter,
+    frontier: Optional[Frontier] = None,
+    onFailure: Optional[Callable[[str, str, Exception], None]] = None,
+) -> None:
+    """Adds a batch of fixtures from the pipeline to the bulk writer.
+
+    The rows are built as plain column values by rows.py, and inserted and committed when the
+    bulk writer flushes, so the matches and player stats added here are counted in `bulk.inserted`. Rows that cannot be built from the parsed
+    stats are skipped and counted right away. The pipeline calls this on its writer thread,
+    while the runner waits for it.
+
+    Args:
+        bulk (BulkWriter): The bulk writer to add the rows to. The match rows are added with their
+            fixture as key.
+        season (str): The season the matches belong to.
+        batch (List[Tuple[str, Any]]): Fixture links with the result of `get_match_info` or the exception raised.
+        trackData (Counter): Counter of explored and added rows.
+        errors (Counter): Counter of the exceptions raised, by message.
+        frontier (Frontier, optional): Crawl frontier to record the fixtures that are not added in.
+            They are committed with the next flush.
+        onFailure (Callable[[str, str, Exception], None], optional): Called with the fixture, the
+            stage it failed in (see deadletter.py) and the exception for every fixture that could
+            not be fetched or parsed.
+    """
+    for fixture, result in batch:
+        if isinstance(result, Exception):
+            errors[f"{type(result)} : {result}"] += 1
+            if frontier is not None:
+                frontier.record(fixture, FAILED, result)
+            if onFailure is not None:
+                onFailure(fixture, stage_of(result), result)
+            continue
+        if result[0] is False:  # it will return False if the match is in the future
+            if frontier is not None:
+                frontier.record(fixture, DISCOVERED)
+            continue
+
+        matchStats, playerStats = result
+        matchID = fixture.split("/")[2]  # get match ID from fotmob
+        trackData["mExplored"] += 1  # track matches explored
+        with timed("build") as stage:
+            try:
+                match, homeSide, awaySide = match_rows(matchID, season, matchStats)
+            except Exception as e:
+                match = None
+                errors[f"{type(e)} : {e}"] += 1
+                if frontier is not None:
+                    frontier.record(fixture, FAILED, e)
+                if onFailure is not None:
+                    onFailure(fixture, PARSE, e)
+
+            # the performances of all players returned from gather_player_performance()
+            performances, failures = player_rows(matchID, playerStats)
+            stage.items = len(performances) + (0 if match is None else 1 if homeSide is None else 3)
+
+        if match is not None:
+            bulk.add_values(Matches.__table__, match, fixture)
+            if homeSide is not None:
+                bulk.add_values(MatchStats.__table__, homeSide)  # add home stats
+                bulk.add_values(MatchStats.__table__, awaySide)  # add away stats
+
+        trackData["psExplored"] += len(performances) + len(failures)
+        for e in failures:
+            errors[f"{type(e)} : {e}"] += 1
+        for performance in performances:
+            bulk.add_values(PlayerStats.__table__, performance)
+
+
 def initLogger() -> logging.Logger:
     """Initializes and configures a logger object for logging messages.
 
@@ -245,6 +393,8 @@ def createReport(
     end: dt.datetime,
     report: Counter,
     test: Optional[bool] = False,
+    leagues: Optional[Dict[str, Counter]] = None,
+    errors: Optional[Dict[str, Counter]] = None,
 ) -> None:
     """
     Creates a report with information about the execution and saves it as a .txt file.
@@ -254,6 +404,8 @@ def createReport(
         end (datetime.datetime): The end time of the execution.
         report (Counter): A Counter object containing various execution statistics.
         test (bool, optional): Specifies whether it is a test run. Defaults to False.
+        leagues (Dict[str, Counter], optional): The same statistics for every league, by name.
+        errors (Dict[str, Counter], optional): The exceptions raised in every league, by name.
 
     Returns:
         None: The function does not return any value.
@@ -267,6 +419,7 @@ def createReport(
     Teams added: {report.get("tAdded", 0)}
     Matches explored: {report.get("mExplored", 0)}
     Matches added: {report.get("mAdded", 0)}
+    Matches updated: {report.get("mUpdated", 0)}
     Player stats explored: {report.get("psExplored", 0)}
     Player stats added: {report.get("psAdded", 0)}
     Players explored: {report.get("pExplored", 0)}
@@ -274,6 +427,16 @@ def createReport(
     Players added: {report.get("pAdded", 0)}
     -------------------
     """
+    leagues = leagues or {}
+    errors = errors or {}
+    for name in sorted(set(leagues) | set(errors)):
+        counts = leagues.get(name, Counter())
+        reportContent += (
+            f"{name}: {counts.get('mAdded', 0)} matches added, {counts.get('mUpdated', 0)} updated, "
+            f"{counts.get('psAdded', 0)} player stats added, {sum(errors.get(name, Counter()).values())} exceptions\n    "
+        )
+    if leagues or errors:
+        reportContent += "-------------------\n    "
 
     # Decide filename
     formattedDate = dt.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -0,0 +1,83 @@
+import datetime as dt
+import os
+import random
+
+import pytest
+import sqlalchemy
+from sqlalchemy.orm import Session
+
+from bettingAI.googleCloud.databaseClasses import Leagues, Matches, TeamMatches, Teams
+from bettingAI.writer import cache
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus")
+
+
+@pytest.fixture
+def corpus():
+    """Serves pages from the recorded corpus in replay mode, so no test touches the network."""
+    saved = dict(cache._config)
+    cache.configure_cache(directory=CORPUS, mode="replay")
+    yield CORPUS
+    cache._config.update(saved)
+
+
+def add_match(session, id, home, away, season, date, homeGoals, awayGoals, leagueID=47):
+    """Adds a match, and its rows of team_matches as the trigger of migration 2 writes them."""
+    session.add(Matches(
+        id=id, home_team_id=home, away_team_id=away, league_id=leagueID, season=season, date=date,
+        home_goals=homeGoals, away_goals=awayGoals,
+    ))
+    for teamID, opponentID, side, goalsFor, goalsAgainst in [
+        (home, away, "home", homeGoals, awayGoals),
+        (away, home, "away", awayGoals, homeGoals),
+    ]:
+        session.add(TeamMatches(
+            team_id=teamID, match_id=id, opponent_id=opponentID, league_id=leagueID, season=season, date=date,
+            side=side, goals_for=goalsFor, goals_against=goalsAgainst,
+            points=3 if goalsFor > goalsAgainst else 1 if goalsFor == goalsAgainst else 0,
+        ))
+
+
+@pytest.fixture(scope="module")
+def league():
+    """An SQLite database with two seasons of a made-up league of 16 teams.
+
+    Every team plays every other twice a season, in weekly rounds with random scores and kick-off
+    times. A few fixtures are played again at the kick-off time of another match of one of their
+    teams, so features that only look at the matches before a date are tested with ties.
+    """
+    rng = random.Random(47)
+    engine = sqlalchemy.create_engine("sqlite://")
+    for table in [Leagues, Teams, Matches, TeamMatches]:
+        table.__table__.create(engine)
+    session = Session(engine)
+    session.add(Leagues(id=47, name="Premier League", country="England", n_teams=16, level=1, year_span=2))
+    teamIDs = list(range(9810, 9826))
+    session.add_all(Teams(id=id, name=f"Team {id}", stadium=f"Stadium {id}", league_id=47) for id in teamIDs)
+
+    id = 4_000_000
+    for season, year in [("2021-2022", 2021), ("2022-2023", 2022)]:
+        fixtures = [(home, away) for home in teamIDs for away in teamIDs if home != away]
+        rng.shuffle(fixtures)
+        round = 0
+        while fixtures:
+            playing, later = set(), []
+            for home, away in fixtures:
+                if home in playing or away in playing:
+                    later.append((home, away))
+                    continue
+                playing |= {home, away}
+                date = dt.datetime(year, 8, 1, 15) + dt.timedelta(weeks=round, hours=rng.choice([0, 0, 2, 5]))
+                add_match(session, id, home, away, season, date, rng.randint(0, 4), rng.randint(0, 3))
+                id += 1
+            fixtures, round = later, round + 1
+
+    session.flush()
+    for replayed in [4_000_250, 4_000_300, 4_000_301, 4_000_400]:
+        match = session.get(Matches, replayed)
+        opponent = teamIDs[-1] if match.away_team_id != teamIDs[-1] else teamIDs[-2]
+        add_match(session, id, opponent, match.home_team_id, match.season, match.date, rng.randint(0, 4), rng.randint(0, 3))
+        id += 1
+    session.commit()
+    yield session
+    session.close()
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+import sqlalchemy
+from sqlalchemy import ARRAY, Column, Float, Integer, MetaData, String, Table, select
+from sqlalchemy.orm import Session
+
+from bettingAI.writer.copyload import array_literal, copy_rows, copy_value
+
+DATABASE = os.environ.get("BETTINGAI_TEST_DATABASE_URL")  # e.g. postgresql+pg8000://postgres@localhost/postgres
+
+VALUES = [
+    {"id": 1, "numbers": [1.5, None, -2.0], "labels": ["a,b", "{c}", 'say "hi"', "back\\slash", "", "NULL", " x "]},
+    {"id": 2, "numbers": [[1.0, 2.0], [3.0, None]], "labels": ["tab\there", "new\nline"]},
+    {"id": 3, "numbers": [], "labels": None},
+]
+
+
+def test_array_literal():
+    assert array_literal([1.5, None, 2]) == '{"1.5",NULL,"2"}'
+    assert array_literal(["a,b", '"q"', "\\"]) == '{"a,b","\\"q\\"","\\\\"}'
+    assert array_literal([[1, 2], [3, None]]) == '{{"1","2"},{"3",NULL}}'
+    assert array_literal([]) == "{}"
+
+
+def test_copy_value_escapes_arrays_for_copy():
+    assert copy_value(None) == "\\N"
+    assert copy_value(["a\\b", "c\td"]) == '{"a\\\\\\\\b","c\\td"}'
+
+
+@pytest.mark.skipif(DATABASE is None, reason="needs BETTINGAI_TEST_DATABASE_URL of a PostgreSQL database")
+def test_arrays_survive_copy():
+    table = Table(
+        "copyload_arrays",
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("numbers", ARRAY(Float)),
+        Column("labels", ARRAY(String)),
+        prefixes=["TEMPORARY"],
+    )
+    with Session(sqlalchemy.create_engine(DATABASE)) as session:
+        table.create(session.connection())
+        copy_rows(session, table, VALUES)
+        rows = session.execute(select(table).order_by(table.c.id)).mappings().all()
+        session.rollback()
+    assert [dict(row) for row in rows] == VALUES
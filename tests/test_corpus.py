@@ -0,0 +1,43 @@
+import json
+import os
+
+import pytest
+
+from bettingAI.writer.corpus import corpus_urls, parse
+from bettingAI.writer.structured import PLAYER_STATS
+
+from conftest import CORPUS
+
+# golden.json holds the output of the parsers as they were before the fast tokenizer and the token
+# index, tokenizing with BeautifulSoup and NLTK. It is not written with `corpus golden`, which
+# would only check the parsers against themselves.
+with open(os.path.join(CORPUS, "golden.json")) as f:
+    GOLDEN = json.load(f)
+
+# Those parsers stored every player stat under the key of the stat listed after it, as the "Top"
+# label before the stats has none, so "fotmob rating" was never stored and the value of "fouls
+# committed" was dropped. Players without stats were stored as empty entries.
+STATS = list(PLAYER_STATS)
+WITH_PLAYERS = sorted(url for url in GOLDEN if "/match/" in url and GOLDEN[url]["players"] is not None)
+
+
+def test_golden_covers_corpus(corpus):
+    assert sorted(corpus_urls()) == sorted(GOLDEN)
+
+
+@pytest.mark.parametrize("url", sorted(GOLDEN))
+def test_page_parses_as_golden(corpus, url):
+    output, golden = parse(url), dict(GOLDEN[url])
+    if url in WITH_PLAYERS:
+        del output["players"], golden["players"]
+    assert output == golden
+
+
+@pytest.mark.parametrize("url", WITH_PLAYERS)
+def test_player_stats_are_under_their_own_keys(corpus, url):
+    players = parse(url)["players"]
+    golden = GOLDEN[url]["players"]
+    assert sorted(players) == sorted(name for name in golden if golden[name])
+    for name, stats in players.items():
+        assert stats["id"] == golden[name]["id"]
+        assert {key: stats[key] for key in STATS[:-1]} == {key: golden[name][after] for key, after in zip(STATS, STATS[1:])}
@@ -0,0 +1,32 @@
+import datetime as dt
+
+import pytest
+import sqlalchemy
+from sqlalchemy.orm import Session
+
+from bettingAI.googleCloud.databaseClasses import DeadLetters, SchemaMigrations
+from bettingAI.googleCloud.migrations import DEAD_LETTERS, MigrationMissing
+from bettingAI.writer.deadletter import MAX_BACKOFF, DeadLetterQueue, backoff
+
+
+def letter(id, attempts, nextRetry):
+    return DeadLetters(
+        match_id=id, link=f"/match/{id}/", season="2023-2024", stage="parse", error_class="ValueError",
+        attempts=attempts, first_failed=nextRetry, last_failed=nextRetry, next_retry=nextRetry,
+    )
+
+
+def test_failing_fixtures_are_retried_every_max_backoff():
+    assert backoff(1) < backoff(2) < backoff(8) < backoff(9) == backoff(1000) == MAX_BACKOFF
+    engine = sqlalchemy.create_engine("sqlite://")
+    for table in [DeadLetters, SchemaMigrations]:
+        table.__table__.create(engine)
+    now = dt.datetime(2023, 8, 12, 15)
+    with Session(engine) as session:
+        with pytest.raises(MigrationMissing, match="Migration 4"):
+            DeadLetterQueue(session)
+        session.rollback()
+        session.add(SchemaMigrations(version=DEAD_LETTERS, description="", applied=now))
+        session.add_all([letter(1, 2, now - MAX_BACKOFF), letter(2, 40, now), letter(3, 40, now + MAX_BACKOFF)])
+        session.commit()
+        assert [letter.match_id for letter in DeadLetterQueue(session).due(now)] == [1, 2]
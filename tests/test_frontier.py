@@ -0,0 +1,24 @@
+import sqlalchemy
+from sqlalchemy.orm import Session
+
+from bettingAI.googleCloud.databaseClasses import Matches
+from bettingAI.writer.frontier import DISCOVERED, FAILED, STORED, Frontier
+
+LINKS = ["/match/1/arsenal-vs-chelsea", "/match/2/chelsea-vs-liverpool", "/match/3/liverpool-vs-arsenal"]
+
+
+def test_failed_fixtures_are_left_to_retry():
+    engine = sqlalchemy.create_engine("sqlite://")
+    Matches.__table__.create(engine)
+    with Session(engine) as session:
+        frontier = Frontier(session)
+        assert frontier.fixtures(47, "2022-2023", lambda: LINKS) == LINKS
+
+        frontier.record(LINKS[0], FAILED, ValueError("no stats"))
+        frontier.record(LINKS[1], STORED)
+        session.commit()
+        assert frontier.fixtures(47, "2022-2023", lambda: LINKS) == LINKS[2:]
+
+        frontier.record(LINKS[0], DISCOVERED)  # e.g. retry.py found it is not played yet
+        session.commit()
+        assert sorted(frontier.fixtures(47, "2022-2023", lambda: LINKS)) == [LINKS[0], LINKS[2]]
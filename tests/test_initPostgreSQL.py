@@ -0,0 +1,29 @@
+import pytest
+
+from bettingAI.googleCloud.initPostgreSQL import env_flag
+
+
+@pytest.mark.parametrize("value", ["1", "true", "True", "TRUE", "yes", "Yes", "on", "ON", "t", "y", " true "])
+def test_env_flag_true(monkeypatch, value):
+    monkeypatch.setenv("BETTINGAI_POOL_PRE_PING", value)
+    assert env_flag("BETTINGAI_POOL_PRE_PING", False) is True
+
+
+@pytest.mark.parametrize("value", ["0", "false", "False", "no", "NO", "off", "f", "n"])
+def test_env_flag_false(monkeypatch, value):
+    monkeypatch.setenv("BETTINGAI_POOL_PRE_PING", value)
+    assert env_flag("BETTINGAI_POOL_PRE_PING", True) is False
+
+
+@pytest.mark.parametrize("value", [None, ""])
+def test_env_flag_default(monkeypatch, value):
+    monkeypatch.delenv("BETTINGAI_POOL_PRE_PING", raising=False)
+    if value is not None:
+        monkeypatch.setenv("BETTINGAI_POOL_PRE_PING", value)
+    assert env_flag("BETTINGAI_POOL_PRE_PING", True) is True
+
+
+def test_env_flag_rejects_other_values(monkeypatch):
+    monkeypatch.setenv("BETTINGAI_POOL_PRE_PING", "maybe")
+    with pytest.raises(ValueError, match="BETTINGAI_POOL_PRE_PING"):
+        env_flag("BETTINGAI_POOL_PRE_PING", True)
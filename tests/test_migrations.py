@@ -0,0 +1,44 @@
+import datetime as dt
+
+import pytest
+import sqlalchemy
+from sqlalchemy.orm import Session
+
+from bettingAI.googleCloud.databaseClasses import Matches, SchemaMigrations, TeamMatches
+from bettingAI.googleCloud.migrations import TEAM_MATCHES, MigrationMissing, require_migration
+from bettingAI.processing.queries import query_team_matches
+
+
+@pytest.fixture
+def session():
+    engine = sqlalchemy.create_engine("sqlite://")
+    for table in [Matches, TeamMatches]:
+        table.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def apply(session, version):
+    SchemaMigrations.__table__.create(session.connection(), checkfirst=True)
+    session.add(SchemaMigrations(version=version, description="", applied=dt.datetime.now()))
+    session.commit()
+
+
+def test_require_migration_without_schema_migrations(session):
+    with pytest.raises(MigrationMissing, match="Migration 2"):
+        require_migration(session, TEAM_MATCHES)
+
+
+def test_require_migration(session):
+    apply(session, 1)
+    with pytest.raises(MigrationMissing):
+        require_migration(session, TEAM_MATCHES)
+    apply(session, TEAM_MATCHES)
+    require_migration(session, TEAM_MATCHES)
+
+
+def test_team_matches_need_the_migration(session):
+    with pytest.raises(MigrationMissing):
+        query_team_matches([8456], dt.datetime(2023, 8, 12), session)
+    apply(session, TEAM_MATCHES)
+    assert query_team_matches([8456], dt.datetime(2023, 8, 12), session) == []
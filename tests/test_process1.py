@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from sqlalchemy import TIMESTAMP
+
+from bettingAI.processing.features import features_for_model1, labels
+from bettingAI.processing.history import MatchHistory
+from bettingAI.processing.queries import query_rawMatches
+from bettingAI.processing.vectorized import feature_matrix, load_history
+from bettingAI.processing.windowed import FORM_FEATURES, form_statement
+
+
+def raw_matches(session):
+    return session.execute(query_rawMatches().columns(date=TIMESTAMP)).fetchall()
+
+
+def rows_mode(session, rawMatches):
+    """The inputs and labels of both sides of every match that process1.py adds in the rows mode."""
+    history = MatchHistory(session)
+    processed = {}
+    for matchID, teamID, opponentID, leagueID, season, date in rawMatches:
+        try:
+            processed[matchID] = (
+                [
+                    features_for_model1(teamID, opponentID, leagueID, season, "home", date, history),
+                    features_for_model1(opponentID, teamID, leagueID, season, "away", date, history),
+                ],
+                [labels(matchID, teamID, history), labels(matchID, opponentID, history)],
+            )
+        except (ValueError, KeyError):  # skipped, the KeyError of a team without matches on a side is printed
+            continue
+    return processed
+
+
+@pytest.fixture(scope="module")
+def expected(league):
+    return rows_mode(league, raw_matches(league))
+
+
+def test_bulk_processes_the_matches_of_rows(league, expected):
+    rawMatches = raw_matches(league)
+    result = feature_matrix(load_history(league), rawMatches)
+    assert sorted(result.matchIDs.tolist()) == sorted(expected)
+    assert sum(result.skipped.values()) == len(rawMatches) - len(expected)
+    assert len(expected) > 300
+
+
+def test_bulk_matches_rows(league, expected):
+    result = feature_matrix(load_history(league), raw_matches(league))
+    for matchID, inputs, outcomes in zip(result.matchIDs, result.inputs, result.labels):
+        rows, rowLabels = expected[int(matchID)]
+        rows = np.array([[np.nan if value is None else value for value in side] for side in rows], dtype=float)
+        np.testing.assert_allclose(inputs, rows, rtol=1e-9, atol=1e-12, err_msg=f"match {matchID}")
+        assert outcomes.tolist() == rowLabels
+
+
+def test_replayed_fixtures_are_processed(expected):
+    # the matches at the kick-off time of another match of a team, see the league fixture
+    assert len([matchID for matchID in expected if matchID >= 4_000_480]) >= 2
+
+
+def test_sql_form_matches_rows(league):
+    history = MatchHistory(league)
+    compared = 0
+    for row in league.execute(form_statement()):
+        form = [row._mapping[f"feature_{column}"] for column in FORM_FEATURES]
+        arguments = (row.team_id, row.opponent_id, row.league_id, row.season, row.side, row.date, history)
+        if None in form:  # the rows mode raises for it
+            with pytest.raises((ValueError, KeyError)):
+                features_for_model1(*arguments)
+            continue
+        try:
+            inputs = features_for_model1(*arguments)
+        except ValueError:  # e.g. an incomplete league table, skipped by the sql mode too
+            continue
+        assert features_for_model1(*arguments, form=form) == pytest.approx(inputs, nan_ok=True)
+        compared += 1
+    assert compared > 600
@@ -0,0 +1,80 @@
+import datetime as dt
+import json
+import os
+
+import pytest
+
+from bettingAI.writer import cache, structured
+from bettingAI.writer.cache import read_entry, read_object, store
+from bettingAI.writer.gather import gather_dtg, gather_kickoff
+from bettingAI.writer.scraper import get_match_info, is_played, parse_match_structured, parse_match_tokens, tokenize_content
+
+from conftest import CORPUS
+
+with open(os.path.join(CORPUS, "golden.json")) as f:
+    MATCHES = sorted(url for url in json.load(f) if "/match/" in url)
+
+
+def page(url):
+    return read_object(read_entry(url)["object"])
+
+
+@pytest.mark.parametrize("url", MATCHES)
+def test_structured_matches_tokens(corpus, url):
+    content = page(url)
+    assert parse_match_structured(content) == parse_match_tokens(content)
+
+
+@pytest.mark.parametrize("url", MATCHES)
+def test_structured_main_info_matches_tokens(corpus, url):
+    content = page(url)
+    assert parse_match_structured(content, justMain=True) == parse_match_tokens(content, justMain=True)
+
+
+def kickoff_tokens(timezone):
+    """The first tokens of a match page with the kickoff time given in a time zone."""
+    return [
+        "matchName", "Chelsea-vs-Liverpool", "matchTimeUTC", "Sun", "Aug", "13", "2023", "01:00", timezone,
+        "matchRound", "1", "teamColors", "darkMode", "home", "#", "e20520", "away", "#", "ffffff",
+    ]
+
+
+@pytest.mark.parametrize("timezone", ["UTC", "CEST", "GMT+2", "EDT", "Local"])
+def test_gather_dtg_keeps_the_page_time(timezone):
+    # matches.date and schedule.date hold the time as the page gives it, whatever the zone
+    assert gather_dtg(kickoff_tokens(timezone)) == dt.datetime(2023, 8, 13, 1, 0)
+    data = {"general": {"matchTimeUTC": f"Sun, Aug 13, 2023, 01:00 {timezone}"}}
+    assert structured.gather_dtg(data) == dt.datetime(2023, 8, 13, 1, 0)
+
+
+@pytest.mark.parametrize("url", MATCHES)
+def test_structured_kickoff_matches_tokens(corpus, url):
+    content = page(url)
+    tokens = tokenize_content(content, match=True, limit=50)
+    assert structured.gather_kickoff(structured.extract_next_data(content)) == gather_kickoff(tokens)
+
+
+@pytest.mark.parametrize("timezone, expected", [
+    ("UTC", dt.datetime(2023, 8, 13, 1, 0)),
+    ("CEST", dt.datetime(2023, 8, 12, 23, 0)),
+    ("GMT+2", dt.datetime(2023, 8, 12, 23, 0)),
+    ("UTC-03:30", dt.datetime(2023, 8, 13, 4, 30)),
+    ("EDT", dt.datetime(2023, 8, 13, 13, 0)),  # not known, taken as the westernmost zone
+])
+def test_gather_kickoff_returns_utc(timezone, expected):
+    assert gather_kickoff(kickoff_tokens(timezone)) == expected
+
+
+def test_is_played_after_a_full_match():
+    now = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+    assert not is_played(now - dt.timedelta(hours=2))
+    assert is_played(now - dt.timedelta(hours=3, minutes=1))
+
+
+def test_pages_that_fail_to_parse_are_forgotten(tmp_path, monkeypatch):
+    monkeypatch.setitem(cache._config, "directory", str(tmp_path))
+    monkeypatch.setitem(cache._config, "mode", "on")
+    store("https://www.fotmob.com/match/1/", b"<html><body>Service Unavailable</body></html>")
+    with pytest.raises(Exception):
+        get_match_info("/match/1/")
+    assert read_entry("https://www.fotmob.com/match/1/") is None
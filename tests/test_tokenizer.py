@@ -0,0 +1,62 @@
+import json
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+from bettingAI.writer.benchmark import reference_tokenize
+from bettingAI.writer.cache import read_entry, read_object
+from bettingAI.writer.tokenizer import iter_tokens, render, tokenize
+
+from conftest import CORPUS
+
+with open(os.path.join(CORPUS, "golden.json")) as f:
+    URLS = sorted(json.load(f))
+
+# Text around the sentence breaks punkt decides with its abbreviations, collocations and
+# orthographic context, and around the quotes NLTK writes as `` or ''
+TEXTS = [
+    "<p>Arsenal F.C. beat Chelsea F.C. on Sat. 12 Aug. The 2nd half was better.</p>",
+    "<p>He said \"we won\". Then he left... Mr. Arteta agreed!</p>",
+    "<p>J. R. R. Tolkien wrote it. e.g. this one, i.e. that one.</p>",
+    "<p>It's 3.5 vs. 2.1 (xG). Really? Yes.</p>",
+    "<p>Don't stop: cannot, gonna 'tis. We'll see.</p>",
+    "<div>Round 1.</div><div>Round 2.</div><span>1. Arsenal 2. Chelsea</span>",
+    "<p>&ldquo;We didn't start well,&rdquo; said the coach. (He was right.) Next.</p>",
+    "<p>The U.S. team won. Dr. Smith agreed. No. 7 scored at 3 p.m. Tuesday.</p>",
+    "<p>Final score: 2-1. Attendance: 60,192. End.</p>",
+    "<p>It rose 5 p.m. However, it fell. Sales rose 12 abreast. Inc. However was it.</p>",
+    "<p>Mr. Smith. Gen. Motors said. A. Springsteen sang. Jan. 5 was cold.</p>",
+    '<p>"Start," he said. "Again." \'\'Twice\'\' she said.\'\'Then\'\' it ended.</p>',
+    '<p>He won."Next" (see "this") [\'\'that\'\'] {"a"} <"b">.</p>',
+    '<div>"quoted line"</div>\n<div>text "inner" and\t"tab"</div>',
+    '"Opening quote of the page." Then "one more."',
+    "<p>Wait... What? No!! Ok.. Sure.</p>",
+]
+
+
+def page(url):
+    return read_object(read_entry(url)["object"])
+
+
+@pytest.mark.parametrize("url", URLS)
+def test_render_matches_prettify(corpus, url):
+    content = page(url)
+    assert render(content) == BeautifulSoup(content, "html.parser").prettify()
+
+
+@pytest.mark.parametrize("source", URLS + TEXTS)
+def test_tokens_match_nltk(corpus, source):
+    content = page(source) if source in URLS else source
+    expected = reference_tokenize(content)
+    assert tokenize(content) == expected
+    assert list(iter_tokens(content)) == expected
+
+
+@pytest.mark.parametrize("source", URLS + TEXTS)
+def test_all_tokens_match_nltk(corpus, source):
+    # without leaving out any stop tokens, e.g. the `` NLTK writes for starting quotes
+    content = page(source) if source in URLS else source
+    expected = reference_tokenize(content, ())
+    assert tokenize(content, ()) == expected
+    assert list(iter_tokens(content, ())) == expected
@@ -0,0 +1,73 @@
+import datetime as dt
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+import sqlalchemy
+from sqlalchemy.orm import Session
+
+from bettingAI.googleCloud.databaseClasses import Leagues, Matches, Schedule, SchemaMigrations, Teams, UpdateMarks
+from bettingAI.googleCloud.migrations import MigrationMissing
+from bettingAI.writer import update
+
+LEAGUE = SimpleNamespace(id=47, name="Premier League", span=2)
+
+
+@pytest.fixture
+def session():
+    engine = sqlalchemy.create_engine("sqlite://")
+    for table in [Leagues, Teams, Matches, Schedule, UpdateMarks, SchemaMigrations]:
+        table.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def test_unplayed_fixture_holds_the_mark(session, monkeypatch):
+    postponed, later = dt.datetime(2023, 8, 12, 15), dt.datetime(2023, 8, 19, 15)
+    monkeypatch.setattr(
+        update, "get_match_infos", lambda fixtures, concurrency: [(fixture, (False, None)) for fixture in fixtures]
+    )
+    session.add_all([
+        Schedule(match_id=4193450, date=postponed, season="2023-2024", league_id=47),
+        Schedule(match_id=4193463, date=later, season="2023-2024", league_id=47),
+    ])
+    session.commit()
+    progress = Counter()
+    update.update_league(session, LEAGUE, progress)
+
+    assert progress["notPlayed"] == 2
+    assert session.get(UpdateMarks, 47).played_until < postponed
+
+
+def test_matches_keep_their_own_season(session, monkeypatch):
+    # a backlog from the end of last season, one match the schedule gives a season and one it does not
+    dates = {"/match/4013502": dt.datetime(2023, 5, 28, 16), "/match/4013503": dt.datetime(2023, 5, 28, 16)}
+    monkeypatch.setattr(
+        update, "get_match_infos",
+        lambda fixtures, concurrency: [(fixture, ({"dtg": dates[fixture]}, None)) for fixture in fixtures],
+    )
+    seasons = {}
+
+    def add_match(id, season, matchStats):
+        seasons[id] = season
+        return Matches(id=id), None, None
+
+    monkeypatch.setattr(update, "add_match", add_match)
+    monkeypatch.setattr(update, "upsert", lambda session, rows: Counter(inserted=len(rows)))
+    session.add_all([
+        Schedule(match_id=4013502, date=dates["/match/4013502"], season="2022-2023", league_id=47),
+        Schedule(match_id=4013503, date=dates["/match/4013503"], season=None, league_id=47),
+    ])
+    session.commit()
+    update.update_league(session, LEAGUE, Counter())
+
+    assert seasons == {4013502: "2022-2023", 4013503: "2022-2023"}
+
+
+def test_incremental_mode_needs_update_marks(session):
+    with pytest.raises(MigrationMissing, match="Migration 1"):  # the keys of the upserts
+        update.update(session, mode="incremental")
+    session.add(SchemaMigrations(version=1, description="", applied=dt.datetime.now()))
+    session.commit()
+    with pytest.raises(MigrationMissing, match="Migration 3"):
+        update.update(session, mode="incremental")